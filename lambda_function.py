@@ -1,151 +1,1766 @@
 import json
 import os
+import random
+import re
+import string
+import threading
+import time
 import requests
 import traceback
-from datetime import datetime
+from collections import OrderedDict, deque
+from requests.adapters import HTTPAdapter
+
+# Cold start: rarely used modules (httpx, concurrent.futures, hashlib,
+# datetime, copy) are imported lazily where they are needed. random,
+# string and collections stay here: they are used while this module
+# loads (RetryPolicy of api_client, compiled templates, LRU caches) and
+# requests imports all three anyway, so they add no import time.
+
+
+# ============= JSON CODEC =============
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto")  # auto | orjson | json
+
+# Optional fast JSON (orjson), stdlib json otherwise
+orjson = None
+if JSON_BACKEND in ("auto", "orjson"):
+    try:
+        import orjson
+    except ImportError:
+        pass
+
+# Built once: json.dumps(obj, default=...) creates a new encoder per call
+_json_encoder = json.JSONEncoder(default=str)
+
+# update_id as a top-level key of raw JSON (inside a string the quotes
+# would be escaped and cannot match)
+_UPDATE_ID_RE = re.compile(rb'"update_id"\s*:\s*(-?\d+)')
+
+
+def json_loads(data):
+    """Decode JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """Encode JSON to str"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode("utf-8")
+    return _json_encoder.encode(obj)
+
+
+def peek_update_id(raw):
+    """update_id from raw update JSON without decoding it (None if not found)"""
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    match = _UPDATE_ID_RE.search(raw)
+    return int(match.group(1)) if match else None
+
+
+# ============= BOT API CLIENT =============
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")
+API_POOL_SIZE = int(os.environ.get("API_POOL_SIZE", "10"))
+API_CONNECT_TIMEOUT = float(os.environ.get("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "10"))
+API_HTTP2 = os.environ.get("API_HTTP2", "false").lower() == "true"
+
+# Optional HTTP/2 transport (httpx + h2), imported only when enabled
+httpx = None
+HTTP2_AVAILABLE = False
+if API_HTTP2:
+    try:
+        import httpx
+        import h2  # noqa: F401 - required by httpx for http2=True
+        HTTP2_AVAILABLE = True
+    except ImportError:
+        pass
+
+# Return first Bot API call inside the webhook HTTP response
+WEBHOOK_REPLY = os.environ.get("WEBHOOK_REPLY", "false").lower() == "true"
+
+# Worker threads for concurrent outgoing calls of one update
+FANOUT_WORKERS = int(os.environ.get("FANOUT_WORKERS", "4"))
+
+# Retries (decorrelated jitter) and circuit breaker for Bot API calls
+API_RETRY_ATTEMPTS = int(os.environ.get("API_RETRY_ATTEMPTS", "3"))
+API_RETRY_BASE = float(os.environ.get("API_RETRY_BASE", "0.1"))
+API_RETRY_CAP = float(os.environ.get("API_RETRY_CAP", "2.0"))
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("BREAKER_RESET_SECONDS", "30"))
+DEADLINE_MARGIN_MS = int(os.environ.get("DEADLINE_MARGIN_MS", "300"))
+DEADLINE_MIN_CALL_MS = int(os.environ.get("DEADLINE_MIN_CALL_MS", "200"))  # skip calls below this
+# Budget when there is no Lambda context (webhook.py / simulator pass their own)
+DEFAULT_DEADLINE_SECONDS = float(os.environ.get("DEFAULT_DEADLINE_SECONDS", "0")) or None
+
+
+class Deadline:
+    """Absolute time budget of one invocation (monotonic clock)"""
+    
+    def __init__(self, budget_seconds=None, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = None if budget_seconds is None else clock() + budget_seconds
+    
+    @classmethod
+    def from_context(cls, context, default_seconds=None, margin_ms=DEADLINE_MARGIN_MS):
+        """
+        Budget from Lambda context.get_remaining_time_in_millis()
+        
+        margin_ms is kept back for building and returning the response.
+        Without a Lambda context default_seconds is used (None = unlimited).
+        """
+        remaining = getattr(context, "get_remaining_time_in_millis", None)
+        if remaining is None:
+            return cls(default_seconds)
+        return cls(max(remaining() - margin_ms, 0) / 1000.0)
+    
+    def remaining(self):
+        """Seconds left (inf without budget)"""
+        if self.expires_at is None:
+            return float("inf")
+        return max(self.expires_at - self.clock(), 0.0)
+    
+    def expired(self):
+        return self.remaining() <= 0
+    
+    def fits(self, seconds=DEADLINE_MIN_CALL_MS / 1000.0):
+        """True if at least `seconds` of budget are left"""
+        return self.remaining() >= seconds
+    
+    def clip(self, timeout):
+        """Timeout cut down to the remaining budget"""
+        return min(timeout, self.remaining())
+
+
+class DeadlineExceeded(Exception):
+    """Not enough invocation time left to start the work"""
+
+
+class LocalLambdaContext:
+    """Minimal Lambda context for local runs (webhook.py, simulator)"""
+    
+    def __init__(self, timeout_seconds):
+        self.expires_at = time.monotonic() + timeout_seconds
+    
+    def get_remaining_time_in_millis(self):
+        return max(int((self.expires_at - time.monotonic()) * 1000), 0)
+
+
+class CircuitOpenError(Exception):
+    """Bot API considered unhealthy - call rejected without trying"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    closed -> open after failure_threshold failures in a row; open rejects
+    calls for reset_timeout, then half_open lets one probe through: success
+    closes the circuit, failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        """True if a call may be attempted now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print("[CIRCUIT] ✅ Bot API healthy again, circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or (
+                self.state == "closed" and self.failures >= self.failure_threshold
+            ):
+                if self.state == "closed":
+                    print(f"[CIRCUIT] 🚫 {self.failures} Bot API failures in a row, circuit open")
+                self.state = "open"
+                self.opened_at = self.clock()
+
+
+class RetryPolicy:
+    """
+    Which failed Bot API calls are retried, and how long to wait
+    
+    Idempotent methods are retried on network errors, timeouts and 5xx.
+    Other methods (sendMessage, ...) only when the request surely never
+    reached Telegram (connection could not be opened), so no message is
+    sent twice. Waits use decorrelated jitter.
+    """
+    
+    IDEMPOTENT_METHODS = frozenset({
+        "getMe", "getUpdates", "getWebhookInfo", "setWebhook", "deleteWebhook",
+        "answerCallbackQuery", "editMessageText", "editMessageReplyMarkup",
+        "deleteMessage", "getChat", "getChatMember",
+    })
+    
+    def __init__(self, max_attempts=API_RETRY_ATTEMPTS, base=API_RETRY_BASE, cap=API_RETRY_CAP,
+                 rng=None):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        self.rng = rng or random.Random()
+    
+    @staticmethod
+    def never_sent(error):
+        """True if the error happened before the request was transmitted"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return "NewConnectionError" in repr(error) or "NameResolutionError" in repr(error)
+        # httpx.ConnectError / httpx.ConnectTimeout
+        return type(error).__name__ in ("ConnectError", "ConnectTimeout")
+    
+    def is_retryable(self, method, response=None, error=None):
+        if error is not None:
+            if self.never_sent(error):
+                return True
+            return method in self.IDEMPOTENT_METHODS
+        return method in self.IDEMPOTENT_METHODS and response.status_code >= 500
+    
+    def backoff(self, previous):
+        """Next wait: decorrelated jitter, min(cap, uniform(base, previous * 3))"""
+        return min(self.cap, self.rng.uniform(self.base, max(previous, self.base) * 3))
+
+
+class BotApiClient:
+    """
+    Pooled keep-alive client for the Telegram Bot API
+    
+    Created once at module import so the TCP/TLS connection to
+    api.telegram.org survives warm Lambda invocations. Uses httpx with
+    HTTP/2 when enabled and installed, otherwise a requests.Session with a
+    fixed-size urllib3 pool.
+    """
+    
+    def __init__(self, base_url=TELEGRAM_API_BASE, pool_size=API_POOL_SIZE,
+                 connect_timeout=API_CONNECT_TIMEOUT, read_timeout=API_READ_TIMEOUT,
+                 http2=API_HTTP2, retry_policy=None, breaker=None, sleep=time.sleep):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._lock = threading.Lock()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self._calls = 0
+        self._connections_opened = 0
+        self._retries = 0
+        self._baseline = (0, 0, 0)
+        
+        if self.http2:
+            self.session = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size
+                )
+            )
+        else:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=pool_size,
+                pool_block=False,
+                max_retries=0
+            )
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+    
+    def method_url(self, token, method):
+        """Build Bot API method URL for a bot token"""
+        return f"{self.base_url}/bot{token}/{method}"
+    
+    def call(self, token, method, payload=None, read_timeout=None, connect_timeout=None):
+        """
+        Call Bot API method with JSON payload
+        
+        Args:
+            token: Bot token the call is made for
+            method: Bot API method name (sendMessage, answerCallbackQuery, ...)
+            payload: JSON-serializable parameters, or an encoded JSON body
+                (bytes/str, see encode_payload)
+            read_timeout: Override read timeout
+            connect_timeout: Override connect timeout
+        
+        Returns:
+            HTTP response (requests.Response or httpx.Response)
+        """
+        url = self.method_url(token, method)
+        read = self.read_timeout if read_timeout is None else read_timeout
+        connect = self.connect_timeout if connect_timeout is None else connect_timeout
+        
+        with self._lock:
+            self._calls += 1
+        
+        if isinstance(payload, (bytes, str)):
+            body = {"data": payload, "headers": {"Content-Type": "application/json"}}
+        else:
+            body = {"json": payload}
+        
+        status = "error"
+        with metrics.timer("bot_api_request_seconds", "bot_api_requests_in_flight", method=method):
+            try:
+                if self.http2:
+                    if "data" in body:
+                        body["content"] = body.pop("data")
+                    response = self.session.post(
+                        url,
+                        **body,
+                        timeout=httpx.Timeout(read, connect=connect),
+                        extensions={"trace": self._trace}
+                    )
+                else:
+                    response = self.session.post(
+                        url,
+                        **body,
+                        timeout=(connect, read)
+                    )
+                    self._sync_pool_connections()
+                status = response.status_code
+                return response
+            finally:
+                metrics.inc("bot_api_responses_total", method=method, status=status)
+    
+    def request(self, token, method, payload=None, read_timeout=None, deadline=None):
+        """
+        Call method through the circuit breaker, retrying per retry_policy
+        
+        Each attempt's timeouts are cut to the deadline's remaining budget.
+        Retries stop when the deadline could not cover the wait plus a
+        connect attempt. 4xx responses (incl. 429) are returned as-is.
+        
+        Raises:
+            DeadlineExceeded: too little budget left to start the call
+            CircuitOpenError: circuit is open (fail fast)
+            Exception: last transport error if all attempts failed
+        """
+        deadline = deadline or Deadline()
+        if not deadline.fits():
+            raise DeadlineExceeded(f"{method}: {deadline.remaining() * 1000:.0f} ms left")
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Bot API circuit open, {method} not sent")
+        
+        policy = self.retry_policy
+        read_timeout = self.read_timeout if read_timeout is None else read_timeout
+        wait = policy.base
+        for attempt in range(1, policy.max_attempts + 1):
+            response, error = None, None
+            try:
+                response = self.call(
+                    token, method, payload,
+                    read_timeout=deadline.clip(read_timeout),
+                    connect_timeout=deadline.clip(self.connect_timeout)
+                )
+            except Exception as e:
+                error = e
+            
+            if error is None and response.status_code < 500:
+                self.breaker.record_success()
+                return response
+            self.breaker.record_failure()
+            
+            if attempt == policy.max_attempts or not policy.is_retryable(method, response, error):
+                break
+            wait = policy.backoff(wait)
+            if not deadline.fits(wait + self.connect_timeout):
+                break
+            if not self.breaker.allow():
+                break
+            
+            with self._lock:
+                self._retries += 1
+            self.sleep(wait)
+        
+        if error is not None:
+            raise error
+        return response
+    
+    def _trace(self, event_name, info):
+        """httpx trace hook - counts newly opened connections"""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections_opened += 1
+    
+    def _sync_pool_connections(self):
+        """Read number of connections ever opened from urllib3 pools"""
+        pools = self.session.get_adapter(self.base_url).poolmanager.pools
+        opened = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        with self._lock:
+            self._connections_opened = max(self._connections_opened, opened)
+    
+    def begin_invocation(self):
+        """Start a new per-invocation counter window"""
+        with self._lock:
+            self._baseline = (self._calls, self._connections_opened, self._retries)
+    
+    def invocation_stats(self):
+        """
+        Connection counters since begin_invocation()
+        
+        A call that did not open a new connection reused a pooled one.
+        """
+        with self._lock:
+            calls = self._calls - self._baseline[0]
+            opened = self._connections_opened - self._baseline[1]
+            retries = self._retries - self._baseline[2]
+        return {
+            "calls": calls,
+            "new_connections": opened,
+            "reused_connections": max(calls - opened, 0),
+            "retries": retries,
+            "circuit": self.breaker.state,
+            "http2": self.http2
+        }
+
+
+# Shared across warm invocations of the same container
+api_client = BotApiClient()
+_fanout_pool = None
+_fanout_lock = threading.Lock()
+_cold_start = True
+
+
+def get_fanout_pool():
+    """Worker pool for concurrent outgoing calls, created on first use"""
+    global _fanout_pool
+    with _fanout_lock:
+        if _fanout_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _fanout_pool = ThreadPoolExecutor(
+                max_workers=FANOUT_WORKERS,
+                thread_name_prefix="bot-api"
+            )
+    return _fanout_pool
 
 
 # ============= BUG HUNTER LOGGER =============
+BUG_HUNTER_MAX_GROUPS = int(os.environ.get("BUG_HUNTER_MAX_GROUPS", "50"))
+BUG_HUNTER_FLUSH_INTERVAL = float(os.environ.get("BUG_HUNTER_FLUSH_INTERVAL", "0"))
+BUG_HUNTER_RATE_PER_MIN = float(os.environ.get("BUG_HUNTER_RATE_PER_MIN", "6"))
+BUG_HUNTER_BURST = int(os.environ.get("BUG_HUNTER_BURST", "3"))
+BUG_HUNTER_MAX_DIGEST = 3800  # Telegram message limit is 4096
+
+
+class TokenBucket:
+    """Token bucket rate limiter (thread-safe, injectable clock)"""
+    
+    EPSILON = 1e-9  # float rounding slack when refilling
+    
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def try_acquire(self, tokens=1):
+        """Take tokens if available, never blocks"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens - self.EPSILON:
+                self.tokens = max(self.tokens - tokens, 0.0)
+                return True
+            return False
+    
+    def time_until_available(self, tokens=1):
+        """Seconds until try_acquire(tokens) can succeed"""
+        with self._lock:
+            self._refill()
+            missing = tokens - self.tokens
+            if missing <= self.EPSILON:
+                return 0.0
+            return missing / self.rate if self.rate > 0 else float("inf")
+
+
 class BugHunter:
-    """Send critical errors to Telegram bot for monitoring"""
+    """
+    Send critical errors to Telegram bot for monitoring
     
-    def __init__(self):
+    One module-level instance collects errors into a bounded in-memory
+    queue grouped by (error_type, stack fingerprint). flush() sends all
+    pending groups as one digest message, rate-limited by a token bucket;
+    groups that cannot be sent stay queued for the next flush.
+    """
+    
+    def __init__(self, max_groups=BUG_HUNTER_MAX_GROUPS, flush_interval=BUG_HUNTER_FLUSH_INTERVAL,
+                 rate_per_min=BUG_HUNTER_RATE_PER_MIN, burst=BUG_HUNTER_BURST, clock=time.monotonic):
         self.token = os.environ.get("BUG_HUNTER_BOT_TOKEN")
         self.chat_id = os.environ.get("BUG_HUNTER_CHAT_ID", "")
         self.enabled = bool(self.token and self.chat_id)
+        self.max_groups = max_groups
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.bucket = TokenBucket(rate_per_min / 60.0, burst, clock=clock)
+        self.groups = {}  # fingerprint -> error group (insertion ordered)
+        self.dropped = 0
+        self.last_flush = 0.0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def fingerprint(error_type, stack_trace):
+        """
+        Stable group key: error type plus the code locations of the stack
+        
+        Only "File ..., line ..." frames are used so that varying values in
+        the message (chat ids, texts) do not split a group.
+        """
+        import hashlib
+        
+        frames = [
+            line.strip() for line in (stack_trace or "").splitlines()
+            if line.strip().startswith("File ")
+        ]
+        digest = hashlib.sha1("\n".join(frames).encode("utf-8")).hexdigest()[:12]
+        return f"{error_type}:{digest}"
     
     def log_error(self, error_type: str, error_msg: str, stack_trace: str = "", context_data: dict = None):
-        """Log error to Telegram bot with details"""
+        """
+        Queue error for the next digest (no network I/O)
+        
+        Returns:
+            True if the error was queued or counted into an existing group
+        """
+        metrics.inc("bot_errors_total", error_type=error_type)
         if not self.enabled:
             print(f"[BUG_HUNTER] ⚠️  Not configured (token/chat_id missing) - Error: {error_type}")
             return False
         
-        try:
-            timestamp = datetime.now().isoformat()
-            
-            # Log to console first
-            print(f"[BUG_HUNTER] 🚨 Reporting {error_type} to Telegram...")
+        from datetime import datetime
+        
+        key = self.fingerprint(error_type, stack_trace)
+        now = datetime.now().isoformat()
+        
+        with self._lock:
+            group = self.groups.get(key)
+            if group is not None:
+                group["count"] += 1
+                group["last_seen"] = now
+                return True
             
-            # Prepare detailed log message (for file)
-            detailed_log = f"""
-🚨 BUG ALERT 🚨
-═══════════════════════════════════════════
-Timestamp: {timestamp}
-Error Type: {error_type}
-Message: {error_msg}
-
-Stack Trace:
-─────────────────────────────────────────────
-{stack_trace}
-
-Context Data:
-─────────────────────────────────────────────
-{json.dumps(context_data or {}, indent=2, ensure_ascii=False)}
-═══════════════════════════════════════════
-"""
+            if len(self.groups) >= self.max_groups:
+                self.dropped += 1
+                return False
             
-            # Prepare short message for Telegram (message size limited to 4096)
-            short_msg = f"""🚨 ERROR DETECTED 🚨
-
-*Type:* `{error_type}`
-*Time:* `{timestamp}`
-
-*Error:*
-```
-{error_msg[:200]}
-```
-
-*Details:* See attached file or CloudWatch logs
-"""
+            self.groups[key] = {
+                "error_type": error_type,
+                "error_msg": error_msg,
+                "context_data": context_data,
+                "count": 1,
+                "first_seen": now,
+                "last_seen": now
+            }
+        
+        print(f"[BUG_HUNTER] 🚨 Queued {error_type} for digest")
+        return True
+    
+    def pending(self):
+        """Number of queued error groups"""
+        with self._lock:
+            return len(self.groups)
+    
+    def _format_digest(self, groups, dropped):
+        """Build one HTML digest message for error groups (error text escaped)"""
+        from html import escape
+        total = sum(group["count"] for group in groups)
+        lines = [f"🚨 ERROR DIGEST 🚨 ({total} errors, {len(groups)} types)\n"]
+        size = len(lines[0])
+        
+        for index, group in enumerate(groups):
+            block = (
+                f"<b>Type:</b> <code>{escape(str(group['error_type']))}</code> × {group['count']}\n"
+                f"<b>Time:</b> <code>{group['first_seen']}</code> → <code>{group['last_seen']}</code>\n"
+                f"<pre>{escape(str(group['error_msg'])[:200])}</pre>\n"
+            )
+            if size + len(block) > BUG_HUNTER_MAX_DIGEST:
+                lines.append(f"... and {len(groups) - index} more types")
+                break
+            lines.append(block)
+            size += len(block)
+        
+        if dropped:
+            lines.append(f"⚠️ {dropped} errors dropped (queue full)")
+        
+        lines.append("<b>Details:</b> See CloudWatch logs")
+        return "\n".join(lines)
+    
+    def _requeue(self, items, dropped):
+        """Put unsent groups back in front of the ones queued meanwhile"""
+        with self._lock:
+            merged = dict(items)
+            for key, group in self.groups.items():
+                sent = merged.get(key)
+                if sent is None:
+                    merged[key] = group
+                else:
+                    sent["count"] += group["count"]
+                    sent["last_seen"] = group["last_seen"]
+            while len(merged) > self.max_groups:
+                merged.pop(next(reversed(merged)))
+                dropped += 1
+            self.groups = merged
+            self.dropped += dropped
+    
+    def flush(self, force=False, deadline=None):
+        """
+        Send pending errors as one digest message
+        
+        Args:
+            force: Ignore flush interval (token bucket still applies)
+            deadline: Deadline of the invocation, the send is cut to it
+        
+        Returns:
+            True if a digest was sent
+        """
+        if not self.enabled:
+            return False
+        if deadline is not None and not deadline.fits():
+            return False  # no time left, groups stay queued
+        
+        with self._lock:
+            if not self.groups:
+                return False
+            if not force and self.clock() - self.last_flush < self.flush_interval:
+                return False
+            if not self.bucket.try_acquire():
+                print(f"[BUG_HUNTER] ⏳ Rate limited, {len(self.groups)} error groups kept for next digest")
+                return False
             
-            # Send to Telegram bot
-            url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+            items = list(self.groups.items())
+            dropped = self.dropped
+            self.groups = {}
+            self.dropped = 0
+            self.last_flush = self.clock()
+        
+        groups = [group for _, group in items]
+        read_timeout = deadline.clip(5) if deadline is not None else 5
+        try:
             payload = {
                 "chat_id": self.chat_id,
-                "text": short_msg,
-                "parse_mode": "Markdown"
+                "text": self._format_digest(groups, dropped),
+                "parse_mode": "HTML"
             }
             
-            response = requests.post(url, json=payload, timeout=5)
+            response = api_client.call(self.token, "sendMessage", payload, read_timeout=read_timeout)
             
             if response.status_code == 200:
-                print(f"[BUG_HUNTER] ✅ {error_type} sent to Telegram successfully")
+                print(f"[BUG_HUNTER] ✅ Digest with {len(groups)} error groups sent to Telegram")
                 return True
-            else:
-                print(f"[BUG_HUNTER] ❌ Failed to send {error_type} to Telegram: {response.status_code}")
+            print(f"[BUG_HUNTER] ❌ Failed to send digest to Telegram: {response.status_code} "
+                  f"{response.text[:200]}")
+            if response.status_code != 429 and response.status_code < 500:
+                # Permanent (bad chat, bot blocked, bad text): resending cannot help
+                print(f"[BUG_HUNTER] Dropped digest of {len(groups)} error groups")
                 return False
-                
+        
         except Exception as e:
             print(f"[BUG_HUNTER] Error in bug reporting: {str(e)}")
-            return False
+        
+        # Not sent (transport error, 5xx, 429): keep the groups for the next digest
+        self._requeue(items, dropped)
+        return False
 
 
-# ============= APPLICATION LAYER =============
-class BotApplication:
-    """Application layer - business logic for bot responses"""
+# Module-level reporter shared by all error sites
+bug_hunter = BugHunter()
+
+
+# ============= OUTBOUND RATE LIMITER =============
+SEND_GLOBAL_RATE = float(os.environ.get("SEND_GLOBAL_RATE", "30"))  # messages/second
+SEND_CHAT_RATE = float(os.environ.get("SEND_CHAT_RATE", "1"))  # messages/second per chat
+SEND_GROUP_PER_MINUTE = float(os.environ.get("SEND_GROUP_PER_MINUTE", "20"))
+SEND_MAX_WAIT = float(os.environ.get("SEND_MAX_WAIT", "5"))  # give up instead of waiting longer
+SEND_429_RETRIES = int(os.environ.get("SEND_429_RETRIES", "2"))
+
+
+class RateLimitExceeded(Exception):
+    """Send could not be scheduled within the allowed wait"""
+
+
+class SendRateLimiter:
+    """
+    Schedules outgoing messages within Telegram send limits
     
-    @staticmethod
-    def handle_start_command(user_id, user_first_name=None):
-        """Handle /start command"""
-        name = user_first_name or "Foydalanuvchi"
-        return f"Assalomu alaikum {name}! 👋\n\nMen sizning assistant botingiman. Men bilan ham qanday ishlashni keyinroq bilib olasiz!"
+    A global token bucket (~30 msg/s) plus one bucket per chat (~1 msg/s,
+    20 msg/min for groups). Buckets hold a single token, so queued sends are
+    spaced out evenly instead of bursting. A 429 retry_after blocks the
+    chat (or everything, without chat) until it has passed.
+    """
+    
+    def __init__(self, global_rate=SEND_GLOBAL_RATE, chat_rate=SEND_CHAT_RATE,
+                 group_per_minute=SEND_GROUP_PER_MINUTE, max_wait=SEND_MAX_WAIT,
+                 max_chats=10000, clock=time.monotonic, sleep=time.sleep):
+        self.chat_rate = chat_rate
+        self.group_rate = group_per_minute / 60.0
+        self.max_wait = max_wait
+        self.max_chats = max_chats
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate, 1, clock=clock)
+        self.chat_buckets = OrderedDict()  # chat_id -> TokenBucket (LRU)
+        self.blocked_until = {}  # chat_id (None = global) -> clock time
+        self._lock = threading.Lock()
+    
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Negative ids are groups, supergroups and channels
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, 1, clock=self.clock)
+            while len(self.chat_buckets) > self.max_chats:
+                self.chat_buckets.popitem(last=False)
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+    
+    def _wait_time(self, chat_id, bucket):
+        now = self.clock()
+        return max(
+            self.global_bucket.time_until_available(),
+            bucket.time_until_available(),
+            self.blocked_until.get(None, now) - now,
+            self.blocked_until.get(chat_id, now) - now
+        )
+    
+    def acquire(self, chat_id, max_wait=None):
+        """
+        Wait until a message to chat_id may be sent, then take the tokens
+        
+        Returns:
+            Seconds waited
+        
+        Raises:
+            RateLimitExceeded: if the send would wait longer than max_wait
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        waited = 0.0
+        while True:
+            with self._lock:
+                bucket = self._chat_bucket(chat_id)
+                wait = self._wait_time(chat_id, bucket)
+                if wait <= 0:
+                    self.global_bucket.try_acquire()
+                    bucket.try_acquire()
+                    return waited
+            
+            if waited + wait > max_wait:
+                raise RateLimitExceeded(
+                    f"chat {chat_id}: send would wait {waited + wait:.1f}s (max {max_wait:.1f}s)"
+                )
+            self.sleep(wait)
+            waited += wait
+    
+    def backoff(self, chat_id, retry_after):
+        """Block sends to chat_id (None = all chats) for retry_after seconds"""
+        with self._lock:
+            until = self.clock() + retry_after
+            self.blocked_until[chat_id] = max(self.blocked_until.get(chat_id, 0.0), until)
     
     @staticmethod
-    def handle_help_command():
-        """Handle /help command"""
-        return """📖 Mening buyruqlarim:
+    def retry_after(response):
+        """retry_after seconds from a 429 Bot API response (default 1)"""
+        try:
+            return float(response.json().get("parameters", {}).get("retry_after", 1))
+        except Exception:
+            return 1.0
 
-/start - Boshlang'ich xabar
-/help - Bu xabar
-/info - Men haqimda ma'lumot
-/echo <text> - Xabarni takrorlash
 
-Shuningdek, qayta ishlanuvchi tugmalar bilan o'ynay olasiz! 🎮"""
-    
-    @staticmethod
-    def handle_info_command():
-        """Handle /info command"""
-        return """ℹ️ Men haqimda:
+# Send limits are per bot token - shared by all invocations of this bot
+rate_limiter = SendRateLimiter()
+
+
+# ============= METRICS =============
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
 
-Men aiogramda yozilgan bot.
-Webhook rejimida ishlayman.
-Serverless infrastructureda (AWS Lambda) joylashtirildim.
 
-Muloqotingiz uchun rahmat! ❤️"""
+class MetricsRegistry:
+    """
+    In-process counters, gauges and histograms with Prometheus text output
     
-    @staticmethod
-    def handle_echo_message(text):
-        """Echo user's message"""
-        return f"Siz yuborganingiz: {text} ✅"
+    Writes go to a shard owned by the calling thread (no lock, no shared
+    cache line with other workers); render() merges all shards. A shard
+    outlives its thread, so counts are never lost. Gauges are stored as
+    deltas, so inc() and dec() may happen on different threads.
+    """
+    
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.meta = {}  # name -> (type, help)
+        self.callbacks = {}  # name -> fn() -> {labels_tuple: value}
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+    
+    def describe(self, name, kind, help_text):
+        """Declare metric type (counter, gauge, histogram) and help text"""
+        self.meta[name] = (kind, help_text)
+    
+    def gauge_function(self, name, help_text, fn):
+        """Gauge read at render time: fn() -> number or {labels_tuple: number}"""
+        self.describe(name, "gauge", help_text)
+        self.callbacks[name] = fn
+    
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {"values": {}, "histograms": {}}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+    
+    def inc(self, name, value=1, **labels):
+        """Increment counter or gauge"""
+        values = self._shard()["values"]
+        key = (name, tuple(sorted(labels.items())))
+        values[key] = values.get(key, 0) + value
+    
+    def dec(self, name, value=1, **labels):
+        """Decrement gauge"""
+        self.inc(name, -value, **labels)
+    
+    def observe(self, name, value, **labels):
+        """Record one histogram sample"""
+        histograms = self._shard()["histograms"]
+        key = (name, tuple(sorted(labels.items())))
+        cell = histograms.get(key)
+        if cell is None:
+            # [bucket counts..., +Inf count, sum]
+            cell = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                cell[i] += 1
+                break
+        else:
+            cell[len(self.buckets)] += 1
+        cell[-1] += value
+    
+    def timer(self, name, in_flight=None, **labels):
+        """Context manager observing elapsed seconds (and an in-flight gauge)"""
+        return _MetricsTimer(self, name, in_flight, labels)
+    
+    def snapshot(self):
+        """Merged (values, histograms) across all thread shards"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        
+        values, histograms = {}, {}
+        for shard in shards:
+            for key, value in shard["values"].copy().items():
+                values[key] = values.get(key, 0) + value
+            for key, cell in shard["histograms"].copy().items():
+                merged = histograms.setdefault(key, [0] * len(cell))
+                for i, count in enumerate(list(cell)):
+                    merged[i] += count
+        return values, histograms
+    
+    def value(self, name, **labels):
+        """Current value of one counter/gauge series (0 if never touched)"""
+        values, _ = self.snapshot()
+        return values.get((name, tuple(sorted(labels.items()))), 0)
     
     @staticmethod
-    def handle_callback(callback_data):
-        """Handle callback button presses"""
-        callbacks = {
-            "btn_hello": "Salom! 👋",
-            "btn_help": "Yordam kerakmi? /help buyrug'ini kiriting",
-            "btn_info": "Info uchun /info buyrug'ini kiriting"
-        }
-        return callbacks.get(callback_data, "Noma'lum tugma 🤔")
+    def _escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    
+    @classmethod
+    def _labels(cls, pairs, extra=None):
+        pairs = list(pairs) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{cls._escape(v)}"' for k, v in pairs) + "}"
+    
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        values, histograms = self.snapshot()
+        for name, fn in self.callbacks.items():
+            try:
+                result = fn()
+            except Exception:
+                continue
+            if not isinstance(result, dict):
+                result = {(): result}
+            for labels, value in result.items():
+                values[(name, labels)] = value
+        
+        series = {}
+        for (name, labels), value in sorted(values.items(), key=repr):
+            series.setdefault(name, []).append(f"{name}{self._labels(labels)} {value}")
+        
+        for (name, labels), cell in sorted(histograms.items(), key=repr):
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets, cell):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._labels(labels, ('le', bound))} {cumulative}")
+            cumulative += cell[len(self.buckets)]
+            lines.append(f"{name}_bucket{self._labels(labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {cell[-1]}")
+            lines.append(f"{name}_count{self._labels(labels)} {cumulative}")
+        
+        out = []
+        for name in sorted(series):
+            kind, help_text = self.meta.get(name, ("untyped", ""))
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(series[name])
+        return "\n".join(out) + "\n"
 
 
-# ============= ENVIRONMENT LAYER =============
-class TelegramEnvironment:
-    """Environment layer - Telegram API communication"""
+class _MetricsTimer:
+    __slots__ = ("registry", "name", "in_flight", "labels", "started")
     
-    def __init__(self, is_simulator=False):
-        self.bot_token = os.environ.get("BOT_TOKEN", "YOUR_BOT_TOKEN")
-        self.api_url = f"https://api.telegram.org/bot{self.bot_token}"
-        self.is_simulator = is_simulator
-        self.app = BotApplication()
-        self.responses = []  # Store responses for tracking
+    def __init__(self, registry, name, in_flight, labels):
+        self.registry = registry
+        self.name = name
+        self.in_flight = in_flight
+        self.labels = labels
     
-    def send_message(self, chat_id, text, reply_markup=None):
-        """Send message via Telegram API or store for simulator"""
-        message_data = {
-            "chat_id": chat_id,
-            "text": text,
-            "method": "sendMessage"
+    def __enter__(self):
+        if self.in_flight:
+            self.registry.inc(self.in_flight)
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        if self.in_flight:
+            self.registry.dec(self.in_flight)
+        return False
+
+
+metrics = MetricsRegistry()
+metrics.describe("bot_updates_total", "counter", "Updates processed by type")
+metrics.describe("bot_commands_total", "counter", "Messages routed, by handler")
+metrics.describe("bot_errors_total", "counter", "Errors reported to BugHunter, by error_type")
+metrics.describe("bot_handler_seconds", "histogram", "Update processing time")
+metrics.describe("bot_api_request_seconds", "histogram", "Bot API call time per attempt, by method")
+metrics.describe("bot_api_responses_total", "counter", "Bot API responses by method and status")
+metrics.describe("bot_updates_in_flight", "gauge", "Updates being processed")
+metrics.describe("bot_api_requests_in_flight", "gauge", "Bot API calls waiting for a response")
+metrics.describe("bot_state_conflicts_total", "counter", "Conversation state writes rejected by version check")
+
+
+# ============= TRACING =============
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_NAMESPACE = os.environ.get("TRACE_NAMESPACE", "ServerlessBot")
+TRACE_STAGES = ("parse", "route", "handle", "send", "serialize")
+
+
+class _NoopSpan:
+    """Span of an unsampled trace - does nothing"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+    
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.trace.record(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class InvocationTrace:
+    """
+    Per-invocation stage timings, emitted as one structured log line
+    
+    Sampled invocations (TRACE_SAMPLE_RATE) record spans for parse, route,
+    handle, send (with one api.<method> span per Bot API call) and
+    serialize; emit() prints a CloudWatch Embedded Metric Format record.
+    Unsampled invocations share a no-op span and print nothing.
+    """
+    
+    __slots__ = ("sampled", "started", "spans", "properties")
+    
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE):
+        self.sampled = sample_rate >= 1.0 or (sample_rate > 0 and random.random() < sample_rate)
+        self.started = time.perf_counter()
+        self.spans = []  # (name, duration_ms)
+        self.properties = {}
+    
+    def span(self, name):
+        """Context manager timing one stage"""
+        if not self.sampled:
+            return _NOOP_SPAN
+        return _Span(self, name)
+    
+    def record(self, name, duration_ms):
+        # list.append is atomic - safe from fan-out threads
+        self.spans.append((name, duration_ms))
+    
+    def set(self, **properties):
+        if self.sampled:
+            self.properties.update(properties)
+    
+    def to_emf(self):
+        """Embedded Metric Format record: stage metrics + span details"""
+        stages = dict.fromkeys(TRACE_STAGES, 0.0)
+        outbound = 0.0
+        for name, duration in self.spans:
+            if name.startswith("api."):
+                outbound += duration
+            else:
+                stages[name] = stages.get(name, 0.0) + duration
+        
+        metrics = {f"{name}_ms": round(value, 3) for name, value in stages.items()}
+        metrics["outbound_ms"] = round(outbound, 3)
+        metrics["total_ms"] = round((time.perf_counter() - self.started) * 1000, 3)
+        
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": TRACE_NAMESPACE,
+                    "Dimensions": [["UpdateType"]],
+                    "Metrics": [{"Name": name, "Unit": "Milliseconds"} for name in metrics]
+                }]
+            },
+            "UpdateType": self.properties.pop("UpdateType", "unknown"),
+            **metrics,
+            **self.properties,
+            "spans": [{"name": name, "ms": round(duration, 3)} for name, duration in self.spans]
+        }
+    
+    def emit(self):
+        """Print EMF line (sampled invocations only)"""
+        if self.sampled:
+            print(json.dumps(self.to_emf(), default=str))
+
+
+# Default for adapters/environments built outside lambda_handler (stateless)
+_UNSAMPLED_TRACE = InvocationTrace(sample_rate=0)
+
+
+# ============= UPDATE MODELS =============
+class User:
+    """Telegram user (message sender / callback author)"""
+    
+    __slots__ = ("id", "first_name", "username", "is_bot")
+    
+    def __init__(self, id=None, first_name=None, username=None, is_bot=False):
+        self.id = id
+        self.first_name = first_name
+        self.username = username
+        self.is_bot = is_bot
+    
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return _NO_USER
+        return cls(data.get("id"), data.get("first_name"), data.get("username"),
+                   data.get("is_bot", False))
+
+
+class Chat:
+    """Telegram chat"""
+    
+    __slots__ = ("id", "type")
+    
+    def __init__(self, id=None, type=None):
+        self.id = id
+        self.type = type
+    
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return _NO_CHAT
+        return cls(data.get("id"), data.get("type"))
+
+
+_NO_USER = User()
+_NO_CHAT = Chat()
+
+
+class Message:
+    """
+    Incoming message, built once per update
+    
+    `raw` keeps the original dict for fields the model does not cover.
+    """
+    
+    __slots__ = ("message_id", "chat", "sender", "text", "raw")
+    
+    def __init__(self, message_id=None, chat=_NO_CHAT, sender=_NO_USER, text="", raw=None):
+        self.message_id = message_id
+        self.chat = chat
+        self.sender = sender
+        self.text = text
+        self.raw = raw
+    
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        return cls(
+            data.get("message_id"),
+            Chat.from_dict(data.get("chat")),
+            User.from_dict(data.get("from")),
+            data.get("text") or "",
+            data
+        )
+
+
+class CallbackQuery:
+    """Inline button click"""
+    
+    __slots__ = ("id", "data", "sender", "message", "raw")
+    
+    def __init__(self, id=None, data="", sender=_NO_USER, message=None, raw=None):
+        self.id = id
+        self.data = data
+        self.sender = sender
+        self.message = message
+        self.raw = raw
+    
+    @property
+    def chat_id(self):
+        """Chat of the message carrying the button (None for inline messages)"""
+        return self.message.chat.id if self.message is not None else None
+    
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        return cls(
+            data.get("id"),
+            data.get("data") or "",
+            User.from_dict(data.get("from")),
+            Message.from_dict(data.get("message")),
+            data
+        )
+
+
+class OutgoingAction:
+    """Bot API call planned by a handler, run by TelegramEnvironment.execute_actions()"""
+    
+    __slots__ = ("method", "params", "ordered")
+    
+    def __init__(self, method, params, ordered=False):
+        self.method = method
+        self.params = params
+        self.ordered = ordered
+    
+    def __repr__(self):
+        return f"OutgoingAction({self.method!r}, {self.params!r}, ordered={self.ordered})"
+
+
+# ============= RESPONSE TEMPLATES =============
+class PreparedText(str):
+    """Static reply text with its JSON encoding computed once"""
+    
+    def __new__(cls, text):
+        self = super().__new__(cls, text)
+        self.json = json_dumps(str(text))
+        return self
+
+
+class PreparedMarkup(dict):
+    """
+    Read-only reply_markup with its JSON encoding computed once
+    
+    Shared between updates, so mutation raises TypeError.
+    """
+    
+    def __init__(self, markup):
+        super().__init__({key: _freeze(value) for key, value in markup.items()})
+        self.json = json_dumps(self)
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("prepared markup is read-only")
+    
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+class _FrozenDict(PreparedMarkup):
+    """Nested read-only dict (button), no own JSON"""
+    
+    def __init__(self, data):
+        dict.__init__(self, {key: _freeze(value) for key, value in data.items()})
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return _FrozenDict(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ReplyTemplate:
+    """
+    Parameterized reply, parsed once: render(**params) only concatenates
+    
+    Placeholders use str.format syntax without format specs: "Salom {name}!".
+    """
+    
+    __slots__ = ("text", "literals", "fields")
+    
+    def __init__(self, text):
+        self.text = text
+        self.literals = []
+        self.fields = []
+        for literal, field, _, _ in string.Formatter().parse(text):
+            self.literals.append(literal)
+            if field is not None:
+                self.fields.append(field)
+        if len(self.literals) == len(self.fields):
+            self.literals.append("")
+    
+    def render(self, **params):
+        literals = self.literals
+        if len(self.fields) == 1:
+            return f"{literals[0]}{params[self.fields[0]]}{literals[1]}"
+        parts = [literals[0]]
+        for field, literal in zip(self.fields, literals[1:]):
+            parts.append(str(params[field]))
+            parts.append(literal)
+        return "".join(parts)
+
+
+class TemplateRegistry:
+    """Replies and keyboards compiled once at import, looked up by name"""
+    
+    def __init__(self):
+        self._items = {}
+    
+    def text(self, name, text):
+        """Register static reply text"""
+        self._items[name] = PreparedText(text)
+        return self._items[name]
+    
+    def template(self, name, text):
+        """Register parameterized reply"""
+        self._items[name] = ReplyTemplate(text)
+        return self._items[name]
+    
+    def keyboard(self, name, *rows):
+        """Register inline keyboard: rows of (text, callback_data) pairs"""
+        self._items[name] = PreparedMarkup({
+            "inline_keyboard": [
+                [{"text": text, "callback_data": data} for text, data in row]
+                for row in rows
+            ]
+        })
+        return self._items[name]
+    
+    def __getitem__(self, name):
+        return self._items[name]
+
+
+_PREPARED_TYPES = (PreparedText, PreparedMarkup)
+
+
+def encode_payload(payload):
+    """
+    JSON body for a Bot API call
+    
+    Other parameters are encoded in one go; prepared texts and markups
+    are appended from their cached encoding.
+    """
+    plain = {}
+    prepared = ""
+    for key, value in payload.items():
+        if type(value) in _PREPARED_TYPES:
+            prepared += f',"{key}":{value.json}'
+        else:
+            plain[key] = value
+    
+    body = json_dumps(plain)
+    if not prepared:
+        return body.encode("utf-8")
+    if not plain:
+        return ("{" + prepared[1:] + "}").encode("utf-8")
+    return (body[:-1] + prepared + "}").encode("utf-8")
+
+
+templates = TemplateRegistry()
+
+
+# ============= APPLICATION LAYER =============
+templates.template("start", "Assalomu alaikum {name}! 👋\n\nMen sizning assistant botingiman. Men bilan ham qanday ishlashni keyinroq bilib olasiz!")
+templates.text("help", """📖 Mening buyruqlarim:
+
+/start - Boshlang'ich xabar
+/help - Bu xabar
+/info - Men haqimda ma'lumot
+/echo <text> - Xabarni takrorlash
+
+Shuningdek, qayta ishlanuvchi tugmalar bilan o'ynay olasiz! 🎮""")
+templates.text("info", """ℹ️ Men haqimda:
+
+Men aiogramda yozilgan bot.
+Webhook rejimida ishlayman.
+Serverless infrastructureda (AWS Lambda) joylashtirildim.
+
+Muloqotingiz uchun rahmat! ❤️""")
+templates.template("echo", "Siz yuborganingiz: {text} ✅")
+templates.text("btn_hello", "Salom! 👋")
+templates.text("btn_help", "Yordam kerakmi? /help buyrug'ini kiriting")
+templates.text("btn_info", "Info uchun /info buyrug'ini kiriting")
+templates.text("btn_unknown", "Noma'lum tugma 🤔")
+templates.keyboard(
+    "start_keyboard",
+    [("👋 Salom", "btn_hello"), ("❓ Yordam", "btn_help")],
+    [("ℹ️ Info", "btn_info")]
+)
+
+
+class BotApplication:
+    """Application layer - business logic for bot responses"""
+    
+    # callback_data -> prepared answer
+    CALLBACKS = {
+        "btn_hello": templates["btn_hello"],
+        "btn_help": templates["btn_help"],
+        "btn_info": templates["btn_info"]
+    }
+    
+    @staticmethod
+    def handle_start_command(user_id, user_first_name=None):
+        """Handle /start command"""
+        return templates["start"].render(name=user_first_name or "Foydalanuvchi")
+    
+    @staticmethod
+    def handle_help_command():
+        """Handle /help command"""
+        return templates["help"]
+    
+    @staticmethod
+    def handle_info_command():
+        """Handle /info command"""
+        return templates["info"]
+    
+    @staticmethod
+    def handle_echo_message(text):
+        """Echo user's message"""
+        return templates["echo"].render(text=text)
+    
+    @staticmethod
+    def handle_callback(callback_data):
+        """Handle callback button presses"""
+        return BotApplication.CALLBACKS.get(callback_data) or templates["btn_unknown"]
+
+
+# ============= ROUTER =============
+BOT_USERNAME = os.environ.get("BOT_USERNAME", "").lstrip("@")
+
+
+class CommandRouter:
+    """
+    Table-driven update router
+    
+    Commands, aliases and callback_data values are looked up in dicts built
+    once at import time. Prefix fallbacks use a character trie (longest
+    prefix wins), regex fallbacks are precompiled and tried in
+    registration order.
+    
+    Message handlers: handler(adapter, message, args) -> (response_text, reply_markup)
+    Callback handlers: handler(adapter, callback_query, data) -> response_text
+    (message / callback_query are Message / CallbackQuery models)
+    """
+    
+    _END = object()  # trie terminal key
+    
+    def __init__(self, bot_username=BOT_USERNAME):
+        self.bot_username = bot_username.lower()
+        self.commands = {}
+        self.callbacks = {}
+        self._text_trie = {}
+        self._callback_trie = {}
+        self.patterns = []
+        self.unknown_command = None
+        self.text_handler = None
+    
+    def for_username(self, bot_username):
+        """Router sharing all routes, checking @mentions against another bot"""
+        import copy
+        
+        router = copy.copy(self)
+        router.bot_username = (bot_username or "").lower()
+        return router
+    
+    # ----- registration -----
+    def command(self, name, *aliases):
+        """Register handler for /command and its aliases"""
+        def decorator(handler):
+            for command in (name, *aliases):
+                self.commands["/" + command.lstrip("/")] = handler
+            return handler
+        return decorator
+    
+    def callback(self, *values, prefix=None):
+        """Register callback_data handler for exact values and/or a prefix"""
+        def decorator(handler):
+            for value in values:
+                self.callbacks[value] = handler
+            if prefix is not None:
+                self._trie_insert(self._callback_trie, prefix, handler)
+            return handler
+        return decorator
+    
+    def prefix(self, text_prefix):
+        """Register message handler for texts starting with text_prefix"""
+        def decorator(handler):
+            self._trie_insert(self._text_trie, text_prefix, handler)
+            return handler
+        return decorator
+    
+    def regex(self, pattern, flags=0):
+        """Register message handler for texts matching pattern (re.match)"""
+        def decorator(handler):
+            self.patterns.append((re.compile(pattern, flags), handler))
+            return handler
+        return decorator
+    
+    def fallback(self, kind):
+        """Register handler for unknown commands ("command") or plain text ("text")"""
+        def decorator(handler):
+            if kind == "command":
+                self.unknown_command = handler
+            else:
+                self.text_handler = handler
+            return handler
+        return decorator
+    
+    # ----- trie -----
+    def _trie_insert(self, trie, key, handler):
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[self._END] = handler
+    
+    def _trie_longest(self, trie, text):
+        """Handler of the longest registered prefix of text, or None"""
+        node = trie
+        found = node.get(self._END)
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(self._END, found)
+        return found
+    
+    # ----- dispatch -----
+    def resolve_message(self, text):
+        """
+        Find handler for message text
+        
+        Returns:
+            (handler, args) - handler is None if the command is addressed
+            to another bot (/cmd@otherbot) or nothing matched
+        """
+        if text[0] == "/":
+            parts = text.split(maxsplit=1)
+            command, _, mention = parts[0].partition("@")
+            if mention and self.bot_username and mention.lower() != self.bot_username:
+                return None, None
+            
+            handler = self.commands.get(command)
+            if handler is not None:
+                return handler, parts[1] if len(parts) > 1 else ""
+        
+        handler = self._trie_longest(self._text_trie, text)
+        if handler is not None:
+            return handler, text
+        
+        for pattern, handler in self.patterns:
+            match = pattern.match(text)
+            if match:
+                return handler, match
+        
+        if text[0] == "/":
+            return self.unknown_command, text.split(maxsplit=1)[0]
+        return self.text_handler, text
+    
+    def resolve_callback(self, data):
+        """Find handler for callback_data (exact value, then longest prefix)"""
+        handler = self.callbacks.get(data)
+        if handler is None:
+            handler = self._trie_longest(self._callback_trie, data)
+        return handler
+
+
+command_router = CommandRouter()
+
+
+@command_router.command("start")
+def _route_start(adapter, message, args):
+    sender = message.sender
+    return (
+        adapter.env.app.handle_start_command(sender.id, sender.first_name),
+        adapter._get_start_keyboard()
+    )
+
+
+@command_router.command("help")
+def _route_help(adapter, message, args):
+    return adapter.env.app.handle_help_command(), None
+
+
+@command_router.command("info")
+def _route_info(adapter, message, args):
+    return adapter.env.app.handle_info_command(), None
+
+
+@command_router.command("echo")
+def _route_echo(adapter, message, args):
+    if not args:
+        return "Foydalanish: /echo <sizning xabaringiz>", None
+    return adapter.env.app.handle_echo_message(args), None
+
+
+@command_router.fallback("command")
+def _route_unknown_command(adapter, message, command):
+    return f"Noma'lum buyruq: {command}\n/help buyrug'ini kiriting", None
+
+
+@command_router.fallback("text")
+def _route_text(adapter, message, text):
+    # Regular text message - echo it
+    return adapter.env.app.handle_echo_message(text), None
+
+
+@command_router.callback(prefix="")
+def _route_callback(adapter, callback_query, data):
+    return adapter.env.app.handle_callback(data)
+
+
+# ============= ENVIRONMENT LAYER =============
+class TelegramEnvironment:
+    """Environment layer - Telegram API communication"""
+    
+    __slots__ = (
+        "tenant", "bot_token", "api", "rate_limiter", "deadline", "trace", "is_simulator", "app",
+        "responses", "webhook_reply", "webhook_reply_call"
+    )
+    
+    # Bot API method -> environment method used by execute_actions()
+    ACTION_METHODS = {
+        "sendMessage": "send_message",
+        "answerCallbackQuery": "answer_callback_query",
+    }
+    
+    def __init__(self, is_simulator=False, api=None, webhook_reply=False, limiter=None,
+                 deadline=None, trace=None, tenant=None):
+        self.tenant = tenant or tenant_registry.default()
+        self.bot_token = self.tenant.token
+        self.api = api or self.tenant.api
+        self.rate_limiter = limiter or self.tenant.rate_limiter
+        self.deadline = deadline or Deadline()
+        self.trace = trace or _UNSAMPLED_TRACE
+        self.is_simulator = is_simulator
+        self.app = BotApplication()
+        self.responses = []  # Store responses for tracking
+        self.webhook_reply = webhook_reply
+        self.webhook_reply_call = None  # {"method": ..., **params} for HTTP response
+    
+    @property
+    def api_url(self):
+        return f"{self.api.base_url}/bot{self.bot_token}"
+    
+    def _defer_to_webhook_reply(self, method, payload):
+        """
+        Keep the first API call of the update for the webhook HTTP response
+        
+        Telegram executes a method returned in the webhook response body, so
+        the first call costs no extra round trip. Its result is not known, and
+        it is executed after any calls made over HTTP in the same invocation.
+        
+        Returns:
+            True if the call was deferred and must not be sent
+        """
+        if not self.webhook_reply or self.webhook_reply_call is not None:
+            return False
+        
+        self.webhook_reply_call = {"method": method, **payload}
+        return True
+    
+    def _call_rate_limited(self, chat_id, method, payload):
+        """
+        Call chat-targeted method within send limits
+        
+        On HTTP 429 the chat is blocked for retry_after and the call is
+        retried (up to SEND_429_RETRIES times) once the limiter allows it.
+        
+        Raises:
+            RateLimitExceeded: the wait would exceed the limiter's max_wait
+            DeadlineExceeded: the wait would outlast the invocation deadline
+        """
+        for attempt in range(SEND_429_RETRIES + 1):
+            budget = self.deadline.remaining()
+            try:
+                self.rate_limiter.acquire(chat_id, max_wait=min(self.rate_limiter.max_wait, budget))
+            except RateLimitExceeded as e:
+                if budget < self.rate_limiter.max_wait:
+                    raise DeadlineExceeded(str(e)) from e
+                raise
+            with self.trace.span("api." + method):
+                response = self.api.request(self.bot_token, method, payload, deadline=self.deadline)
+            if response.status_code != 429:
+                return response
+            
+            retry_after = self.rate_limiter.retry_after(response)
+            print(f"[RATE_LIMIT] 429 for chat {chat_id}, retry after {retry_after}s")
+            self.rate_limiter.backoff(chat_id, retry_after)
+        return response
+    
+    @staticmethod
+    def action(method, ordered=False, **params):
+        """
+        Build outgoing action for execute_actions()
+        
+        Args:
+            method: Bot API method name (key of ACTION_METHODS)
+            ordered: Run after the previous ordered action finished
+            **params: Keyword arguments of the environment method
+        """
+        return OutgoingAction(method, params, ordered)
+    
+    def _run_action(self, action):
+        """
+        Run single action and measure its duration
+        
+        Without enough deadline budget the action is not started: it is
+        moved into the webhook reply if that slot is still free (no network
+        needed), otherwise dropped with "skipped": "deadline".
+        """
+        started = time.perf_counter()
+        outcome = {"method": action.method, "ordered": action.ordered}
+        
+        reply_free = self.webhook_reply and self.webhook_reply_call is None
+        if not self.is_simulator and not reply_free and not self.deadline.fits():
+            print(f"[DEADLINE] ⏱️  {action.method} dropped, "
+                  f"{self.deadline.remaining() * 1000:.0f} ms left")
+            outcome.update({"result": None, "skipped": "deadline", "duration_ms": 0.0})
+            return outcome
+        
+        handler = getattr(self, self.ACTION_METHODS[action.method])
+        try:
+            result = handler(**action.params)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        outcome.update({
+            "result": result,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        })
+        return outcome
+    
+    def _run_ordered(self, actions):
+        """Run ordered actions one after another"""
+        return [self._run_action(action) for action in actions]
+    
+    def execute_actions(self, actions):
+        """
+        Execute outgoing actions of one update
+        
+        Unordered actions run concurrently on the shared worker pool; ordered
+        actions run sequentially in list order (as one task next to the
+        unordered ones). In webhook-reply mode the action that is allowed to
+        execute last (the final ordered one, or the first action when none
+        are ordered) is taken for the HTTP response before fan-out.
+        
+        Returns:
+            {"wall_ms": total time, "calls": per-action results in list order}
+        """
+        started = time.perf_counter()
+        if len(actions) == 1:
+            # Common case: one reply, nothing to fan out
+            calls = [self._run_action(actions[0])]
+            return {
+                "wall_ms": round((time.perf_counter() - started) * 1000, 2),
+                "calls": calls
+            }
+        
+        results = [None] * len(actions)
+        ordered = [i for i, action in enumerate(actions) if action.ordered]
+        
+        if self.webhook_reply and self.webhook_reply_call is None and actions:
+            reply_index = ordered.pop() if ordered else 0
+            results[reply_index] = self._run_action(actions[reply_index])
+        
+        tasks = [[i] for i, result in enumerate(results) if result is None and i not in ordered]
+        if ordered:
+            tasks.append(ordered)
+        
+        if len(tasks) == 1:
+            outcomes = [self._run_ordered([actions[i] for i in tasks[0]])]
+        else:
+            futures = [
+                get_fanout_pool().submit(self._run_ordered, [actions[i] for i in task])
+                for task in tasks
+            ]
+            outcomes = [future.result() for future in futures]
+        
+        for task, outcome in zip(tasks, outcomes):
+            for i, result in zip(task, outcome):
+                results[i] = result
+        
+        return {
+            "wall_ms": round((time.perf_counter() - started) * 1000, 2),
+            "calls": results
+        }
+    
+    def send_message(self, chat_id, text, reply_markup=None):
+        """Send message via Telegram API or store for simulator"""
+        message_data = {
+            "chat_id": chat_id,
+            "text": text,
+            "method": "sendMessage"
         }
         
         if self.is_simulator:
@@ -154,326 +1769,1452 @@ class TelegramEnvironment:
             return {"success": True, "response_text": text}
         
         try:
-            payload = {
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": "HTML"
-            }
+            payload = {
+                "chat_id": chat_id,
+                "text": text,
+                "parse_mode": "HTML"
+            }
+            
+            if reply_markup:
+                payload["reply_markup"] = reply_markup
+            
+            if self._defer_to_webhook_reply("sendMessage", payload):
+                self.responses.append(message_data)
+                return {
+                    "success": True,
+                    "response_text": text,
+                    "webhook_reply": True
+                }
+            
+            response = self._call_rate_limited(chat_id, "sendMessage", encode_payload(payload))
+            
+            if response.status_code == 200:
+                self.responses.append(message_data)
+            
+            return {
+                "success": response.status_code == 200,
+                "response_text": text,
+                "status_code": response.status_code
+            }
+        except RateLimitExceeded as e:
+            print(f"[RATE_LIMIT] ⚠️  Message dropped: {e}")
+            return {
+                "success": False,
+                "response_text": text,
+                "error": "rate_limited"
+            }
+        except DeadlineExceeded as e:
+            print(f"[DEADLINE] ⏱️  Message dropped: {e}")
+            return {
+                "success": False,
+                "response_text": text,
+                "skipped": "deadline"
+            }
+        except Exception as e:
+            error_msg = f"Error sending message: {str(e)}"
+            stack_trace = traceback.format_exc()
+            print(error_msg)
+            print(stack_trace)
+            
+            # Log to bug hunter bot
+            bug_hunter.log_error(
+                error_type="SEND_MESSAGE_ERROR",
+                error_msg=error_msg,
+                stack_trace=stack_trace,
+                context_data={
+                    "chat_id": chat_id,
+                    "text_length": len(text),
+                    "has_reply_markup": reply_markup is not None
+                }
+            )
+            
+            return {
+                "success": False,
+                "response_text": f"Xato: {str(e)}",
+                "error": str(e)
+            }
+    
+    def answer_callback_query(self, callback_query_id, text=None, show_alert=False):
+        """Answer callback query (button click notification)"""
+        if self.is_simulator:
+            print(f"[SIMULATOR] Callback answer: {text}")
+            self.responses.append({
+                "method": "answerCallbackQuery",
+                "callback_query_id": callback_query_id,
+                "text": text
+            })
+            return True
+        
+        try:
+            payload = {
+                "callback_query_id": callback_query_id,
+                "show_alert": show_alert
+            }
+            
+            if text:
+                payload["text"] = text
+            
+            if self._defer_to_webhook_reply("answerCallbackQuery", payload):
+                return True
+            
+            with self.trace.span("api.answerCallbackQuery"):
+                response = self.api.request(
+                    self.bot_token, "answerCallbackQuery", encode_payload(payload),
+                    deadline=self.deadline
+                )
+            
+            return response.status_code == 200
+        except DeadlineExceeded as e:
+            print(f"[DEADLINE] ⏱️  Callback answer dropped: {e}")
+            return False
+        except Exception as e:
+            error_msg = f"Error answering callback: {str(e)}"
+            stack_trace = traceback.format_exc()
+            print(error_msg)
+            print(stack_trace)
+            
+            # Log to bug hunter bot
+            bug_hunter.log_error(
+                error_type="CALLBACK_QUERY_ERROR",
+                error_msg=error_msg,
+                stack_trace=stack_trace,
+                context_data={
+                    "callback_query_id": callback_query_id,
+                    "text": text
+                }
+            )
+            
+            return False
+
+
+# ============= ADAPTER LAYER =============
+class TelegramAdapter:
+    """
+    Adapter layer - bridges Lambda webhook events to bot logic
+    Routes updates to appropriate handlers (commands, callbacks, messages)
+    """
+    
+    __slots__ = ("is_simulator", "tenant", "router", "trace", "env", "state")
+    
+    def __init__(self, is_simulator=False, webhook_reply=False, router=None, deadline=None,
+                 trace=None, tenant=None, state=None):
+        self.is_simulator = is_simulator
+        self.tenant = tenant or tenant_registry.default()
+        self.router = router or self.tenant.router
+        self.trace = trace or _UNSAMPLED_TRACE
+        # per-user / per-chat state for route handlers (scoped to this bot)
+        self.state = state or state_store.session(self.tenant.namespace)
+        self.env = TelegramEnvironment(
+            is_simulator=is_simulator,
+            webhook_reply=webhook_reply,
+            deadline=deadline,
+            trace=self.trace,
+            tenant=self.tenant
+        )
+    
+    def _get_start_keyboard(self):
+        """Start command keyboard (prepared once, read-only)"""
+        return templates["start_keyboard"]
+    
+    def process_update(self, update_dict):
+        """
+        Process incoming webhook update
+        Routes to message handler, command handler, or callback handler
+        
+        Args:
+            update_dict: Raw Telegram update dictionary
+        
+        Returns:
+            Processing result with response
+        """
+        try:
+            # Handle message updates
+            if "message" in update_dict:
+                self.trace.set(UpdateType="message")
+                metrics.inc("bot_updates_total", type="message")
+                return self._handle_message(Message.from_dict(update_dict["message"]))
+            
+            # Handle callback query updates (button clicks)
+            elif "callback_query" in update_dict:
+                self.trace.set(UpdateType="callback_query")
+                metrics.inc("bot_updates_total", type="callback_query")
+                return self._handle_callback_query(CallbackQuery.from_dict(update_dict["callback_query"]))
+            
+            # Other updates are ignored (channel posts, edited messages, etc.)
+            else:
+                self.trace.set(UpdateType="other")
+                metrics.inc("bot_updates_total", type="other")
+                return {
+                    "success": True,
+                    "message": "Update type not handled (ignored)",
+                    "is_simulator": self.is_simulator
+                }
+        
+        except Exception as e:
+            error_msg = f"Update processing failed: {str(e)}"
+            stack_trace = traceback.format_exc()
+            print(f"[ERROR] {error_msg}")
+            print(stack_trace)
+            
+            # Log to bug hunter bot
+            bug_hunter.log_error(
+                error_type="UPDATE_PROCESSING_ERROR",
+                error_msg=error_msg,
+                stack_trace=stack_trace,
+                context_data={
+                    "update_type": type(update_dict).__name__,
+                    "update_keys": list(update_dict.keys()) if isinstance(update_dict, dict) else None
+                }
+            )
+            
+            return {
+                "success": False,
+                "message": str(e),
+                "error": str(e),
+                "is_simulator": self.is_simulator
+            }
+    
+    def _handle_message(self, message):
+        """Handle incoming message updates"""
+        if message is None:
+            return {"success": True, "message": "Empty message ignored"}
+        
+        chat_id = message.chat.id
+        user_id = message.sender.id
+        text = message.text.strip()
+        try:
+            if not text:
+                return {"success": True, "message": "Empty message ignored"}
             
-            if reply_markup:
-                payload["reply_markup"] = reply_markup
+            # Route to command or message handler
+            with self.trace.span("route"):
+                handler, args = self.router.resolve_message(text)
+            if handler is None:
+                return {"success": True, "message": "Command for another bot ignored"}
+            metrics.inc("bot_commands_total", command=handler.__name__.replace("_route_", "", 1))
             
-            response = requests.post(
-                f"{self.api_url}/sendMessage",
-                json=payload,
-                timeout=10
-            )
+            with self.trace.span("handle"):
+                response_text, keyboard = handler(self, message, args)
             
-            if response.status_code == 200:
-                self.responses.append(message_data)
+            # Send response
+            buttons = None
+            actions = None
+            if response_text:
+                with self.trace.span("send"):
+                    actions = self.env.execute_actions([
+                        self.env.action(
+                            "sendMessage",
+                            chat_id=chat_id,
+                            text=response_text,
+                            reply_markup=keyboard
+                        )
+                    ])
+                if keyboard:
+                    buttons = keyboard
             
             return {
-                "success": response.status_code == 200,
-                "response_text": text,
-                "status_code": response.status_code
+                "success": True,
+                "message": "Message processed",
+                "response_text": response_text,
+                "buttons": buttons,
+                "actions": actions,
+                "is_simulator": self.is_simulator,
+                "responses": self.env.responses if self.is_simulator else ()
             }
+        
         except Exception as e:
-            error_msg = f"Error sending message: {str(e)}"
+            error_msg = f"Message handling failed: {str(e)}"
             stack_trace = traceback.format_exc()
-            print(error_msg)
+            print(f"[ERROR] {error_msg}")
             print(stack_trace)
             
             # Log to bug hunter bot
-            bug_hunter = BugHunter()
             bug_hunter.log_error(
-                error_type="SEND_MESSAGE_ERROR",
+                error_type="MESSAGE_HANDLER_ERROR",
                 error_msg=error_msg,
                 stack_trace=stack_trace,
                 context_data={
                     "chat_id": chat_id,
-                    "text_length": len(text),
-                    "has_reply_markup": reply_markup is not None
+                    "user_id": user_id,
+                    "text": text[:100] if text else None
                 }
             )
             
             return {
                 "success": False,
-                "response_text": f"Xato: {str(e)}",
-                "error": str(e)
+                "message": str(e),
+                "error": str(e),
+                "is_simulator": self.is_simulator
             }
     
-    def answer_callback_query(self, callback_query_id, text=None, show_alert=False):
-        """Answer callback query (button click notification)"""
-        if self.is_simulator:
-            print(f"[SIMULATOR] Callback answer: {text}")
-            self.responses.append({
-                "method": "answerCallbackQuery",
-                "callback_query_id": callback_query_id,
-                "text": text
-            })
-            return True
+    def _handle_callback_query(self, callback_query):
+        """Handle callback query updates (button clicks)"""
+        if callback_query is None:
+            return {"success": True, "message": "Empty callback query ignored"}
         
+        callback_id = callback_query.id
+        callback_data = callback_query.data
+        chat_id = callback_query.chat_id
         try:
-            payload = {
-                "callback_query_id": callback_query_id,
-                "show_alert": show_alert
-            }
-            
-            if text:
-                payload["text"] = text
+            # Get response text for this callback
+            with self.trace.span("route"):
+                handler = self.router.resolve_callback(callback_data)
+            with self.trace.span("handle"):
+                response_text = handler(self, callback_query, callback_data)
             
-            response = requests.post(
-                f"{self.api_url}/answerCallbackQuery",
-                json=payload,
-                timeout=10
-            )
+            # Answer the callback query (show notification) and send
+            # response message - independent, so they run concurrently
+            batch = [
+                self.env.action(
+                    "answerCallbackQuery",
+                    callback_query_id=callback_id,
+                    text=response_text,
+                    show_alert=False
+                )
+            ]
+            if chat_id:
+                batch.append(
+                    self.env.action("sendMessage", chat_id=chat_id, text=response_text)
+                )
+            with self.trace.span("send"):
+                actions = self.env.execute_actions(batch)
             
-            return response.status_code == 200
+            return {
+                "success": True,
+                "message": "Callback processed",
+                "response_text": response_text,
+                "buttons": None,
+                "actions": actions,
+                "is_simulator": self.is_simulator,
+                "responses": self.env.responses if self.is_simulator else ()
+            }
+        
         except Exception as e:
-            error_msg = f"Error answering callback: {str(e)}"
+            error_msg = f"Callback handling failed: {str(e)}"
             stack_trace = traceback.format_exc()
-            print(error_msg)
+            print(f"[ERROR] {error_msg}")
             print(stack_trace)
             
             # Log to bug hunter bot
-            bug_hunter = BugHunter()
             bug_hunter.log_error(
-                error_type="CALLBACK_QUERY_ERROR",
+                error_type="CALLBACK_HANDLER_ERROR",
                 error_msg=error_msg,
                 stack_trace=stack_trace,
                 context_data={
-                    "callback_query_id": callback_query_id,
-                    "text": text
+                    "callback_id": callback_id,
+                    "callback_data": callback_data,
+                    "chat_id": chat_id
                 }
             )
             
+            return {
+                "success": False,
+                "message": str(e),
+                "error": str(e),
+                "is_simulator": self.is_simulator
+            }
+
+
+# ============= UPDATE SCHEDULER =============
+class ChatLaneScheduler:
+    """
+    Per-chat ordered, cross-chat parallel update processing
+    
+    Updates are sharded by chat (see update_key) into serial lanes. A lane
+    is processed by at most one worker at a time, so replies within a chat
+    keep their order, while different chats run in parallel on the shared
+    workers. Ready lanes are served round-robin and a worker takes at most
+    `quantum` updates from a lane per turn, so one chatty user cannot starve
+    the others.
+    
+    Backpressure is per lane: only the first lane_limit updates of a lane
+    count against max_pending. Further updates of a busy chat are parked
+    on its lane without blocking submit(), so the caller keeps pulling
+    updates of other chats instead of waiting behind one chat's backlog.
+    
+    Args:
+        process: Callable(update) -> result, e.g. TelegramAdapter().process_update
+        workers: Number of worker threads
+        quantum: Updates processed from one lane before moving to the next
+        max_pending: submit() blocks while this many updates count against
+            the limit (None = unbounded)
+        lane_limit: Updates of one lane counted against max_pending, the
+            rest are parked (default: max_pending / workers, at least 1)
+        max_parked: submit() of an update that would be parked blocks while
+            this many are parked (None = unbounded)
+    """
+    
+    def __init__(self, process, workers=4, quantum=1, max_pending=None, lane_limit=None,
+                 max_parked=None):
+        self.process = process
+        self.quantum = quantum
+        self.lanes = {}  # key -> deque of (update, future)
+        self.sizes = {}  # key -> queued + running updates of the lane
+        self.ready = deque()  # keys of lanes waiting for a worker (not running)
+        self.pending = 0  # queued or running, parked included
+        self.admitted = 0  # pending updates counted against max_pending
+        self.max_pending = max_pending
+        self.lane_limit = lane_limit or (
+            max(max_pending // max(workers, 1), 1) if max_pending is not None else None
+        )
+        self.max_parked = max_parked
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"chat-lane-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    @property
+    def parked(self):
+        """Pending updates beyond their lane's limit"""
+        return self.pending - self.admitted
+    
+    @staticmethod
+    def update_key(update):
+        """
+        Ordering key: chat id, sender id for callback queries, else the update itself
+        
+        Null or malformed payloads ({"message": null}) get their own lane.
+        """
+        def field_of(obj, name):
+            value = obj.get(name) if isinstance(obj, dict) else None
+            return value if isinstance(value, dict) else {}
+        
+        for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+            chat_id = field_of(field_of(update, field), "chat").get("id")
+            if chat_id is not None:
+                return chat_id
+        
+        user_id = field_of(field_of(update, "callback_query"), "from").get("id")
+        if user_id is not None:
+            return user_id
+        
+        # No ordering requirement - unique lane per update
+        update_id = update.get("update_id") if isinstance(update, dict) else None
+        return ("update", update_id, id(update))
+    
+    def _admits(self, key):
+        """True if the next update of lane `key` counts against max_pending"""
+        return self.lane_limit is None or self.sizes.get(key, 0) < self.lane_limit
+    
+    def _has_room(self, key):
+        if self._closed:
+            return True
+        if self._admits(key):
+            return self.max_pending is None or self.admitted < self.max_pending
+        return self.max_parked is None or self.parked < self.max_parked
+    
+    def submit(self, update):
+        """
+        Queue update on its chat lane
+        
+        Returns:
+            concurrent.futures.Future resolved with process(update)
+        """
+        from concurrent.futures import Future
+        
+        future = Future()
+        key = self.update_key(update)
+        with self._cond:
+            self._cond.wait_for(lambda: self._has_room(key))
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            
+            if self._admits(key):
+                self.admitted += 1
+            lane = self.lanes.get(key)
+            if lane is None:
+                lane = self.lanes[key] = deque()
+                self.ready.append(key)
+            lane.append((update, future))
+            self.sizes[key] = self.sizes.get(key, 0) + 1
+            self.pending += 1
+            self._cond.notify_all()
+        return future
+    
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.ready or self._closed)
+                if not self.ready:
+                    return
+                key = self.ready.popleft()
+                lane = self.lanes[key]
+                batch = [lane.popleft() for _ in range(min(self.quantum, len(lane)))]
+            
+            for update, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self.process(update))
+                except Exception as e:
+                    future.set_exception(e)
+            
+            with self._cond:
+                size = self.sizes[key]
+                left = size - len(batch)
+                if self.lane_limit is None:
+                    self.admitted -= len(batch)
+                else:
+                    # Parked updates of the lane move up into the freed slots
+                    self.admitted -= min(size, self.lane_limit) - min(left, self.lane_limit)
+                self.pending -= len(batch)
+                if lane:
+                    self.sizes[key] = left
+                    # Back of the run queue: other chats get their turn first
+                    self.ready.append(key)
+                else:
+                    del self.lanes[key]
+                    del self.sizes[key]
+                self._cond.notify_all()
+    
+    def join(self, timeout=None):
+        """Wait until all submitted updates are processed"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.pending == 0, timeout)
+    
+    def shutdown(self, wait=True):
+        """Stop workers after queued updates are processed"""
+        if wait:
+            self.join()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+# ============= UPDATE DEDUPLICATION =============
+DEDUP_MAX_SIZE = int(os.environ.get("DEDUP_MAX_SIZE", "10000"))
+DEDUP_TTL = float(os.environ.get("DEDUP_TTL", "3600"))  # Telegram retries for ~1 hour
+DEDUP_STORE = os.environ.get("DEDUP_STORE", "")  # "", sqlite:///path or redis://host:port/db
+
+
+class SqliteDedupStore:
+    """Shared seen-update store in a SQLite file (local stand-in for Redis)"""
+    
+    def __init__(self, path):
+        import sqlite3
+        
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen_updates (key TEXT PRIMARY KEY, expires_at REAL)"
+        )
+        self._lock = threading.Lock()
+    
+    def add_if_absent(self, key, ttl):
+        """Atomically mark key as seen, True if it was not seen before"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM seen_updates WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO seen_updates (key, expires_at) VALUES (?, ?)",
+                (key, now + ttl)
+            )
+            return cursor.rowcount == 1
+    
+    def discard(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM seen_updates WHERE key = ?", (key,))
+
+
+class RedisDedupStore:
+    """Shared seen-update store on any client with Redis SET NX EX semantics"""
+    
+    def __init__(self, client, prefix="tg:update:"):
+        self.client = client
+        self.prefix = prefix
+    
+    def add_if_absent(self, key, ttl):
+        return bool(self.client.set(self.prefix + key, 1, nx=True, ex=max(int(ttl), 1)))
+    
+    def discard(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def create_dedup_store(url):
+    """Build shared store from DEDUP_STORE url, None if not configured"""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SqliteDedupStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        import redis
+        return RedisDedupStore(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported DEDUP_STORE: {url}")
+
+
+class UpdateDeduplicator:
+    """
+    Remembers processed update_ids to absorb Telegram webhook retries
+    
+    A bounded LRU with TTL covers retries that hit the same warm container;
+    the optional shared store makes concurrent Lambda instances agree.
+    """
+    
+    def __init__(self, max_size=DEDUP_MAX_SIZE, ttl=DEDUP_TTL, store=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = store
+        self.clock = clock
+        self._seen = OrderedDict()  # key -> expires_at
+        self._lock = threading.Lock()
+    
+    def seen(self, update_id, namespace=""):
+        """
+        Mark update as seen
+        
+        Returns:
+            True if the update was already seen (duplicate)
+        """
+        if not isinstance(update_id, int):
             return False
+        
+        key = f"{namespace}:{update_id}"
+        now = self.clock()
+        with self._lock:
+            expires_at = self._seen.get(key)
+            if expires_at is not None and expires_at > now:
+                self._seen.move_to_end(key)
+                return True
+            
+            self._seen[key] = now + self.ttl
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+        
+        if self.store is not None:
+            try:
+                return not self.store.add_if_absent(key, self.ttl)
+            except Exception as e:
+                # Shared store down - fall back to local cache only
+                print(f"[DEDUP] ⚠️  Shared store error: {e}")
+        return False
+    
+    def forget(self, update_id, namespace=""):
+        """Unmark update so a Telegram retry is processed again"""
+        key = f"{namespace}:{update_id}"
+        with self._lock:
+            self._seen.pop(key, None)
+        if self.store is not None:
+            try:
+                self.store.discard(key)
+            except Exception as e:
+                print(f"[DEDUP] ⚠️  Shared store error: {e}")
+
+
+deduplicator = UpdateDeduplicator(store=create_dedup_store(DEDUP_STORE))
+
+
+# ============= CONVERSATION STATE =============
+STATE_STORE = os.environ.get("STATE_STORE", "")  # "", sqlite:///path or dynamodb://table
+STATE_CACHE_SIZE = int(os.environ.get("STATE_CACHE_SIZE", "10000"))
+STATE_CACHE_TTL = float(os.environ.get("STATE_CACHE_TTL", "300"))  # bounds staleness
+
+
+class SqliteStateBackend:
+    """Versioned state rows in a SQLite file (local backend)"""
+    
+    def __init__(self, path):
+        import sqlite3
+        
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_state "
+            "(key TEXT PRIMARY KEY, data TEXT NOT NULL, version INTEGER NOT NULL)"
+        )
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """(data, version) of key, (None, 0) if absent"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, version FROM conversation_state WHERE key = ?", (key,)
+            ).fetchone()
+        return (json_loads(row[0]), row[1]) if row else (None, 0)
+    
+    def put_batch(self, items):
+        """
+        Write (key, data, expected_version) items in one transaction
+        
+        Each row is written only if its stored version still equals
+        expected_version (0 = must not exist); it is stored as version + 1.
+        
+        Returns:
+            Keys whose write was rejected (version conflict)
+        """
+        conflicts = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for key, data, expected in items:
+                    if expected == 0:
+                        cursor = self._db.execute(
+                            "INSERT OR IGNORE INTO conversation_state (key, data, version) "
+                            "VALUES (?, ?, 1)",
+                            (key, json_dumps(data))
+                        )
+                    else:
+                        cursor = self._db.execute(
+                            "UPDATE conversation_state SET data = ?, version = version + 1 "
+                            "WHERE key = ? AND version = ?",
+                            (json_dumps(data), key, expected)
+                        )
+                    if cursor.rowcount != 1:
+                        conflicts.append(key)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return conflicts
+
+
+class DynamoStateBackend:
+    """
+    Versioned state items on a DynamoDB table (or a compatible stand-in)
+    
+    Uses only Table.get_item / Table.put_item with a ConditionExpression,
+    so boto3's Table resource and tools/fake_dynamodb.py both work. Items:
+    {"pk": key, "data": JSON string, "version": int}.
+    """
+    
+    def __init__(self, table):
+        self.table = table
+    
+    def get(self, key):
+        item = self.table.get_item(Key={"pk": key}, ConsistentRead=True).get("Item")
+        return (json_loads(item["data"]), int(item["version"])) if item else (None, 0)
+    
+    def put_batch(self, items):
+        # Conditional writes cannot go into BatchWriteItem; one put per key
+        conflicts = []
+        for key, data, expected in items:
+            item = {"pk": key, "data": json_dumps(data), "version": expected + 1}
+            try:
+                if expected == 0:
+                    self.table.put_item(Item=item, ConditionExpression="attribute_not_exists(pk)")
+                else:
+                    self.table.put_item(
+                        Item=item,
+                        ConditionExpression="version = :expected",
+                        ExpressionAttributeValues={":expected": expected}
+                    )
+            except Exception as e:
+                code = getattr(e, "response", {}).get("Error", {}).get("Code")
+                if code != "ConditionalCheckFailedException":
+                    raise
+                conflicts.append(key)
+        return conflicts
+
+
+def create_state_backend(url):
+    """Build state backend from STATE_STORE url, None if not configured"""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SqliteStateBackend(url[len("sqlite:///"):])
+    if url.startswith("dynamodb://"):
+        import boto3
+        return DynamoStateBackend(boto3.resource("dynamodb").Table(url[len("dynamodb://"):]))
+    raise ValueError(f"Unsupported STATE_STORE: {url}")
+
+
+class ConversationState:
+    """
+    Mutable state of one user or chat; changes are written on flush
+    
+    Concurrent invocations of the same chat share one instance: changes
+    take the store's lock, so a flush never copies a half-made change.
+    `conflicted` is set when a write of this instance lost to another
+    writer; the store then holds a fresh instance.
+    """
+    
+    __slots__ = ("key", "data", "version", "dirty", "conflicted", "loaded_at", "_lock")
+    
+    def __init__(self, key, data, version, loaded_at, lock=None):
+        self.key = key
+        self.data = data
+        self.version = version
+        self.dirty = False
+        self.conflicted = False
+        self.loaded_at = loaded_at
+        self._lock = lock or threading.Lock()
+    
+    def get(self, name, default=None):
+        return self.data.get(name, default)
+    
+    def set(self, name, value):
+        with self._lock:
+            self.data[name] = value
+            self.dirty = True
+    
+    def delete(self, name):
+        with self._lock:
+            if self.data.pop(name, None) is not None:
+                self.dirty = True
+    
+    def clear(self):
+        with self._lock:
+            if self.data:
+                self.data = {}
+                self.dirty = True
+
+
+class StateStore:
+    """
+    Per-user / per-chat conversation state
+    
+    A warm-container LRU (with TTL) sits in front of an optional backend,
+    so an update reads the backend at most once per key. Changes are kept
+    in memory and written in one batch at the end of the invocation
+    (write-behind): each invocation loads through its own StateSession and
+    flushes only the states it used. Writes are conditional on the version
+    that was read; on a conflict the cached entry is dropped so the next
+    update rereads it. The container keeps one instance per key, a state
+    is written by one flush at a time, and states whose write failed are
+    retried by the next flush.
+    """
+    
+    def __init__(self, backend=None, max_size=STATE_CACHE_SIZE, ttl=STATE_CACHE_TTL,
+                 clock=time.monotonic):
+        self.backend = backend
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.reads = 0
+        self.writes = 0
+        self.conflicts = 0
+        self._cache = OrderedDict()  # key -> ConversationState
+        self._retry = set()  # keys whose last write failed
+        self._writing = set()  # keys with a write in flight
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+    
+    def session(self, prefix=""):
+        """State view of one invocation, keys prefixed (one bot's state in a shared store)"""
+        return StateSession(self, prefix)
+    
+    def load(self, key):
+        """Cached state of key (one backend read on miss)"""
+        now = self.clock()
+        with self._lock:
+            state = self._cache.get(key)
+            if state is not None and (state.dirty or now - state.loaded_at < self.ttl):
+                self._cache.move_to_end(key)
+                return state
+        
+        data, version = (None, 0)
+        if self.backend is not None:
+            data, version = self.backend.get(key)
+            with self._lock:
+                self.reads += 1
+        
+        with self._lock:
+            state = self._cache.get(key)
+            if state is None:
+                state = self._cache[key] = ConversationState(
+                    key, data or {}, version, now, self._lock
+                )
+            elif state.loaded_at < now and not state.dirty and key not in self._writing:
+                # Expired: refreshed in place, so invocations holding it see the new version
+                state.data, state.version, state.loaded_at = data or {}, version, now
+            # else loaded meanwhile by a concurrent invocation, or changed: keep it
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                old = next(iter(self._cache.values()))
+                if old.dirty:
+                    break  # never evict unwritten changes
+                self._cache.popitem(last=False)
+        return state
+    
+    def flush(self, states=()):
+        """
+        Write changed states in one backend batch
+        
+        Args:
+            states: ConversationStates used by the invocation; states whose
+                earlier write failed are written too
+        
+        Returns:
+            Keys that conflicted with another writer (their change is lost),
+            also when a concurrent flush wrote the change
+        """
+        states = list(states)
+        with self._lock:
+            candidates = {state.key: state for state in states}
+            for key in self._retry:
+                state = self._cache.get(key)
+                if state is not None:
+                    candidates.setdefault(key, state)
+            # Another invocation writing the same state: wait for its new version
+            self._written.wait_for(lambda: self._writing.isdisjoint(candidates))
+            
+            changed = [state for state in candidates.values() if state.dirty]
+            items = [(state.key, dict(state.data), state.version) for state in changed]
+            for state in changed:
+                state.dirty = False  # a change made from here on dirties it again
+                self._writing.add(state.key)
+                self._retry.discard(state.key)
+        
+        if not items:
+            return self._lost(states)
+        
+        conflicts = set()
+        try:
+            if self.backend is not None:
+                conflicts = set(self.backend.put_batch(items))
+        except Exception:
+            with self._lock:
+                for state in changed:
+                    state.dirty = True
+                    self._retry.add(state.key)
+                self._writing.difference_update(state.key for state in changed)
+                self._written.notify_all()
+            raise
+        
+        with self._lock:
+            if self.backend is not None:
+                self.writes += 1
+            self.conflicts += len(conflicts)
+            for state in changed:
+                if state.key not in conflicts:
+                    state.version += 1
+                    continue
+                state.conflicted = True
+                if self._cache.get(state.key) is state:
+                    del self._cache[state.key]
+            self._writing.difference_update(state.key for state in changed)
+            self._written.notify_all()
+        
+        for key in conflicts:
+            metrics.inc("bot_state_conflicts_total")
+            print(f"[STATE] ⚠️  Version conflict on {key}, change dropped")
+        return sorted(conflicts | set(self._lost(states)))
+    
+    def _lost(self, states):
+        """Keys of states whose change was dropped by a conflicting write"""
+        with self._lock:
+            return [state.key for state in states if state.conflicted]
+
+
+class StateSession:
+    """
+    Conversation state as seen by one invocation
+    
+    Remembers the states it loaded, so flush() writes exactly those and
+    leaves states of concurrent invocations to their own flush.
+    """
+    
+    __slots__ = ("store", "prefix", "states")
+    
+    def __init__(self, store, prefix=""):
+        self.store = store
+        self.prefix = prefix
+        self.states = {}  # key -> ConversationState
+    
+    def for_user(self, user_id):
+        return self.load(f"user:{user_id}")
+    
+    def for_chat(self, chat_id):
+        return self.load(f"chat:{chat_id}")
+    
+    def load(self, key):
+        state = self.store.load(f"{self.prefix}:{key}" if self.prefix else key)
+        self.states[state.key] = state
+        return state
+    
+    def flush(self):
+        """Write the states changed through this session"""
+        states, self.states = list(self.states.values()), {}
+        return self.store.flush(states)
+
+
+state_store = StateStore(backend=create_state_backend(STATE_STORE))
+
+
+# ============= BOT TENANTS =============
+# Several bots behind one function: JSON object (or path to a JSON file)
+# {"<name>": {"token": ..., "secret_token": ..., "username": ...}}.
+# Empty = single bot from BOT_TOKEN / BOT_USERNAME / WEBHOOK_SECRET_TOKEN.
+BOTS_CONFIG = os.environ.get("BOTS_CONFIG", "")
+# secret_token given to setWebhook; Telegram sends it back in every request
+WEBHOOK_SECRET_TOKEN = os.environ.get("WEBHOOK_SECRET_TOKEN", "")
+BOT_TENANT_POOL_SIZE = int(os.environ.get("BOT_TENANT_POOL_SIZE", "16"))
+DEFAULT_TENANT = "default"
+
+
+class BotTenant:
+    """
+    Warm per-bot resources: Bot API client (connection pool), send rate
+    limiter (Telegram limits are per bot) and router (@username check)
+    
+    `users` counts invocations holding the tenant (TenantRegistry.acquire);
+    a tenant retired while in use is closed by the last release.
+    """
+    
+    __slots__ = ("name", "token", "secret_token", "username", "api", "rate_limiter", "router",
+                 "shared", "users", "retired")
+    
+    def __init__(self, name, token, secret_token=None, username="", shared=False):
+        self.name = name
+        self.token = token
+        self.secret_token = secret_token
+        self.username = username or ""
+        self.shared = shared
+        self.users = 0
+        self.retired = False
+        if shared:
+            # Single-bot deployment: module-level client, limiter and router
+            self.api = api_client
+            self.rate_limiter = rate_limiter
+            self.router = command_router
+        else:
+            self.api = BotApiClient()
+            self.rate_limiter = SendRateLimiter()
+            self.router = command_router.for_username(self.username)
+    
+    @property
+    def namespace(self):
+        """Key prefix for dedup and state ("" for the default bot)"""
+        return "" if self.name == DEFAULT_TENANT else self.name
+    
+    def close(self):
+        if not self.shared:
+            self.api.session.close()
 
 
-# ============= ADAPTER LAYER =============
-class TelegramAdapter:
-    """
-    Adapter layer - bridges Lambda webhook events to bot logic
-    Routes updates to appropriate handlers (commands, callbacks, messages)
+def load_bot_configs(raw=BOTS_CONFIG):
+    """Bot configs by name from BOTS_CONFIG (JSON or file path)"""
+    if not raw:
+        return {DEFAULT_TENANT: {
+            "token": os.environ.get("BOT_TOKEN", "YOUR_BOT_TOKEN"),
+            "secret_token": WEBHOOK_SECRET_TOKEN or None,
+            "username": BOT_USERNAME
+        }}
+    if not raw.lstrip().startswith("{"):
+        with open(raw) as f:
+            raw = f.read()
+    return json_loads(raw)
+
+
+class TenantRegistry:
     """
+    Routes updates to bot configs and keeps a bounded LRU of warm tenants
     
-    def __init__(self, is_simulator=False):
-        self.is_simulator = is_simulator
-        self.env = TelegramEnvironment(is_simulator=is_simulator)
+    A tenant is built on its first update (new client, pool, limiter) and
+    reused by later updates to the same container. When more than
+    pool_size bots are warm the least recently used idle tenant is closed;
+    tenants held by an invocation (acquire() without release()) are never
+    evicted, so the pool can briefly exceed pool_size.
+    """
     
-    def _get_start_keyboard(self):
-        """Generate start command keyboard"""
-        return {
-            "inline_keyboard": [
-                [
-                    {"text": "👋 Salom", "callback_data": "btn_hello"},
-                    {"text": "❓ Yordam", "callback_data": "btn_help"}
-                ],
-                [
-                    {"text": "ℹ️ Info", "callback_data": "btn_info"}
-                ]
-            ]
+    def __init__(self, configs, pool_size=BOT_TENANT_POOL_SIZE):
+        self.configs = configs
+        self.pool_size = pool_size
+        self.default_name = DEFAULT_TENANT if DEFAULT_TENANT in configs else next(iter(configs))
+        self._by_secret = {
+            cfg["secret_token"]: name for name, cfg in configs.items() if cfg.get("secret_token")
         }
+        self._warm = OrderedDict()  # name -> BotTenant
+        self._lock = threading.Lock()
+        self.warmups = 0
+        self.evictions = 0
     
-    def process_update(self, update_dict):
+    def acquire(self, name):
         """
-        Process incoming webhook update
-        Routes to message handler, command handler, or callback handler
+        Warm tenant by name (built on first use), None if unknown
         
-        Args:
-            update_dict: Raw Telegram update dictionary
-            
-        Returns:
-            Processing result with response
+        The tenant is held until release(tenant), so it is not closed
+        while the invocation uses it.
         """
-        try:
-            # Handle message updates
-            if "message" in update_dict:
-                return self._handle_message(update_dict["message"])
-            
-            # Handle callback query updates (button clicks)
-            elif "callback_query" in update_dict:
-                return self._handle_callback_query(update_dict["callback_query"])
-            
-            # Other updates are ignored (channel posts, edited messages, etc.)
+        with self._lock:
+            tenant = self._warm.get(name)
+            if tenant is not None:
+                self._warm.move_to_end(name)
+                tenant.users += 1
+                return tenant
+        
+        cfg = self.configs.get(name)
+        if cfg is None:
+            return None
+        tenant = BotTenant(
+            name, cfg["token"], cfg.get("secret_token"), cfg.get("username"),
+            shared=name == self.default_name and len(self.configs) == 1
+        )
+        
+        evicted = []
+        with self._lock:
+            if name in self._warm:  # built concurrently
+                evicted.append(tenant)
+                tenant = self._warm[name]
+                self._warm.move_to_end(name)
             else:
-                return {
-                    "success": True,
-                    "message": "Update type not handled (ignored)",
-                    "is_simulator": self.is_simulator
-                }
+                self.warmups += 1
+                self._warm[name] = tenant
+            tenant.users += 1
+            for old_name, old in list(self._warm.items()):
+                if len(self._warm) <= self.pool_size:
+                    break
+                if old.users == 0:
+                    del self._warm[old_name]
+                    evicted.append(old)
+                    self.evictions += 1
+        for old in evicted:
+            old.close()
+        return tenant
+    
+    def release(self, tenant):
+        """End of an invocation holding tenant (see acquire)"""
+        with self._lock:
+            tenant.users -= 1
+            close = tenant.retired and tenant.users == 0
+        if close:
+            tenant.close()
+    
+    def get(self, name):
+        """Warm tenant by name without holding it (acquire() for an invocation)"""
+        tenant = self.acquire(name)
+        if tenant is not None:
+            self.release(tenant)
+        return tenant
+    
+    def default(self):
+        return self.get(self.default_name)
+    
+    def resolve(self, path=None, secret_token=None):
+        """
+        Bot name for a webhook request, None if no bot matches
         
-        except Exception as e:
-            error_msg = f"Update processing failed: {str(e)}"
-            stack_trace = traceback.format_exc()
-            print(f"[ERROR] {error_msg}")
-            print(stack_trace)
-            
-            # Log to bug hunter bot
-            bug_hunter = BugHunter()
-            bug_hunter.log_error(
-                error_type="UPDATE_PROCESSING_ERROR",
-                error_msg=error_msg,
-                stack_trace=stack_trace,
-                context_data={
-                    "update_type": type(update_dict).__name__,
-                    "update_keys": list(update_dict.keys()) if isinstance(update_dict, dict) else None
-                }
-            )
-            
-            return {
-                "success": False,
-                "message": str(e),
-                "error": str(e),
-                "is_simulator": self.is_simulator
-            }
+        The last path segment names the bot (/webhook/<name>); otherwise the
+        secret token header identifies it; a single configured bot takes
+        everything. Only the config is looked up: check the request against
+        secret_token(name) before acquire(name) warms the tenant.
+        """
+        if path:
+            name = path.rstrip("/").rsplit("/", 1)[-1]
+            if name in self.configs:
+                return name
+        if secret_token and secret_token in self._by_secret:
+            return self._by_secret[secret_token]
+        if len(self.configs) == 1:
+            return self.default_name
+        return None
     
-    def _handle_message(self, message):
-        """Handle incoming message updates"""
-        try:
-            chat_id = message.get("chat", {}).get("id")
-            user_id = message.get("from", {}).get("id")
-            user_first_name = message.get("from", {}).get("first_name")
-            text = message.get("text", "").strip()
-            
-            if not text:
-                return {"success": True, "message": "Empty message ignored"}
-            
-            response_text = None
-            keyboard = None
-            
-            # Route to command or message handler
-            if text.startswith("/"):
-                
-                # Command message
-                command = text.split()[0]  # /start, /help, /echo, etc.
-                
-                if command == "/start":
-                    response_text = self.env.app.handle_start_command(user_id, user_first_name)
-                    keyboard = self._get_start_keyboard()
-                
-                elif command == "/help":
-                    response_text = self.env.app.handle_help_command()
-                
-                elif command == "/info":
-                    response_text = self.env.app.handle_info_command()
-                
-                elif command == "/echo":
-                    # /echo <text>
-                    parts = text.split(maxsplit=1)
-                    if len(parts) < 2:
-                        response_text = "Foydalanish: /echo <sizning xabaringiz>"
-                    else:
-                        response_text = self.env.app.handle_echo_message(parts[1])
-                
-                else:
-                    # Unknown command
-                    response_text = f"Noma'lum buyruq: {command}\n/help buyrug'ini kiriting"
-            
-            else:
-                # Regular text message - echo it
-                response_text = self.env.app.handle_echo_message(text)
-            
-            # Send response
-            buttons = None
-            if response_text:
-                self.env.send_message(
-                    chat_id,
-                    response_text,
-                    reply_markup=keyboard
-                )
-                if keyboard:
-                    buttons = keyboard
-            
+    def secret_token(self, name):
+        """Configured secret_token of a bot (None = not checked)"""
+        return self.configs[name].get("secret_token")
+    
+    def close(self):
+        """Close every warm tenant (tenants in use: after their last release)"""
+        with self._lock:
+            warm, self._warm = list(self._warm.values()), OrderedDict()
+            idle = []
+            for tenant in warm:
+                tenant.retired = True
+                if tenant.users == 0:
+                    idle.append(tenant)
+        for tenant in idle:
+            tenant.close()
+    
+    def stats(self):
+        with self._lock:
             return {
-                "success": True,
-                "message": "Message processed",
-                "response_text": response_text,
-                "buttons": buttons,
-                "is_simulator": self.is_simulator,
-                "responses": self.env.responses if self.is_simulator else []
+                "configured": len(self.configs),
+                "warm": len(self._warm),
+                "warmups": self.warmups,
+                "evictions": self.evictions
             }
-        
-        except Exception as e:
-            error_msg = f"Message handling failed: {str(e)}"
-            stack_trace = traceback.format_exc()
-            print(f"[ERROR] {error_msg}")
-            print(stack_trace)
-            
-            # Log to bug hunter bot
-            bug_hunter = BugHunter()
-            bug_hunter.log_error(
-                error_type="MESSAGE_HANDLER_ERROR",
-                error_msg=error_msg,
-                stack_trace=stack_trace,
-                context_data={
-                    "chat_id": chat_id,
-                    "user_id": user_id,
-                    "text": text[:100] if text else None
-                }
+
+
+tenant_registry = TenantRegistry(load_bot_configs())
+metrics.gauge_function(
+    "bot_tenants", "Bot tenants: configured, warm, warm-ups and evictions since start",
+    lambda: {(("kind", key),): value for key, value in tenant_registry.stats().items()}
+)
+
+
+# ============= WEBHOOK GUARD =============
+# Telegram updates are a few KB; bigger bodies are rejected undecoded
+MAX_UPDATE_BYTES = int(os.environ.get("MAX_UPDATE_BYTES", "262144"))
+
+metrics.describe("bot_webhook_rejected_total", "counter",
+                 "Webhook requests rejected before decoding, by reason")
+
+
+def check_webhook_request(expected_secret, received_secret, body_size):
+    """
+    Cheap checks on a webhook request, before its body is decoded
+    
+    The secret token is compared in constant time. No expected secret
+    (none configured) accepts any request.
+    
+    Args:
+        expected_secret: The bot's secret_token (None = not checked)
+        received_secret: X-Telegram-Bot-Api-Secret-Token header value
+        body_size: Body length in bytes (see body_size)
+    
+    Returns:
+        None if accepted, else (status_code, reason)
+    """
+    if body_size > MAX_UPDATE_BYTES:
+        return 413, "body_too_large"
+    if expected_secret:
+        import hmac
+        if not received_secret or not hmac.compare_digest(
+            expected_secret.encode("utf-8"), received_secret.encode("utf-8")
+        ):
+            return 401, "bad_secret_token"
+    return None
+
+
+def body_size(body):
+    """Size in bytes of a request body (str bodies count as UTF-8)"""
+    if not body:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8", "surrogatepass"))
+    return len(body)
+
+
+def _reject(status_code, reason):
+    """Fast reject response (no handler, no BugHunter report)"""
+    metrics.inc("bot_webhook_rejected_total", reason=reason)
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json"},
+        "body": '{"result": "error", "message": "%s"}' % reason,
+    }
+
+
+# ============= BATCH EVENTS =============
+# SQS event source: API Gateway queues updates, the function consumes them in
+# batches (enable ReportBatchItemFailures on the event source mapping)
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+# Records not started with less time left are reported failed (retried)
+BATCH_MIN_REMAINING_MS = int(os.environ.get("BATCH_MIN_REMAINING_MS", "2000"))
+
+metrics.describe("bot_batch_records_total", "counter", "Queued update records by outcome")
+
+_batch_pool = None
+_batch_lock = threading.Lock()
+
+
+def get_batch_pool():
+    """Worker pool for the chat lanes of a batch, created on first use"""
+    global _batch_pool
+    with _batch_lock:
+        if _batch_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _batch_pool = ThreadPoolExecutor(
+                max_workers=BATCH_CONCURRENCY,
+                thread_name_prefix="batch"
             )
-            
-            return {
-                "success": False,
-                "message": str(e),
-                "error": str(e),
-                "is_simulator": self.is_simulator
-            }
+    return _batch_pool
+
+
+def _batch_item(record, held, names):
+    """
+    (lane_key, message_id, tenant, update) of an SQS record, None if rejected
     
-    def _handle_callback_query(self, callback_query):
-        """Handle callback query updates (button clicks)"""
+    The bot is named by the "bot" message attribute (else found by
+    "secret_token" like a webhook request); the secret token, when the bot
+    has one, must be forwarded as the "secret_token" attribute. Names are
+    resolved once per (bot, secret_token) in `names`, and each tenant is
+    acquired once into `held` (name -> tenant), released after the batch.
+    """
+    attributes = record.get("messageAttributes") or {}
+    
+    def attribute(name):
+        return (attributes.get(name) or {}).get("stringValue")
+    
+    bot, secret_token = attribute("bot"), attribute("secret_token")
+    if (bot, secret_token) not in names:
+        names[bot, secret_token] = (
+            tenant_registry.resolve(secret_token=secret_token) if not bot
+            else bot if bot in tenant_registry.configs else None
+        )
+    name = names[bot, secret_token]
+    body = record.get("body") or ""
+    rejection = (404, "unknown_bot") if name is None else check_webhook_request(
+        tenant_registry.secret_token(name), secret_token, body_size(body)
+    )
+    if rejection is None:
         try:
-            callback_id = callback_query.get("id")
-            callback_data = callback_query.get("data", "")
-            chat_id = callback_query.get("message", {}).get("chat", {}).get("id")
-            
-            # Get response text for this callback
-            response_text = self.env.app.handle_callback(callback_data)
-            
-            # Answer the callback query (show notification)
-            self.env.answer_callback_query(callback_id, response_text, show_alert=False)
-            
-            # Send response message
-            if chat_id:
-                self.env.send_message(chat_id, response_text)
-            
-            return {
-                "success": True,
-                "message": "Callback processed",
-                "response_text": response_text,
-                "buttons": None,
-                "is_simulator": self.is_simulator,
-                "responses": self.env.responses if self.is_simulator else []
-            }
+            update = json_loads(body)
+        except ValueError:
+            update = None
+        if not isinstance(update, dict):
+            rejection = (400, "invalid_body")
+    if rejection is not None:
+        # Retrying cannot fix it: dropped like a rejected webhook request
+        metrics.inc("bot_webhook_rejected_total", reason=rejection[1])
+        metrics.inc("bot_batch_records_total", outcome="rejected")
+        return None
+    
+    tenant = held.get(name)
+    if tenant is None:
+        tenant = held[name] = tenant_registry.acquire(name)
+    # FIFO queues order by message group, standard queues by chat
+    group = (record.get("attributes") or {}).get("MessageGroupId")
+    key = (tenant.name, group if group is not None else ChatLaneScheduler.update_key(update))
+    return key, record.get("messageId"), tenant, update
+
+
+def _update_failed(details):
+    """True if the update handler or one of its Bot API calls failed"""
+    if details.get("success") is False:
+        return True
+    calls = (details.get("actions") or {}).get("calls") or ()
+    # Raw Bot API results (answerCallbackQuery -> True) are not send results
+    return any(
+        isinstance(call.get("result"), dict) and call["result"].get("success") is False
+        for call in calls
+    )
+
+
+def _process_lane(lane, context, sessions):
+    """
+    Process one chat's records in order; returns messageIds to retry
+    
+    State goes to the batch's StateSession of each tenant (`sessions`),
+    flushed by handle_batch once the lanes are done.
+    """
+    failed = []
+    for _, message_id, tenant, update in lane:
+        deadline = Deadline.from_context(context, margin_ms=BATCH_MIN_REMAINING_MS)
+        if failed or deadline.expired():
+            # Not started: a later record of a failed chat would overtake it
+            failed.append(message_id)
+            metrics.inc("bot_batch_records_total", outcome="skipped")
+            continue
         
-        except Exception as e:
-            error_msg = f"Callback handling failed: {str(e)}"
-            stack_trace = traceback.format_exc()
-            print(f"[ERROR] {error_msg}")
-            print(stack_trace)
-            
-            # Log to bug hunter bot
-            bug_hunter = BugHunter()
-            bug_hunter.log_error(
-                error_type="CALLBACK_HANDLER_ERROR",
-                error_msg=error_msg,
-                stack_trace=stack_trace,
-                context_data={
-                    "callback_id": callback_id,
-                    "callback_data": callback_data,
-                    "chat_id": chat_id
-                }
-            )
-            
-            return {
-                "success": False,
-                "message": str(e),
-                "error": str(e),
-                "is_simulator": self.is_simulator
-            }
+        result = _invoke(update, context, is_simulator=False, webhook_reply=False,
+                         serialize=False, tenant=tenant, event_keys=["Records"],
+                         state=sessions[tenant.name])
+        if result["statusCode"] == 200 and not _update_failed(result["body"].get("details") or {}):
+            metrics.inc("bot_batch_records_total", outcome="processed")
+        else:
+            # The redelivered record must not be dropped as a duplicate
+            deduplicator.forget(update.get("update_id"), tenant.namespace)
+            failed.append(message_id)
+            metrics.inc("bot_batch_records_total", outcome="failed")
+    return failed
+
+
+def handle_batch(event, context):
+    """
+    SQS batch of updates: records of one chat run in order, chats run in
+    parallel (up to BATCH_CONCURRENCY) on the warm tenants and pools
+    
+    A failed record and the not yet processed records of its chat are
+    returned for retry; records started too close to the timeout are
+    returned unprocessed. Junk (bad secret, too large, not JSON) is
+    dropped and counted. A record that cannot be prepared (tenant error)
+    is returned for retry alone, the rest of the batch still runs.
+    
+    Per batch, not per record: each tenant is resolved, acquired and its
+    connection counters reset once, changed state is written in one
+    flush and queued errors go out as one bug hunter digest.
+    
+    Returns:
+        {"batchItemFailures": [{"itemIdentifier": messageId}, ...]}
+    """
+    lanes = {}
+    held = {}  # name -> tenant acquired for the batch
+    sessions = {}  # name -> StateSession of the batch
+    unprepared = []  # messageIds of records that raised before a lane
+    try:
+        names = {}
+        for record in event.get("Records") or []:
+            try:
+                item = _batch_item(record, held, names)
+            except Exception as e:
+                print(f"[BATCH] ❌ Record {record.get('messageId')} not prepared: {e}")
+                unprepared.append(record.get("messageId"))
+                metrics.inc("bot_batch_records_total", outcome="failed")
+                continue
+            if item is not None:
+                lanes.setdefault(item[0], []).append(item)
+        for name, tenant in held.items():
+            tenant.api.begin_invocation()
+            sessions[name] = state_store.session(tenant.namespace)
+        
+        if len(lanes) <= 1:
+            results = [_process_lane(lane, context, sessions) for lane in lanes.values()]
+        else:
+            pool = get_batch_pool()
+            results = list(pool.map(
+                lambda lane: _process_lane(lane, context, sessions), lanes.values()
+            ))
+    finally:
+        for session in sessions.values():
+            _flush_state(session)
+        bug_hunter.flush(deadline=Deadline.from_context(context, margin_ms=0))
+        for tenant in held.values():
+            tenant_registry.release(tenant)
+    
+    failures = unprepared + [message_id for failed in results for message_id in failed]
+    print(f"[BATCH] {len(event.get('Records') or [])} records, {len(lanes)} lanes, "
+          f"{len(failures)} to retry")
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
 
 
 # ============= LAMBDA HANDLER =============
+def handle_update(update, context=None, is_simulator=False, webhook_reply=True, tenant=None):
+    """
+    In-process entry point: update as decoded dict, raw bytes or str
+    
+    Same processing as lambda_handler without the event envelope and
+    without a JSON round trip: the returned response's "body" is a dict.
+    Raw input is decoded only after the duplicate check (update_id is
+    peeked from the bytes), so Telegram retries are never parsed.
+    
+    Args:
+        update: Telegram update (dict, bytes or str)
+        context: Lambda context (deadline), None = DEFAULT_DEADLINE_SECONDS
+        is_simulator: Collect responses instead of calling Telegram
+        webhook_reply: Allow the webhook-reply slot (WEBHOOK_REPLY=true)
+        tenant: BotTenant the update is for, held by the caller (None = default bot)
+    
+    Returns:
+        {"statusCode", "headers", "body": dict}
+    """
+    if tenant is not None:
+        return _invoke(update, context, is_simulator, webhook_reply, serialize=False,
+                       tenant=tenant)
+    
+    tenant = tenant_registry.acquire(tenant_registry.default_name)
+    try:
+        return _invoke(update, context, is_simulator, webhook_reply, serialize=False,
+                       tenant=tenant)
+    finally:
+        tenant_registry.release(tenant)
+
+
+def _header(headers, name):
+    """Header value, case-insensitive (API Gateway HTTP APIs lowercase names)"""
+    value = headers.get(name)
+    if value is None:
+        lowered = name.lower()
+        for key, candidate in headers.items():
+            if key.lower() == lowered:
+                return candidate
+    return value
+
+
+def _event_path(event):
+    """Request path of an API Gateway / Function URL event"""
+    return (
+        event.get("rawPath")
+        or event.get("path")
+        or (event.get("requestContext") or {}).get("http", {}).get("path")
+    )
+
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler for Telegram webhook
@@ -482,41 +3223,154 @@ def lambda_handler(event, context):
     - Lambda receives webhook event from Telegram
     - Adapter routes to appropriate handler (message, command, callback)
     - Environment sends response via Telegram API
-    - Returns success status to Lambda
+    - Returns success status to Lambda, or in webhook-reply mode
+      (WEBHOOK_REPLY=true) the first Bot API call as the response body;
+      events with "webhook_reply": false (already acknowledged) opt out
+    
+    SQS events ("Records") are processed as a batch, see handle_batch.
     
     Flow:
-    1. Parse incoming webhook event
-    2. Check if simulator request (X-Simulator header)
-    3. Create adapter with simulator flag
-    4. Process update through adapter
-    5. Adapter routes to command/message/callback handler
-    6. Handler processes through application layer
-    7. Environment sends response via Telegram API
-    8. Return result to Lambda
+    1. Pick the bot from the webhook path or secret token (BOTS_CONFIG),
+       reject bad secret tokens and oversized bodies without decoding
+    2. Parse incoming webhook event
+    3. Drop duplicate update_id (Telegram retry) before any outbound call
+    4. Check if simulator request (X-Simulator header)
+    5. Create adapter with simulator flag
+    6. Process update through adapter
+    7. Adapter routes to command/message/callback handler
+    8. Handler processes through application layer
+    9. Environment sends response via Telegram API
+    10. Return result to Lambda
+    """
+    if "Records" in event:
+        return handle_batch(event, context)
+    
+    headers = event.get("headers") or {}
+    secret_token = _header(headers, "X-Telegram-Bot-Api-Secret-Token")
+    name = tenant_registry.resolve(path=_event_path(event), secret_token=secret_token)
+    if name is None:
+        return _reject(404, "unknown_bot")
+    
+    # Checked before the tenant is warmed: junk never builds (or evicts) one
+    body = event.get("body", "{}")
+    rejection = check_webhook_request(
+        tenant_registry.secret_token(name), secret_token, body_size(body)
+    )
+    if rejection is not None:
+        return _reject(*rejection)
+    
+    tenant = tenant_registry.acquire(name)
+    try:
+        return _invoke(
+            body,
+            context,
+            is_simulator=(_header(headers, "X-Simulator") or "").lower() == "true",
+            webhook_reply=event.get("webhook_reply", True),
+            serialize=True,
+            tenant=tenant,
+            event_keys=list(event.keys()) if isinstance(event, dict) else None
+        )
+    finally:
+        tenant_registry.release(tenant)
+
+
+def _flush_state(session):
+    """Write a session's changed conversation state in one batch (write-behind)"""
+    try:
+        session.flush()
+    except Exception as e:
+        # States stay dirty in the warm container, next flush retries
+        bug_hunter.log_error(
+            error_type="STATE_FLUSH_ERROR",
+            error_msg=f"State flush failed: {str(e)}",
+            stack_trace=traceback.format_exc()
+        )
+
+
+def _invoke(update, context, is_simulator, webhook_reply, serialize, tenant, event_keys=None,
+            state=None):
     """
+    Shared body of lambda_handler / handle_update / handle_batch
+    
+    state: StateSession of a batch, flushed by the caller together with
+    the bug hunter digest (None = this update's own session, flushed here)
+    """
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    batched = state is not None
+    if not batched:
+        tenant.api.begin_invocation()
+        state = state_store.session(tenant.namespace)
+    deadline = Deadline.from_context(context, default_seconds=DEFAULT_DEADLINE_SECONDS)
+    trace = InvocationTrace()
+    trace.set(cold_start=cold_start)
+    started = time.perf_counter()
+    metrics.inc("bot_updates_in_flight")
+    update_id = None
+    
+    def response(status_code, body):
+        if serialize:
+            with trace.span("serialize"):
+                body = json_dumps(body)
+        return {
+            "statusCode": status_code,
+            "headers": {"Content-Type": "application/json"},
+            "body": body,
+        }
+    
     try:
         # Parse incoming webhook event
-        body = event.get("body", "{}")
-        if isinstance(body, str):
-            body = json.loads(body)
-        
-        # Check if request is from simulator
-        headers = event.get("headers", {})
-        is_simulator = headers.get("X-Simulator", "").lower() == "true"
+        with trace.span("parse"):
+            raw = isinstance(update, (bytes, bytearray, str))
+            
+            # Telegram retry of an update we already handled
+            if raw:
+                update_id = peek_update_id(update)
+                duplicate = (
+                    deduplicator.seen(update_id, tenant.namespace) if update_id is not None
+                    else False
+                )
+                if not duplicate:
+                    update = json_loads(update)
+            if not raw or update_id is None:
+                update_id = update.get("update_id") if isinstance(update, dict) else None
+                duplicate = deduplicator.seen(update_id, tenant.namespace)
+        trace.set(update_id=update_id)
+        if duplicate:
+            trace.set(UpdateType="duplicate")
+            print(f"[DEDUP] Duplicate update {update_id} ignored")
+            return response(200, {
+                "result": "ok",
+                "message": "Duplicate update ignored",
+                "duplicate": True
+            })
         
         # Process update through adapter
-        adapter = TelegramAdapter(is_simulator=is_simulator)
-        result = adapter.process_update(body)
+        adapter = TelegramAdapter(
+            is_simulator=is_simulator,
+            webhook_reply=WEBHOOK_REPLY and not is_simulator and webhook_reply,
+            deadline=deadline,
+            trace=trace,
+            tenant=tenant,
+            state=state
+        )
+        result = adapter.process_update(update)
         
-        return {
-            "statusCode": 200,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({
-                "result": "ok",
-                "message": "Webhook processed successfully",
-                "details": result
-            }),
-        }
+        connection_stats = tenant.api.invocation_stats()
+        connection_stats["cold_start"] = cold_start
+        connection_stats["bot"] = tenant.name
+        print(f"[API_CLIENT] {json_dumps(connection_stats)}")
+        
+        # Webhook reply: Telegram executes the method from the response body
+        if adapter.env.webhook_reply_call:
+            return response(200, adapter.env.webhook_reply_call)
+        
+        return response(200, {
+            "result": "ok",
+            "message": "Webhook processed successfully",
+            "details": result,
+            "connection_stats": connection_stats
+        })
     
     except Exception as e:
         error_msg = f"Lambda handler error: {str(e)}"
@@ -524,23 +3378,32 @@ def lambda_handler(event, context):
         print(f"[LAMBDA ERROR] {error_msg}")
         print(stack_trace)
         
+        # Failed update must be processed again when Telegram retries it
+        if update_id is not None:
+            deduplicator.forget(update_id, tenant.namespace)
+        
         # Log critical error to bug hunter bot
-        bug_hunter = BugHunter()
         bug_hunter.log_error(
             error_type="LAMBDA_HANDLER_CRITICAL_ERROR",
             error_msg=error_msg,
             stack_trace=stack_trace,
             context_data={
                 "request_type": "Telegram webhook",
-                "event_keys": list(event.keys()) if isinstance(event, dict) else None
+                "event_keys": event_keys
             }
         )
         
-        return {
-            "statusCode": 500,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({
-                "result": "error",
-                "message": str(e)
-            }),
-        }
+        return response(500, {
+            "result": "error",
+            "message": str(e)
+        })
+    
+    finally:
+        if not batched:
+            _flush_state(state)
+            # Send queued errors as one digest (only does I/O if errors pending)
+            bug_hunter.flush(deadline=deadline)
+        # One EMF line with per-stage latencies (sampled)
+        trace.emit()
+        metrics.dec("bot_updates_in_flight")
+        metrics.observe("bot_handler_seconds", time.perf_counter() - started)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Telegram Long-Polling Runner
+Runs the bot locally or on a plain VM without ngrok or a public webhook
+
+A single getUpdates long poll is in flight at a time. Fetched updates go
+onto per-chat lanes (ChatLaneScheduler) and are processed by
+handle_update on a worker pool, so replies within a chat keep their
+order while different chats run in parallel. The offset only moves past
+updates that are processed (and everything fetched before them), and is
+saved and reused after a restart: an update is confirmed to Telegram
+only once it has been handled, so a crash never loses queued updates.
+
+getUpdates does not work while a webhook is set: run with
+POLLING_DELETE_WEBHOOK=true (or delete it yourself) first.
+
+Usage:
+    python polling.py
+"""
+
+import os
+import json
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env (before lambda_function reads them)
+load_dotenv()
+
+from lambda_function import (  # noqa: E402
+    BotApiClient, ChatLaneScheduler, LocalLambdaContext, handle_update, json_loads, metrics
+)
+
+# ============= CONFIGURATION =============
+BOT_TOKEN = os.environ.get("BOT_TOKEN")
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")
+# Long poll: Telegram holds getUpdates open up to this many seconds
+POLLING_TIMEOUT = int(os.environ.get("POLLING_TIMEOUT", "30"))
+POLLING_LIMIT = int(os.environ.get("POLLING_LIMIT", "100"))  # updates per poll (1-100)
+# Update types to receive (comma separated), empty = Telegram's previous setting
+POLLING_ALLOWED_UPDATES = os.environ.get("POLLING_ALLOWED_UPDATES", "message,callback_query")
+POLLING_WORKERS = int(os.environ.get("POLLING_WORKERS", "8"))
+# Fetched but unprocessed updates; the poller waits while this many are pending
+# (a busy chat's backlog is parked on its lane and does not count)
+POLLING_MAX_PENDING = int(os.environ.get("POLLING_MAX_PENDING", str(POLLING_WORKERS * 4)))
+POLLING_DEADLINE_SECONDS = float(os.environ.get("POLLING_DEADLINE_SECONDS", "30"))
+POLLING_OFFSET_FILE = Path(
+    os.environ.get("POLLING_OFFSET_FILE", "") or Path(__file__).parent / ".polling_offset.json"
+)
+POLLING_DELETE_WEBHOOK = os.environ.get("POLLING_DELETE_WEBHOOK", "false").lower() == "true"
+POLLING_MAX_BACKOFF = float(os.environ.get("POLLING_MAX_BACKOFF", "30"))
+
+metrics.describe("polling_updates_total", "counter", "Polled updates by outcome")
+metrics.describe("polling_errors_total", "counter", "Failed getUpdates calls, by error")
+
+
+# ============= OFFSET STORE =============
+class OffsetStore:
+    """
+    getUpdates offset of one bot, kept in a JSON file
+    
+    Written to a temp file and renamed, so a crash never leaves a torn
+    file. An offset saved for another bot (different token) is ignored.
+    """
+    
+    def __init__(self, path, bot_id):
+        self.path = Path(path)
+        self.bot_id = str(bot_id)
+    
+    def load(self) -> Optional[int]:
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[POLLING] Error loading offset: {e}")
+            return None
+        return data.get("offset") if data.get("bot_id") == self.bot_id else None
+    
+    def save(self, offset: int):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'w') as f:
+            json.dump({"bot_id": self.bot_id, "offset": offset, "saved_at": time.time()}, f)
+        os.replace(tmp, self.path)
+
+
+# ============= LONG POLLER =============
+class PollingError(Exception):
+    """getUpdates answered ok=false"""
+    
+    def __init__(self, error_code, description, retry_after=None):
+        super().__init__(f"{error_code}: {description}")
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+def process_polled_update(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one polled update in-process (no webhook to reply through)"""
+    context = LocalLambdaContext(POLLING_DEADLINE_SECONDS)
+    return handle_update(update, context, webhook_reply=False)
+
+
+class LongPoller:
+    """
+    Single getUpdates loop feeding a per-chat worker pool
+    
+    The next poll starts as soon as a batch is queued on the lanes, so
+    fetching overlaps processing; it waits only while max_pending updates
+    are unprocessed, leaving the rest of a backlog on Telegram's side.
+    
+    getUpdates is called with the committed offset: one past the last
+    update that is processed together with every update fetched before
+    it. Updates still queued or running come back in the next poll and
+    are skipped; when a poll brings nothing new, the poller waits for an
+    update to finish instead of polling again at once. A batch fetched
+    while stopping is not dispatched, so it is delivered again on the
+    next start.
+    
+    Args:
+        token: Bot token
+        api: BotApiClient for getUpdates (default: own client and pool)
+        process: Callable(update) -> handle_update-style result
+        allowed_updates: Update types to receive (None = Telegram's setting)
+        offset_store: OffsetStore (None = offset kept in memory only)
+    """
+    
+    def __init__(self, token, api=None, process=process_polled_update, workers=POLLING_WORKERS,
+                 max_pending=POLLING_MAX_PENDING, allowed_updates=None, timeout=POLLING_TIMEOUT,
+                 limit=POLLING_LIMIT, offset_store=None):
+        self.token = token
+        self.api = api or BotApiClient(base_url=TELEGRAM_API_BASE, pool_size=1)
+        self.allowed_updates = allowed_updates
+        self.timeout = timeout
+        self.limit = limit
+        self.offset_store = offset_store
+        self.offset = (offset_store.load() if offset_store else None) or 0  # committed
+        self.saved_offset = self.offset
+        self.scheduler = ChatLaneScheduler(process, workers=workers, max_pending=max_pending)
+        self.stats = {"polls": 0, "received": 0, "processed": 0, "failed": 0, "errors": 0}
+        self._fetched = deque()  # update_ids dispatched and not yet committed, in fetch order
+        self._finished = set()  # finished update_ids still behind an unfinished one
+        self._completed = 0  # finished updates, to wait for progress
+        self._lock = threading.Condition()
+        self._dispatch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def get_updates(self) -> List[Dict[str, Any]]:
+        """One long poll from the committed offset"""
+        with self._lock:
+            offset = self.offset
+        payload = {"offset": offset, "limit": self.limit, "timeout": self.timeout}
+        if self.allowed_updates is not None:
+            payload["allowed_updates"] = self.allowed_updates
+        # Read timeout covers Telegram holding the request for `timeout` seconds
+        response = self.api.call(self.token, "getUpdates", payload, read_timeout=self.timeout + 10)
+        data = json_loads(response.content)
+        if not data.get("ok"):
+            raise PollingError(
+                data.get("error_code", response.status_code),
+                data.get("description", ""),
+                (data.get("parameters") or {}).get("retry_after")
+            )
+        return data.get("result") or []
+    
+    def dispatch(self, updates) -> int:
+        """Queue new updates on their chat lanes (fetched again while unfinished)"""
+        with self._dispatch_lock:
+            if self._stop.is_set():
+                return 0
+            
+            queued = 0
+            for update in updates:
+                update_id = update.get("update_id") if isinstance(update, dict) else None
+                with self._lock:
+                    last = self._fetched[-1] if self._fetched else self.offset - 1
+                if not isinstance(update_id, int) or update_id <= last:
+                    continue  # committed, or queued / running already
+                # Fetched before submit: a fast worker may finish it right away
+                with self._lock:
+                    self._fetched.append(update_id)
+                try:
+                    future = self.scheduler.submit(update)
+                except Exception as e:
+                    # Never queued: finished as failed, so the offset moves past it
+                    future = Future()
+                    future.set_exception(e)
+                    self._finish(update_id, future)
+                    continue
+                future.add_done_callback(lambda f, update_id=update_id: self._finish(update_id, f))
+                queued += 1
+        
+        with self._lock:
+            self.stats["polls"] += 1
+            self.stats["received"] += queued
+        return queued
+    
+    def _finish(self, update_id, future):
+        """Scheduler done-callback: count the outcome, commit the offset"""
+        try:
+            outcome = "processed" if future.result().get("statusCode") == 200 else "failed"
+        except Exception as e:
+            outcome = "failed"
+            print(f"[POLLING] ❌ Worker error: {e}")
+        
+        metrics.inc("polling_updates_total", outcome=outcome)
+        with self._lock:
+            self.stats[outcome] += 1
+            # Failed updates are committed too: handle_update reported them
+            self._finished.add(update_id)
+            while self._fetched and self._fetched[0] in self._finished:
+                self._finished.discard(self._fetched[0])
+                self.offset = self._fetched.popleft() + 1
+            self._completed += 1
+            self._lock.notify_all()
+    
+    def save_offset(self):
+        """Persist the committed offset if it moved"""
+        with self._lock:
+            offset = self.offset
+        if self.offset_store and offset != self.saved_offset:
+            self.offset_store.save(offset)
+            self.saved_offset = offset
+    
+    def poll_once(self) -> int:
+        """Fetch one batch and dispatch it; returns the number of updates queued"""
+        self.save_offset()
+        with self._lock:
+            completed = self._completed
+        updates = self.get_updates()
+        queued = self.dispatch(updates)
+        if updates and not queued:
+            # Only unfinished updates came back: wait for one to finish
+            with self._lock:
+                self._lock.wait_for(
+                    lambda: self._completed != completed or self._stop.is_set(), self.timeout
+                )
+        return queued
+    
+    def run(self):
+        """Poll until stop(), backing off exponentially on errors"""
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+                backoff = 1.0
+                continue
+            except PollingError as e:
+                error, wait = f"api_{e.error_code}", e.retry_after or backoff
+                if e.error_code == 409:
+                    print("[POLLING] ⚠️  Conflict: a webhook is set or another poller is "
+                          "running (POLLING_DELETE_WEBHOOK=true deletes the webhook)")
+                else:
+                    print(f"[POLLING] getUpdates failed: {e}")
+            except Exception as e:
+                error, wait = type(e).__name__, backoff
+                print(f"[POLLING] Error polling: {e}")
+            
+            metrics.inc("polling_errors_total", error=error)
+            with self._lock:
+                self.stats["errors"] += 1
+            backoff = min(backoff * 2, POLLING_MAX_BACKOFF)
+            self._stop.wait(wait)
+    
+    def start(self):
+        """Run the poller in a background thread"""
+        self._thread = threading.Thread(target=self.run, name="long-poller", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self, drain=True):
+        """
+        Stop polling and the workers
+        
+        Args:
+            drain: Process already queued updates before returning
+        """
+        self._stop.set()
+        with self._lock:
+            self._lock.notify_all()
+        with self._dispatch_lock:
+            # An in-flight poll is abandoned: its batch is not dispatched
+            self.scheduler.shutdown(wait=drain)
+        self.save_offset()
+    
+    def join(self, timeout=None):
+        """Wait until every dispatched update is processed"""
+        return self.scheduler.join(timeout)
+
+
+def delete_webhook(api, token) -> bool:
+    """Delete the webhook (getUpdates is refused while one is set)"""
+    try:
+        data = json_loads(api.call(token, "deleteWebhook", {}).content)
+        if data.get("ok"):
+            print("[TELEGRAM] ✅ Webhook deleted successfully")
+            return True
+        print(f"[TELEGRAM] deleteWebhook failed: {data}")
+    except Exception as e:
+        print(f"[TELEGRAM] Error deleting webhook: {e}")
+    return False
+
+
+def parse_allowed_updates(raw: str) -> Optional[List[str]]:
+    """Comma separated update types, None when empty"""
+    kinds = [kind.strip() for kind in raw.split(",") if kind.strip()]
+    return kinds or None
+
+
+# ============= MAIN =============
+if __name__ == "__main__":
+    if not BOT_TOKEN:
+        print("[ERROR] BOT_TOKEN not configured in .env")
+        raise SystemExit(1)
+    
+    poller = LongPoller(
+        BOT_TOKEN,
+        allowed_updates=parse_allowed_updates(POLLING_ALLOWED_UPDATES),
+        offset_store=OffsetStore(POLLING_OFFSET_FILE, BOT_TOKEN.split(":", 1)[0])
+    )
+    if POLLING_DELETE_WEBHOOK:
+        delete_webhook(poller.api, BOT_TOKEN)
+    
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda sig, frame: stopped.set())
+    signal.signal(signal.SIGTERM, lambda sig, frame: stopped.set())
+    
+    print(f"[POLLING] Starting (offset {poller.offset}, {POLLING_WORKERS} workers, "
+          f"allowed_updates {poller.allowed_updates or 'unchanged'})")
+    print("Press Ctrl+C to stop\n")
+    poller.start()
+    stopped.wait()
+    
+    print("\n[POLLING] Stopping, finishing queued updates...")
+    poller.stop(drain=True)
+    print(f"[POLLING] Stopped at offset {poller.offset}: {poller.stats}")
@@ -3,7 +3,7 @@ Telegram Bot Simulator - FastAPI server
 Simulates Telegram webhook and communicates with bot
 
 Modes:
-- local: Call lambda_function.lambda_handler directly (for local testing)
+- local: Call lambda_function.handle_update directly (for local testing)
 - aws: Call real AWS Lambda webhook (production)
 """
 
@@ -21,7 +21,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
-    from lambda_function import lambda_handler as local_lambda_handler
+    from lambda_function import handle_update as local_handle_update, LocalLambdaContext
     LAMBDA_AVAILABLE = True
 except ImportError:
     LAMBDA_AVAILABLE = False
@@ -43,6 +43,10 @@ LAMBDA_WEBHOOK_URL = os.environ.get(
     "LAMBDA_WEBHOOK_URL",
     "https://vwn78888d8.execute-api.eu-central-1.amazonaws.com/main"
 )
+# Sent as X-Telegram-Bot-Api-Secret-Token, so the deployed webhook accepts aws mode calls
+WEBHOOK_SECRET_TOKEN = os.environ.get("WEBHOOK_SECRET_TOKEN", "")
+# Local mode time budget, like the Lambda function timeout
+SIMULATOR_DEADLINE_SECONDS = float(os.environ.get("SIMULATOR_DEADLINE_SECONDS", "30"))
 
 
 # ============= MODELS =============
@@ -130,22 +134,17 @@ def call_local_lambda(update_dict):
                 "error": "lambda_function import failed"
             }
         
-        print(f"[LOCAL LAMBDA] Calling lambda_handler with update")
+        print(f"[LOCAL LAMBDA] Calling handle_update with update")
         
-        # Create event as AWS Lambda would
-        event = {
-            "body": json.dumps(update_dict),
-            "headers": {"X-Simulator": "true"}
-        }
-        
-        # Call lambda_handler directly (simulates AWS Lambda invocation)
-        result = local_lambda_handler(event, context=None)
+        # Call handler in-process with the decoded update (no JSON round trip)
+        context = LocalLambdaContext(SIMULATOR_DEADLINE_SECONDS)
+        result = local_handle_update(update_dict, context=context, is_simulator=True)
         
         print(f"[LOCAL LAMBDA] Response status: {result.get('statusCode')}")
         
         # Parse response
         if result.get("statusCode") == 200:
-            body = json.loads(result.get("body", "{}"))
+            body = result["body"]
             details = body.get("details", {})
             
             return {
@@ -186,14 +185,17 @@ def call_aws_lambda(update_dict):
         print(f"[AWS LAMBDA] Sending update to webhook: {LAMBDA_WEBHOOK_URL}")
         
         # Send to Lambda webhook as if it's a real Telegram webhook
+        headers = {
+            "Content-Type": "application/json",
+            "X-Simulator": "true"
+        }
+        if WEBHOOK_SECRET_TOKEN:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = WEBHOOK_SECRET_TOKEN
         response = requests.post(
             LAMBDA_WEBHOOK_URL,
             json=update_dict,
             timeout=30,
-            headers={
-                "Content-Type": "application/json",
-                "X-Simulator": "true"
-            }
+            headers=headers
         )
         
         print(f"[AWS LAMBDA] Lambda response status: {response.status_code}")
@@ -271,7 +273,7 @@ async def send_message(request: MessageRequest):
     Frontend sends message to bot via Simulator
     
     Can call in two modes:
-    1. local - Call lambda_function.lambda_handler directly (testing)
+    1. local - Call lambda_function.handle_update directly (testing)
     2. aws - Call real AWS Lambda webhook (production)
     
     Flow:
@@ -309,7 +311,7 @@ async def send_callback(request: CallbackRequest):
     Frontend sends callback (button click) to bot via Simulator
     
     Can call in two modes:
-    1. local - Call lambda_function.lambda_handler directly (testing)
+    1. local - Call lambda_function.handle_update directly (testing)
     2. aws - Call real AWS Lambda webhook (production)
     
     Flow:
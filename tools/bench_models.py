@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Update Model Allocation Benchmark
+Measures memory and allocations of TelegramAdapter.process_update per update
+
+Runs in simulator mode (replies are collected, no Bot API call is made).
+Reported per update:
+- peak: tracemalloc peak while processing one update (transient memory)
+- retained: blocks/bytes still referenced by the returned result
+- time: wall time per update
+
+Usage:
+    python tools/bench_models.py [--updates 5000]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_updates(count):
+    """Mix of /start, text and callback updates"""
+    updates = []
+    for i in range(count):
+        sender = {"id": 1000 + i, "is_bot": False, "first_name": "Ali", "username": "ali_v"}
+        chat = {"id": 1000 + i, "first_name": "Ali", "type": "private"}
+        message = {"message_id": i, "from": sender, "chat": chat, "date": 1760000000}
+        kind = i % 3
+        if kind == 0:
+            updates.append({"update_id": i, "message": {**message, "text": "/start"}})
+        elif kind == 1:
+            updates.append({"update_id": i, "message": {**message, "text": "salom dunyo"}})
+        else:
+            updates.append({"update_id": i, "callback_query": {
+                "id": str(i), "from": sender, "message": message, "data": "btn_hello"
+            }})
+    return updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update model allocation benchmark")
+    parser.add_argument("--updates", type=int, default=5000)
+    args = parser.parse_args()
+    
+    os.environ["TRACE_SAMPLE_RATE"] = "0"
+    import lambda_function as lf
+    
+    updates = make_updates(args.updates)
+    sink = open(os.devnull, "w")  # simulator prints, not retained
+    
+    # Warm up (router, interned strings, metric series)
+    with contextlib.redirect_stdout(sink):
+        for update in updates[:30]:
+            lf.TelegramAdapter(is_simulator=True).process_update(update)
+    
+    peaks = []
+    results = []
+    tracemalloc.start()
+    before_size, _ = tracemalloc.get_traced_memory()
+    before_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        for update in updates:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            results.append(lf.TelegramAdapter(is_simulator=True).process_update(update))
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    elapsed = time.perf_counter() - started
+    after_size, _ = tracemalloc.get_traced_memory()
+    after_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    
+    assert all(result.get("success") for result in results)
+    n = args.updates
+    peaks.sort()
+    print(f"[BENCH] {n} updates (process_update, simulator mode, tracemalloc on)")
+    print(f"peak per update:     median {peaks[n // 2]} B, p95 {peaks[int(n * 0.95)]} B")
+    print(f"retained per result: {(after_blocks - before_blocks) / n:.1f} blocks, "
+          f"{(after_size - before_size) / n:.0f} B")
+    print(f"time per update:     {elapsed / n * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Update Parsing Benchmark
+Compares bytes -> reply CPU time of the Lambda event round trip against
+the direct in-process entry point (handle_update)
+
+Paths:
+- roundtrip: decode body (request.json), json.dumps into a Lambda event,
+  lambda_handler decodes it again, response body is decoded once more
+  (what webhook.py and the simulator used to do)
+- direct-bytes: handle_update(raw body), response body stays a dict
+- direct-dict: handle_update(decoded update) (simulator path)
+- duplicate-*: the same for a Telegram retry of an already seen update_id
+
+Runs in webhook-reply mode, so no Bot API call is made and only CPU is
+measured.
+
+Usage:
+    python tools/bench_parse.py [--updates 5000] [--backend auto|json|orjson]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_update(update_id):
+    """Realistic /start message update from a private chat"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 4242,
+            "from": {
+                "id": 123456789, "is_bot": False, "first_name": "Ali",
+                "last_name": "Valiyev", "username": "ali_v", "language_code": "uz"
+            },
+            "chat": {
+                "id": 123456789, "first_name": "Ali", "last_name": "Valiyev",
+                "username": "ali_v", "type": "private"
+            },
+            "date": 1760000000,
+            "text": "/start",
+            "entities": [{"offset": 0, "length": 6, "type": "bot_command"}]
+        }
+    }
+
+
+def run_path(name, updates, lf):
+    """CPU seconds to take every raw update to a decoded reply"""
+    sink = io.StringIO()
+    started = time.process_time()
+    with contextlib.redirect_stdout(sink):
+        for raw in updates:
+            if name.endswith("roundtrip"):
+                body = json.loads(raw)  # request.json()
+                event = {"body": json.dumps(body), "headers": {"X-Simulator": "false"}}
+                reply = json.loads(lf.lambda_handler(event, None)["body"])
+            elif name.endswith("direct-dict"):
+                reply = lf.handle_update(json.loads(raw))["body"]
+            else:
+                reply = lf.handle_update(raw)["body"]
+            assert reply
+    return time.process_time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update parsing benchmark")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--backend", default="auto", choices=("auto", "json", "orjson"))
+    args = parser.parse_args()
+    
+    os.environ["JSON_BACKEND"] = args.backend
+    os.environ["WEBHOOK_REPLY"] = "true"
+    os.environ["TRACE_SAMPLE_RATE"] = "0"
+    os.environ.setdefault("DEDUP_MAX_SIZE", str(args.updates * 8))
+    import lambda_function as lf
+    
+    backend = "orjson" if lf.orjson is not None else "json"
+    print(f"[BENCH] {args.updates} updates, JSON backend: {backend}")
+    
+    results = {}
+    next_id = 1
+    for name in ("roundtrip", "direct-bytes", "direct-dict"):
+        ids = range(next_id, next_id + args.updates)
+        next_id += args.updates
+        updates = [json.dumps(make_update(i)).encode("utf-8") for i in ids]
+        results[name] = run_path(name, updates, lf)
+        # Same updates again: all are Telegram retries now
+        results["duplicate-" + name] = run_path("duplicate-" + name, updates, lf)
+    
+    baseline = results["roundtrip"]
+    dup_baseline = results["duplicate-roundtrip"]
+    print(f"{'path':<24} {'us/update':>10} {'vs roundtrip':>13}")
+    for name, seconds in results.items():
+        base = dup_baseline if name.startswith("duplicate") else baseline
+        per_update = seconds / args.updates * 1e6
+        print(f"{name:<24} {per_update:>10.1f} {base / seconds:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Outbound Rate Limiter Benchmark
+Burst of messages against a fake Bot API that enforces Telegram send limits
+
+Runs on a simulated clock: the fake API (tools/fake_telegram.py with
+enforce_limits) and SendRateLimiter share it, and limiter waits advance it
+instead of sleeping. Compares sending the burst without the limiter (429s,
+lost messages) against TelegramEnvironment.send_message with it
+(throughput at the limit, no 429s).
+
+Usage:
+    python tools/bench_rate_limit.py [--messages 600] [--chats 200] [--group-messages 30]
+"""
+
+import argparse
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_telegram import FakeTelegramAPI
+
+
+class SimClock:
+    """Simulated monotonic clock - sleep() advances time instantly"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+    
+    def time(self):
+        with self._lock:
+            return self.now
+    
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += max(seconds, 0.0)
+
+
+def private_burst(messages, chats):
+    """(chat_id, text) list: private chats round-robin"""
+    return [(1000 + i % chats, f"msg {i}") for i in range(messages)]
+
+
+def group_burst(messages):
+    """(chat_id, text) list: one busy group"""
+    return [(-100123, f"group {i}") for i in range(messages)]
+
+
+def run_without_limiter(api, lf, burst, clock):
+    """Send burst as fast as possible, every 429 is a lost message"""
+    api.reset()
+    start = clock.time()
+    delivered = 0
+    for chat_id, text in burst:
+        response = lf.api_client.call("BENCH", "sendMessage", {"chat_id": chat_id, "text": text})
+        delivered += response.status_code == 200
+        clock.sleep(0.001)  # request time
+    return delivered, api.rejected_429, clock.time() - start
+
+
+def run_with_limiter(api, lf, burst, clock):
+    """Send burst through TelegramEnvironment with a SendRateLimiter"""
+    api.reset()
+    limiter = lf.SendRateLimiter(max_wait=3600, clock=clock.time, sleep=clock.sleep)
+    env = lf.TelegramEnvironment(limiter=limiter)
+    start = clock.time()
+    delivered = 0
+    for chat_id, text in burst:
+        result = env.send_message(chat_id, text)
+        delivered += result["success"]
+        clock.sleep(0.001)
+    return delivered, api.rejected_429, clock.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SendRateLimiter burst benchmark")
+    parser.add_argument("--messages", type=int, default=600, help="Messages to private chats")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--group-messages", type=int, default=30)
+    args = parser.parse_args()
+    
+    clock = SimClock()
+    api = FakeTelegramAPI(enforce_limits=True, clock=clock.time).start()
+    os.environ["TELEGRAM_API_BASE"] = api.url
+    os.environ["BOT_TOKEN"] = "BENCH"
+    
+    import lambda_function as lf
+    
+    bursts = (
+        (f"{args.messages} msgs / {args.chats} chats", private_burst(args.messages, args.chats), 1.0),
+        (f"{args.group_messages} msgs / 1 group", group_burst(args.group_messages), 60.0),
+    )
+    print("[BENCH] Limits: 30 msg/s global, 1 msg/s per chat, 20 msg/min per group (simulated clock)")
+    print(f"{'burst':<24} {'mode':<14} {'delivered':>10} {'429s':>6} {'sim seconds':>12} {'rate':>12}")
+    
+    for label, burst, per in bursts:
+        unit = "msg/s" if per == 1.0 else "msg/min"
+        for name, runner in (("no limiter", run_without_limiter), ("rate limiter", run_with_limiter)):
+            delivered, rejected, elapsed = runner(api, lf, burst, clock)
+            print(
+                f"{label:<24} {name:<14} {delivered:>10} {rejected:>6} {elapsed:>12.2f} "
+                f"{delivered / elapsed * per:>6.1f} {unit}"
+            )
+    
+    api.stop()
+
+
+if __name__ == "__main__":
+    main()
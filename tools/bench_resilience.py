@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Retry and Circuit Breaker Benchmark
+Bot API calls against a fake Telegram server that injects faults
+
+Scenarios:
+- transient: 30% of calls answer 502. Idempotent answerCallbackQuery is
+  retried with jittered backoff; sendMessage is not (no duplicate sends).
+- outage: every call hangs past the read timeout. The circuit breaker
+  opens after a few failures and later calls fail fast instead of each
+  spending the full timeout.
+
+Usage:
+    python tools/bench_resilience.py [--calls 200] [--outage-calls 40]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_telegram import FakeTelegramAPI
+
+import lambda_function as lf
+
+
+def make_client(api, attempts, breaker_failures, read_timeout=2.0):
+    return lf.BotApiClient(
+        base_url=api.url,
+        read_timeout=read_timeout,
+        retry_policy=lf.RetryPolicy(max_attempts=attempts, base=0.01, cap=0.1),
+        breaker=lf.CircuitBreaker(failure_threshold=breaker_failures, reset_timeout=60)
+    )
+
+
+def run_calls(client, method, calls, deadline_seconds=None):
+    """Return (succeeded, failed, fast_failed, seconds)"""
+    succeeded = failed = fast_failed = 0
+    started = time.perf_counter()
+    for i in range(calls):
+        deadline = lf.Deadline(deadline_seconds)
+        payload = {"chat_id": 1, "text": str(i)} if method == "sendMessage" else {"callback_query_id": str(i)}
+        try:
+            response = client.request("BENCH", method, payload, deadline=deadline)
+            if response.status_code == 200:
+                succeeded += 1
+            else:
+                failed += 1
+        except lf.CircuitOpenError:
+            fast_failed += 1
+        except Exception:
+            failed += 1
+    return succeeded, failed, fast_failed, time.perf_counter() - started
+
+
+def transient(api, calls):
+    print(f"\n[TRANSIENT] {calls} calls, 30% answer HTTP 502")
+    print(f"{'method':<22} {'attempts':>8} {'ok':>5} {'failed':>7} {'server calls':>13}")
+    for method in ("answerCallbackQuery", "sendMessage"):
+        for attempts in (1, 3):
+            api.reset()
+            api.set_fault_rate(0.3, status=502)
+            client = make_client(api, attempts, breaker_failures=10 ** 6)
+            ok, failed, _, _ = run_calls(client, method, calls)
+            print(f"{method:<22} {attempts:>8} {ok:>5} {failed:>7} {len(api.calls):>13}")
+
+
+def outage(api, calls):
+    print(f"\n[OUTAGE] {calls} calls, API hangs 1.5s, read timeout 0.2s, 3 attempts")
+    print(f"{'breaker':<10} {'ok':>5} {'failed':>7} {'fast-failed':>12} {'seconds':>8} {'server calls':>13}")
+    for name, failures in (("off", 10 ** 6), ("on", 5)):
+        api.reset()
+        api.set_fault_rate(1.0, status=None, delay=1.5)
+        client = make_client(api, attempts=3, breaker_failures=failures, read_timeout=0.2)
+        ok, failed, fast, seconds = run_calls(client, "answerCallbackQuery", calls, deadline_seconds=5)
+        print(f"{name:<10} {ok:>5} {failed:>7} {fast:>12} {seconds:>8.2f} {len(api.calls):>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retry / circuit breaker benchmark")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--outage-calls", type=int, default=40)
+    args = parser.parse_args()
+    
+    api = FakeTelegramAPI().start()
+    transient(api, args.calls)
+    outage(api, args.outage_calls)
+    api.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Router Micro-benchmark
+Measures CommandRouter dispatch cost as the number of registered commands grows
+
+Usage:
+    python tools/bench_router.py [--sizes 10,100,500,2000] [--iterations 200000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lambda_function import CommandRouter
+
+
+def build_router(size):
+    """Router with `size` commands, 10% prefix routes and a few regex routes"""
+    router = CommandRouter(bot_username="benchbot")
+    handler = lambda adapter, message, args: (args, None)
+    
+    for i in range(size):
+        router.command(f"cmd{i}", f"alias{i}")(handler)
+    for i in range(size // 10):
+        router.prefix(f"!tag{i}:")(handler)
+        router.callback(prefix=f"cb{i}_")(handler)
+    router.regex(r"^#(\d+)$")(handler)
+    router.fallback("command")(handler)
+    router.fallback("text")(handler)
+    return router
+
+
+def bench(size, iterations):
+    """Return ns per dispatch for a mix of message and callback lookups"""
+    router = build_router(size)
+    last = size - 1
+    texts = [
+        f"/cmd{last} some args",
+        f"/alias{size // 2}@benchbot",
+        f"!tag{max(size // 10 - 1, 0)}:value",
+        "#12345",
+        "/unknown",
+        "hello there",
+    ]
+    callbacks = [f"cb{max(size // 10 - 1, 0)}_42", "nomatch"]
+    
+    def run():
+        for text in texts:
+            router.resolve_message(text)
+        for data in callbacks:
+            router.resolve_callback(data)
+    
+    lookups = len(texts) + len(callbacks)
+    loops = max(iterations // lookups, 1)
+    best = min(timeit.repeat(run, number=loops, repeat=5))
+    return best / (loops * lookups) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CommandRouter dispatch benchmark")
+    parser.add_argument("--sizes", default="10,100,500,2000")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    
+    print(f"{'commands':>10} {'ns/dispatch':>12}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        print(f"{size:>10} {bench(size, args.iterations):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
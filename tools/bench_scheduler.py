@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Chat Lane Scheduler Benchmark
+Per-chat latency under a skewed chat distribution
+
+Submits updates for a set of chats where one "hot" chat sends a large share
+of all traffic, processes each update with a fixed simulated handler time,
+and reports p50/p99 latency (submit -> done) for the hot chat and the
+other chats. Compares round-robin lanes (quantum=1) with draining a lane
+completely before moving on (no fairness). Also checks that replies within
+every chat completed in submission order.
+
+Backlog case: a dispatcher submits a queued backlog as fast as submit()
+returns, one busy chat first and then many light chats, with max_pending
+set. Compares per-lane limits (busy chat parked) with a single global
+limit (submit blocks behind the busy chat), reporting when the light
+chats finished and how many workers were busy at most.
+
+Usage:
+    python tools/bench_scheduler.py [--updates 1500] [--chats 50] [--hot-share 0.5]
+                                    [--backlog 200] [--max-pending 8]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lambda_function import ChatLaneScheduler
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def make_stream(updates, chats, hot_share, seed):
+    """Update stream: chat 0 gets `hot_share` of traffic, rest Zipf-like"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(chats - 1)]
+    stream = []
+    for update_id in range(updates):
+        if rng.random() < hot_share:
+            chat_id = 0
+        else:
+            chat_id = 1 + rng.choices(range(chats - 1), weights)[0]
+        stream.append({
+            "update_id": update_id,
+            "message": {"chat": {"id": chat_id}, "text": str(update_id)}
+        })
+    return stream
+
+
+def run(stream, workers, quantum, handler_ms, rate):
+    """Feed stream at `rate` updates/s, return per-chat latencies and order check"""
+    submitted = {}
+    latencies = {}
+    completed = {}
+    lock = threading.Lock()
+    
+    def process(update):
+        time.sleep(handler_ms / 1000)
+        chat_id = update["message"]["chat"]["id"]
+        done = time.perf_counter()
+        with lock:
+            latencies.setdefault(chat_id, []).append(done - submitted[update["update_id"]])
+            completed.setdefault(chat_id, []).append(update["update_id"])
+    
+    scheduler = ChatLaneScheduler(process, workers=workers, quantum=quantum)
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    for index, update in enumerate(stream):
+        delay = started + index * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        submitted[update["update_id"]] = time.perf_counter()
+        scheduler.submit(update)
+    scheduler.shutdown()
+    
+    in_order = all(ids == sorted(ids) for ids in completed.values())
+    return latencies, in_order
+
+
+def run_backlog(args, lane_limit):
+    """Busy chat backlog then one update per light chat, submitted as fast as possible"""
+    stream = [{"update_id": i, "message": {"chat": {"id": 0}}} for i in range(args.backlog)]
+    stream += [
+        {"update_id": args.backlog + i, "message": {"chat": {"id": 1 + i}}}
+        for i in range(args.chats - 1)
+    ]
+    done = {}
+    busy = [0, 0]  # running now, max running
+    lock = threading.Lock()
+    
+    def process(update):
+        with lock:
+            busy[0] += 1
+            busy[1] = max(busy)
+        time.sleep(args.handler_ms / 1000)
+        with lock:
+            busy[0] -= 1
+            done[update["update_id"]] = time.perf_counter()
+    
+    scheduler = ChatLaneScheduler(process, workers=args.workers, max_pending=args.max_pending,
+                                  lane_limit=lane_limit)
+    started = time.perf_counter()
+    for update in stream:
+        scheduler.submit(update)
+    scheduler.shutdown()
+    
+    light = [done[update_id] - started for update_id in range(args.backlog, len(stream))]
+    busy_done = done[args.backlog - 1] - started
+    return percentile(light, 50), percentile(light, 99), busy_done, busy[1]
+
+
+def report(name, latencies, in_order):
+    hot = latencies.get(0, [])
+    others = [value for chat_id, values in latencies.items() if chat_id != 0 for value in values]
+    worst_chat_p99 = max(
+        percentile(values, 99) for chat_id, values in latencies.items() if chat_id != 0
+    )
+    print(
+        f"{name:<14} {percentile(hot, 50) * 1000:>9.1f} {percentile(hot, 99) * 1000:>9.1f} "
+        f"{percentile(others, 50) * 1000:>11.1f} {percentile(others, 99) * 1000:>11.1f} "
+        f"{worst_chat_p99 * 1000:>15.1f}   {'yes' if in_order else 'NO'}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatLaneScheduler skewed-load benchmark")
+    parser.add_argument("--updates", type=int, default=1500)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--hot-share", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--handler-ms", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=450.0, help="Submitted updates per second")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backlog", type=int, default=200, help="Busy chat updates (backlog case)")
+    parser.add_argument("--max-pending", type=int, default=8, help="Scheduler limit (backlog case)")
+    args = parser.parse_args()
+    
+    stream = make_stream(args.updates, args.chats, args.hot_share, args.seed)
+    print(f"[BENCH] {args.updates} updates, {args.chats} chats, hot chat share {args.hot_share:.0%}, "
+          f"{args.workers} workers, {args.handler_ms} ms/update, {args.rate:.0f} updates/s")
+    print(f"{'mode':<14} {'hot p50':>9} {'hot p99':>9} {'others p50':>11} {'others p99':>11} "
+          f"{'worst chat p99':>15}   ordered")
+    
+    for name, quantum in (("round-robin", 1), ("drain-lane", args.updates)):
+        latencies, in_order = run(stream, args.workers, quantum, args.handler_ms, args.rate)
+        report(name, latencies, in_order)
+    
+    print()
+    print(f"[BENCH] backlog: {args.backlog} updates of one chat, then {args.chats - 1} light chats, "
+          f"max_pending {args.max_pending}")
+    print(f"{'limit':<14} {'light p50 ms':>13} {'light p99 ms':>13} {'busy done ms':>13} "
+          f"{'max workers':>12}")
+    for name, lane_limit in (("per-lane", None), ("global", args.max_pending)):
+        light_p50, light_p99, busy_done, max_busy = run_backlog(args, lane_limit)
+        print(f"{name:<14} {light_p50 * 1000:>13.1f} {light_p99 * 1000:>13.1f} "
+              f"{busy_done * 1000:>13.1f} {max_busy:>12}")
+
+
+if __name__ == "__main__":
+    main()
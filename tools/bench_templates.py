@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Reply Template Benchmark
+CPU time per update for static replies, keyboards and callbacks
+
+Each update goes through handle_update() with a stub Bot API client that
+encodes the payload the way requests does for json= (dict -> json.dumps)
+or takes an already encoded body as-is, so only bot-side CPU is measured
+(routing, reply building, payload encoding, result serialization).
+
+Usage:
+    python tools/bench_templates.py [--updates 20000]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubResponse:
+    status_code = 200
+
+
+def make_stub_client(lf):
+    """BotApiClient whose single attempt encodes the body instead of sending it"""
+    
+    class StubClient(lf.BotApiClient):
+        bytes_sent = 0
+        
+        def call(self, token, method, payload=None, read_timeout=None, connect_timeout=None):
+            # requests encodes json= payloads with json.dumps; raw bodies go as-is
+            if isinstance(payload, (bytes, str)):
+                body = payload
+            else:
+                body = json.dumps(payload, allow_nan=False).encode("utf-8")
+            self.bytes_sent += len(body)
+            return StubResponse()
+    
+    return StubClient(base_url="http://stub")
+
+
+def make_update(kind, update_id):
+    chat = {"id": 1000 + update_id % 500, "type": "private"}
+    sender = {"id": chat["id"], "is_bot": False, "first_name": "Ali"}
+    if kind.startswith("/") or kind == "text":
+        text = "salom dunyo" if kind == "text" else kind
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "from": sender, "chat": chat, "text": text
+        }}
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": sender, "data": kind,
+        "message": {"message_id": 1, "chat": chat}
+    }}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reply template benchmark")
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+    
+    os.environ["TRACE_SAMPLE_RATE"] = "0"
+    os.environ["DEDUP_MAX_SIZE"] = "100"
+    import lambda_function as lf
+    
+    stub = make_stub_client(lf)
+    lf.api_client = stub
+    lf.rate_limiter = lf.SendRateLimiter(global_rate=1e9, chat_rate=1e9, group_per_minute=1e12)
+    
+    kinds = ("/start", "/help", "/info", "text", "btn_hello", "btn_help")
+    per_kind = args.updates // len(kinds)
+    next_id = 1
+    timings = {}
+    
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        for kind in kinds:
+            updates = [make_update(kind, next_id + i) for i in range(per_kind)]
+            next_id += per_kind
+            for update in updates[:50]:
+                lf.handle_update(dict(update, update_id=-update["update_id"]))
+            
+            started = time.process_time()
+            for update in updates:
+                lf.handle_update(update)
+            timings[kind] = time.process_time() - started
+    
+    backend = "orjson" if lf.orjson is not None else "json"
+    print(f"[BENCH] {per_kind} updates per kind, stub Bot API, JSON backend: {backend}")
+    print(f"{'update':<12} {'us/update':>10}")
+    for kind, elapsed in timings.items():
+        print(f"{kind:<12} {elapsed / per_kind * 1e6:>10.1f}")
+    print(f"{'all':<12} {sum(timings.values()) / (per_kind * len(kinds)) * 1e6:>10.1f}")
+    print(f"bytes sent per update: {stub.bytes_sent / (next_id - 1 + 50 * len(kinds)):.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Multi-Bot Cold Start Benchmark
+How far one shared function amortizes cold starts over many bots
+
+Every bot gets Zipf-distributed traffic (a few busy bots, a long tail)
+through lambda_handler, routed by webhook path (/webhook/<bot>). Replies
+go to the fake Bot API, so the first update of a bot pays for a new client
+and connection pool (tenant warm-up) and later ones reuse them.
+
+Compared:
+- per-bot: one function per bot, every bot pays an interpreter cold start
+  (import, measured in a fresh interpreter) plus its tenant warm-up
+- shared: one function for all bots with BOT_TENANT_POOL_SIZE warm
+  tenants; evicted bots warm up again on their next update
+
+Usage:
+    python tools/bench_tenants.py [--bots 40] [--updates 4000] [--pools 1,4,16,40]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import lambda_function
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def import_ms(runs=3):
+    """Median import time of lambda_function in a fresh interpreter"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], env=env, capture_output=True,
+            text=True, check=True
+        ).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def zipf_traffic(bots, count, exponent, seed=0):
+    """Bot names for `count` updates, bot i weighted 1 / (i + 1) ** exponent"""
+    weights = [1 / (i + 1) ** exponent for i in range(len(bots))]
+    return random.Random(seed).choices(bots, weights=weights, k=count)
+
+
+def make_event(bot, update_id, secret_token):
+    chat_id = 1000 + update_id
+    return {
+        "rawPath": f"/webhook/{bot}",
+        "headers": {
+            "content-type": "application/json",
+            "x-telegram-bot-api-secret-token": secret_token
+        },
+        "body": json.dumps({"update_id": update_id, "message": {
+            "message_id": update_id, "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "first_name": "Ali"}, "text": "/help"
+        }}),
+        "webhook_reply": False
+    }
+
+
+def run_shared(lf, configs, traffic, pool_size, first_id):
+    """Replay traffic through one function; returns (cold_ms, warm_ms, stats)"""
+    registry = lf.TenantRegistry(configs, pool_size=pool_size)
+    lf.tenant_registry = registry
+    cold, warm = [], []
+    for offset, bot in enumerate(traffic):
+        warmups = registry.warmups
+        event = make_event(bot, first_id + offset, configs[bot]["secret_token"])
+        started = time.perf_counter()
+        result = lf.lambda_handler(event, None)
+        elapsed = (time.perf_counter() - started) * 1000
+        assert result["statusCode"] == 200, result
+        (cold if registry.warmups > warmups else warm).append(elapsed)
+    stats = registry.stats()
+    registry.close()
+    return cold, warm, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-bot cold start benchmark")
+    parser.add_argument("--bots", type=int, default=40)
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Traffic skew exponent")
+    parser.add_argument("--pools", default="", help="Pool sizes (default 1,4,16,<bots>)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake API seconds per call")
+    args = parser.parse_args()
+    pools = [int(p) for p in args.pools.split(",")] if args.pools else sorted(
+        {1, 4, 16, args.bots}
+    )
+    
+    api = FakeTelegramAPI(latency=args.latency).start()
+    bots = [f"bot{i:03d}" for i in range(args.bots)]
+    configs = {
+        name: {"token": f"{i}:TOKEN", "secret_token": f"secret-{i}", "username": name}
+        for i, name in enumerate(bots)
+    }
+    os.environ.update({
+        "TELEGRAM_API_BASE": api.url,
+        "BOTS_CONFIG": json.dumps(configs),
+        "TRACE_SAMPLE_RATE": "0",
+        "SEND_GLOBAL_RATE": "1000000",  # measure warm-ups, not send pacing
+        "DEDUP_MAX_SIZE": str(args.updates * (len(pools) + 1)),
+    })
+    
+    cold_import_ms = import_ms()
+    import lambda_function as lf
+    
+    traffic = zipf_traffic(bots, args.updates, args.zipf)
+    active = len(set(traffic))
+    print(f"[BENCH] {args.bots} bots ({active} with traffic), {args.updates} updates, "
+          f"zipf {args.zipf}, fake API latency {args.latency * 1000:.0f} ms")
+    print(f"interpreter cold start (import): {cold_import_ms:.1f} ms")
+    
+    rows = []
+    next_id = 1
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        for pool_size in pools:
+            cold, warm, stats = run_shared(lf, configs, traffic, pool_size, next_id)
+            next_id += len(traffic)
+            rows.append((pool_size, cold, warm, stats))
+    api.stop()
+    
+    warm_all = [ms for _, _, warm, _ in rows for ms in warm]
+    cold_all = [ms for _, cold, _, _ in rows for ms in cold]
+    warm_ms = statistics.median(warm_all)
+    tenant_warmup_ms = statistics.median(cold_all) - warm_ms
+    print(f"warm update: {warm_ms:.2f} ms median, tenant warm-up: +{tenant_warmup_ms:.2f} ms")
+    print()
+    
+    # One function per bot: each active bot pays import + tenant warm-up once
+    per_bot_ms = active * (cold_import_ms + tenant_warmup_ms)
+    print(f"{'setup':<14} {'warm-ups':>9} {'evictions':>10} {'cold ms':>9} "
+          f"{'cold ms/update':>15} {'p95 ms':>8}")
+    print(f"{'per-bot':<14} {active:>9} {'-':>10} {per_bot_ms:>9.1f} "
+          f"{per_bot_ms / args.updates:>15.3f} {'-':>8}")
+    for pool_size, cold, warm, stats in rows:
+        latencies = sorted(cold + warm)
+        cold_ms = cold_import_ms + stats["warmups"] * tenant_warmup_ms
+        print(f"{'shared/' + str(pool_size):<14} {stats['warmups']:>9} {stats['evictions']:>10} "
+              f"{cold_ms:>9.1f} {cold_ms / args.updates:>15.3f} "
+              f"{latencies[int(len(latencies) * 0.95)]:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
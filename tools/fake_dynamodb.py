@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Fake DynamoDB Table
+In-process stand-in for a boto3 DynamoDB Table resource
+
+Implements the subset DynamoStateBackend uses: get_item and put_item with
+the ConditionExpressions "attribute_not_exists(<key>)" and
+"<attr> = :value". A failed condition raises an error shaped like
+botocore's ClientError (e.response["Error"]["Code"] ==
+"ConditionalCheckFailedException").
+
+Usage:
+    from fake_dynamodb import FakeDynamoTable
+    store = StateStore(backend=DynamoStateBackend(FakeDynamoTable()))
+"""
+
+import copy
+import re
+import threading
+import time
+
+
+class FakeClientError(Exception):
+    """botocore.exceptions.ClientError look-alike"""
+    
+    def __init__(self, code, message=""):
+        super().__init__(f"An error occurred ({code}): {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class FakeDynamoTable:
+    """Thread-safe in-memory table with optional per-call latency"""
+    
+    _NOT_EXISTS = re.compile(r"^attribute_not_exists\((\w+)\)$")
+    _EQUALS = re.compile(r"^(\w+)\s*=\s*(:\w+)$")
+    
+    def __init__(self, key_name="pk", latency=0.0):
+        self.key_name = key_name
+        self.latency = latency
+        self.items = {}
+        self.get_calls = 0
+        self.put_calls = 0
+        self.conditional_failures = 0
+        self._lock = threading.Lock()
+    
+    def get_item(self, Key, ConsistentRead=False):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.get_calls += 1
+            item = self.items.get(Key[self.key_name])
+            return {"Item": copy.deepcopy(item)} if item is not None else {}
+    
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        if self.latency:
+            time.sleep(self.latency)
+        key = Item[self.key_name]
+        with self._lock:
+            self.put_calls += 1
+            current = self.items.get(key)
+            if ConditionExpression and not self._check(
+                ConditionExpression, current, ExpressionAttributeValues or {}
+            ):
+                self.conditional_failures += 1
+                raise FakeClientError(
+                    "ConditionalCheckFailedException", "The conditional request failed"
+                )
+            self.items[key] = copy.deepcopy(Item)
+        return {}
+    
+    def _check(self, expression, current, values):
+        match = self._NOT_EXISTS.match(expression.strip())
+        if match:
+            return current is None or match.group(1) not in current
+        match = self._EQUALS.match(expression.strip())
+        if match:
+            attr, placeholder = match.groups()
+            return current is not None and current.get(attr) == values[placeholder]
+        raise FakeClientError("ValidationException", f"Unsupported condition: {expression}")
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Fake Telegram Bot API Server
+Local stand-in for api.telegram.org used by load tests and benchmarks
+
+Answers every /bot<token>/<method> call with {"ok": true} after a
+configurable latency and records the calls. Point the bot at it with
+TELEGRAM_API_BASE=http://127.0.0.1:<port>.
+
+With enforce_limits=True, sendMessage answers HTTP 429 with retry_after
+like Telegram when a bot sends more than 30 msg/s overall, more than
+1 msg/s to one chat or more than 20 msg/min to one group.
+
+Faults can be injected for the next N calls (fail_next) or at random
+(fault_rate): an HTTP error status, an extra delay (client read timeout)
+or a dropped connection.
+
+getUpdates serves a canned update stream (push_updates, --updates FILE)
+like Telegram: offset confirms earlier updates, allowed_updates filters
+by type, and an empty poll waits up to `timeout` seconds for new ones.
+
+Usage:
+    python tools/fake_telegram.py [--port 8081] [--latency 0.05] [--enforce-limits]
+                                  [--updates updates.jsonl]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    # Many workers connect at once; a short listen backlog drops SYNs (1 s retransmit)
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeTelegramAPI:
+    """In-process fake Bot API server running in a background thread"""
+    
+    GLOBAL_PER_SECOND = 30
+    CHAT_PER_SECOND = 1
+    GROUP_PER_MINUTE = 20
+    
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, enforce_limits=False,
+                 clock=time.monotonic):
+        self.latency = latency
+        self.enforce_limits = enforce_limits
+        self.clock = clock
+        self.calls = []  # (token, method, payload, timestamp)
+        self.handlers = {}  # method -> handler(payload) -> (status, body)
+        self.rejected_429 = 0
+        self.faults = deque()  # queued faults for the next calls
+        self.fault_rate = 0.0
+        self.random_fault = {"status": 502}
+        self.faults_injected = 0
+        self._rng = random.Random(0)
+        self._sent = deque()  # send times, last second (global limit)
+        self._sent_by_chat = defaultdict(deque)  # chat_id -> send times, last minute
+        self._lock = threading.Lock()
+        self.updates = deque()  # canned stream served by getUpdates
+        self.polls_in_flight = 0
+        self.max_polls_in_flight = 0
+        self._updates_cond = threading.Condition(self._lock)
+        self.server = _Server((host, port), self._make_handler())
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        """Serve in background thread"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop serving"""
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def on(self, method, handler):
+        """Override response for a method: handler(payload) -> (status, body)"""
+        self.handlers[method] = handler
+    
+    def fail_next(self, count=1, status=502, delay=0.0, drop=False):
+        """
+        Inject a fault into each of the next `count` calls
+        
+        Args:
+            status: HTTP status to answer with (None = normal answer)
+            delay: Extra seconds before answering
+            drop: Close the connection without any response
+        """
+        with self._lock:
+            for _ in range(count):
+                self.faults.append({"status": status, "delay": delay, "drop": drop})
+    
+    def set_fault_rate(self, rate, status=502, delay=0.0, drop=False, seed=0):
+        """Inject a fault into a random share of calls"""
+        with self._lock:
+            self.fault_rate = rate
+            self.random_fault = {"status": status, "delay": delay, "drop": drop}
+            self._rng = random.Random(seed)
+    
+    def _next_fault(self):
+        with self._lock:
+            if self.faults:
+                fault = self.faults.popleft()
+            elif self.fault_rate and self._rng.random() < self.fault_rate:
+                fault = self.random_fault
+            else:
+                return None
+            self.faults_injected += 1
+            return fault
+    
+    def push_updates(self, updates):
+        """Append updates to the getUpdates stream (update_id assigned if missing)"""
+        with self._lock:
+            next_id = self.updates[-1]["update_id"] + 1 if self.updates else 1
+            for update in updates:
+                if "update_id" not in update:
+                    update = dict(update, update_id=next_id)
+                next_id = update["update_id"] + 1
+                self.updates.append(update)
+            self._updates_cond.notify_all()
+    
+    def _get_updates(self, payload):
+        """getUpdates: confirm < offset, then long-poll for the next batch"""
+        offset = payload.get("offset") or 0
+        limit = min(int(payload.get("limit") or 100), 100)
+        timeout = float(payload.get("timeout") or 0)
+        allowed = payload.get("allowed_updates") or None
+        deadline = time.monotonic() + timeout
+        with self._updates_cond:
+            self.polls_in_flight += 1
+            self.max_polls_in_flight = max(self.max_polls_in_flight, self.polls_in_flight)
+            try:
+                while True:
+                    while self.updates and (
+                        self.updates[0]["update_id"] < offset
+                        or (allowed and not any(kind in self.updates[0] for kind in allowed))
+                    ):
+                        self.updates.popleft()
+                    remaining = deadline - time.monotonic()
+                    if self.updates or remaining <= 0:
+                        break
+                    self._updates_cond.wait(remaining)
+                
+                batch = [
+                    update for update in list(self.updates)[:limit]
+                    if not allowed or any(kind in update for kind in allowed)
+                ]
+            finally:
+                self.polls_in_flight -= 1
+        return 200, {"ok": True, "result": batch}
+    
+    def calls_for(self, method):
+        """Recorded payloads of one method"""
+        with self._lock:
+            return [payload for _, name, payload, _ in self.calls if name == method]
+    
+    def reset(self):
+        with self._lock:
+            self.calls = []
+            self.rejected_429 = 0
+            self.faults.clear()
+            self.fault_rate = 0.0
+            self.faults_injected = 0
+            self.updates.clear()
+            self.max_polls_in_flight = 0
+            self._sent.clear()
+            self._sent_by_chat.clear()
+    
+    def _record(self, token, method, payload):
+        with self._lock:
+            self.calls.append((token, method, payload, self.clock()))
+    
+    def _check_limits(self, chat_id):
+        """retry_after seconds if sending to chat_id now breaks a limit, else 0"""
+        eps = 1e-6
+        now = self.clock()
+        with self._lock:
+            while self._sent and now - self._sent[0] >= 1.0 - eps:
+                self._sent.popleft()
+            chat_sent = self._sent_by_chat[chat_id]
+            while chat_sent and now - chat_sent[0] >= 60.0 - eps:
+                chat_sent.popleft()
+            
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            recent = sum(1 for ts in chat_sent if now - ts < 1.0 - eps)
+            if len(self._sent) >= self.GLOBAL_PER_SECOND:
+                retry_after = 1
+            elif is_group and len(chat_sent) >= self.GROUP_PER_MINUTE:
+                retry_after = int(60 - (now - chat_sent[0])) + 1
+            elif not is_group and recent >= self.CHAT_PER_SECOND:
+                retry_after = 1
+            else:
+                self._sent.append(now)
+                chat_sent.append(now)
+                return 0
+            
+            self.rejected_429 += 1
+            return retry_after
+    
+    def _respond(self, method, payload):
+        if self.enforce_limits and method == "sendMessage":
+            retry_after = self._check_limits(payload.get("chat_id"))
+            if retry_after:
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after}
+                }
+        
+        handler = self.handlers.get(method)
+        if handler is not None:
+            return handler(payload)
+        if method == "getUpdates":
+            return self._get_updates(payload)
+        return 200, {"ok": True, "result": True}
+    
+    def _make_handler(self):
+        api = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like api.telegram.org
+            disable_nagle_algorithm = True  # headers and body are separate writes
+            
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    payload = json.loads(raw) if raw else {}
+                except ValueError:
+                    payload = {}
+                
+                # Path: /bot<token>/<method>
+                parts = self.path.split("?", 1)[0].strip("/").split("/")
+                if len(parts) != 2 or not parts[0].startswith("bot"):
+                    status, body = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+                else:
+                    token, method = parts[0][3:], parts[1]
+                    api._record(token, method, payload)
+                    if api.latency:
+                        time.sleep(api.latency)
+                    
+                    fault = api._next_fault()
+                    if fault and fault.get("delay"):
+                        time.sleep(fault["delay"])
+                    if fault and fault.get("drop"):
+                        self.close_connection = True
+                        self.connection.shutdown(2)
+                        return
+                    if fault and fault.get("status"):
+                        status = fault["status"]
+                        body = {"ok": False, "error_code": status, "description": "Injected fault"}
+                    else:
+                        status, body = api._respond(method, payload)
+                
+                data = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client gave up (read timeout) before the answer
+                    self.close_connection = True
+            
+            do_GET = _handle
+            do_POST = _handle
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per call")
+    parser.add_argument("--enforce-limits", action="store_true", help="Answer 429 like Telegram")
+    parser.add_argument("--updates", help="JSONL file of updates served by getUpdates")
+    args = parser.parse_args()
+    
+    api = FakeTelegramAPI(args.host, args.port, args.latency, args.enforce_limits)
+    if args.updates:
+        with open(args.updates) as f:
+            api.push_updates([json.loads(line) for line in f if line.strip()])
+        print(f"[FAKE API] Serving {len(api.updates)} updates via getUpdates")
+    print(f"[FAKE API] Listening on {api.url} (latency {args.latency}s)")
+    print(f"[FAKE API] export TELEGRAM_API_BASE={api.url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Webhook Server Load Test
+Fires concurrent Telegram updates at webhook.py and reports throughput
+
+Starts a fake Bot API (tools/fake_telegram.py) with per-call latency and the
+webhook.py FastAPI app on a local port, then sends the same number of
+updates at increasing client concurrency. With handlers running off the
+event loop, throughput grows with concurrency (up to WEBHOOK_CONCURRENCY)
+and the / health check stays fast under load.
+
+Usage:
+    python tools/load_webhook.py [--updates 64] [--latency 0.1] [--levels 1,2,4,8]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_telegram import FakeTelegramAPI
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_update(update_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1000 + update_id % 50, "type": "private"},
+            "from": {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "Load"},
+            "text": f"load test {update_id}"
+        }
+    }
+
+
+def start_webhook_server(port):
+    """Run webhook.py app with uvicorn in a background thread"""
+    import uvicorn
+    import webhook
+    
+    config = uvicorn.Config(webhook.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def run_level(session_factory, url, updates, concurrency, start_id):
+    """Send `updates` updates with `concurrency` client threads"""
+    local = threading.local()
+    
+    def send(update_id):
+        if not hasattr(local, "session"):
+            local.session = session_factory()
+        started = time.perf_counter()
+        response = local.session.post(url, json=make_update(update_id), timeout=30)
+        return response.status_code, time.perf_counter() - started
+    
+    # Probe health endpoint while updates are in flight
+    health = []
+    stop = threading.Event()
+    
+    def probe():
+        session = session_factory()
+        while not stop.is_set():
+            started = time.perf_counter()
+            session.get(url, timeout=30)
+            health.append(time.perf_counter() - started)
+            time.sleep(0.02)
+    
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(start_id, start_id + updates)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    
+    errors = sum(1 for status, _ in results if status != 200)
+    latencies = sorted(latency for _, latency in results)
+    return {
+        "throughput": updates / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "errors": errors,
+        "health_p50_ms": statistics.median(health) * 1000 if health else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="webhook.py load test")
+    parser.add_argument("--updates", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1, help="Fake Bot API latency per call (s)")
+    parser.add_argument("--levels", default="1,2,4,8")
+    args = parser.parse_args()
+    
+    fake_api = FakeTelegramAPI(latency=args.latency).start()
+    os.environ["TELEGRAM_API_BASE"] = fake_api.url
+    os.environ.setdefault("BOT_TOKEN", "LOADTEST")
+    
+    import requests
+    
+    port = free_port()
+    server = start_webhook_server(port)
+    url = f"http://127.0.0.1:{port}/"
+    
+    import webhook
+    print(f"[LOAD] webhook.py on {url}, WEBHOOK_CONCURRENCY={webhook.WEBHOOK_CONCURRENCY}")
+    print(f"[LOAD] fake Bot API latency {args.latency * 1000:.0f} ms, {args.updates} updates per level")
+    print(f"{'clients':>8} {'updates/s':>10} {'p50 ms':>9} {'health p50 ms':>14} {'errors':>7}")
+    
+    next_id = 1
+    for concurrency in (int(level) for level in args.levels.split(",")):
+        stats = run_level(requests.Session, url, args.updates, concurrency, next_id)
+        next_id += args.updates
+        print(
+            f"{concurrency:>8} {stats['throughput']:>10.1f} {stats['p50_ms']:>9.1f} "
+            f"{stats['health_p50_ms']:>14.1f} {stats['errors']:>7}"
+        )
+    
+    server.should_exit = True
+    fake_api.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Cold Start Profiler
+Measures lambda_function import time (-X importtime) and handler time to first byte
+
+Each measurement runs in a fresh interpreter, like a Lambda cold start.
+The first invocation uses a simulator event, so no Telegram API call is made.
+
+Usage:
+    python tools/profile_startup.py [--path package/] [--budget-ms 250] [--top 15]
+
+Exit code 1 if the import time is over --budget-ms.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter
+FIRST_BYTE_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+event = {
+    "body": json.dumps({"update_id": 1, "message": {
+        "message_id": 1, "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "first_name": "Profiler"}, "text": "/start"}}),
+    "headers": {"X-Simulator": "true"}
+}
+result = lambda_function.lambda_handler(event, None)
+done = time.perf_counter()
+print("__PROFILE__" + json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_invoke_ms": (done - imported) * 1000,
+    "status": result.get("statusCode")
+}))
+"""
+
+
+def child_env(path):
+    """Environment for child interpreter with `path` first on sys.path"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [path, env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def import_tree(path):
+    """
+    Parse -X importtime output for `import lambda_function`
+    
+    Returns:
+        (total_us, [(cumulative_us, module), ...]) for top-level imports
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import lambda_function"],
+        env=child_env(path), capture_output=True, text=True, cwd=path
+    )
+    if proc.returncode != 0:
+        print(proc.stderr)
+        sys.exit(proc.returncode)
+    
+    total = 0
+    direct = []
+    children = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name_field = line[len("import time:"):].split("|")
+        name = name_field.strip()
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        # Output is post-order: children are listed before their parent
+        if depth == 1:
+            children.append((int(cumulative_us), name))
+        elif depth == 0:
+            if name == "lambda_function":
+                total, direct = int(cumulative_us), children
+            children = []
+    return total, direct
+
+
+def first_byte(path):
+    """Import time and first handler invocation time in a fresh interpreter"""
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_BYTE_SCRIPT],
+        env=child_env(path), capture_output=True, text=True, cwd=path
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("__PROFILE__"):
+            return json.loads(line[len("__PROFILE__"):])
+    print(proc.stdout)
+    print(proc.stderr)
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lambda cold start profiler")
+    parser.add_argument("--path", default=ROOT, help="Directory containing lambda_function.py")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if median import time exceeds this")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    
+    path = os.path.abspath(args.path)
+    
+    print("=" * 60)
+    print(f"[PROFILE] Import tree of lambda_function ({path})")
+    print("=" * 60)
+    total, direct = import_tree(path)
+    for cumulative_us, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>10.1f} ms  {name}")
+    print(f"{total / 1000:>10.1f} ms  lambda_function (total)")
+    
+    samples = [first_byte(path) for _ in range(args.runs)]
+    import_ms = statistics.median(sample["import_ms"] for sample in samples)
+    invoke_ms = statistics.median(sample["first_invoke_ms"] for sample in samples)
+    
+    print("=" * 60)
+    print(f"[PROFILE] Median of {args.runs} cold starts")
+    print(f"Import:            {import_ms:8.1f} ms")
+    print(f"First invocation:  {invoke_ms:8.1f} ms")
+    print(f"Time to first byte:{import_ms + invoke_ms:8.1f} ms")
+    print("=" * 60)
+    
+    if args.budget_ms is not None and import_ms > args.budget_ms:
+        print(f"[PROFILE] ❌ Import time {import_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        sys.exit(1)
+    if args.budget_ms is not None:
+        print(f"[PROFILE] ✅ Import time within budget ({args.budget_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
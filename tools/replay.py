@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Update Replay / Load Tool
+Streams a JSONL capture of Telegram updates at a bot and reports
+throughput, latency percentiles and error rates
+
+Targets:
+- inprocess: lambda_function.handle_update in this process (raw bytes,
+  like webhook.py), on --concurrency threads
+- webhook: webhook.py served by uvicorn on a local port
+- http(s)://...: a deployed webhook URL (API Gateway / Function URL)
+
+For inprocess and webhook the Bot API is the fake one
+(tools/fake_telegram.py), so nothing reaches Telegram. The bot still
+paces its sends to Telegram's limits (~30 msg/s); --no-send-limits lifts
+them to measure the handler alone. A deployed
+function calls its own TELEGRAM_API_BASE: use --simulator there (replies
+are collected, not sent).
+
+Each JSONL line is an update, {"update": {...}} or a Lambda event with
+a "body"; other lines are skipped. update_ids are renumbered (unless
+--keep-ids), so a capture can be replayed again without every update
+being dropped as a Telegram retry. Without a file, --generate builds a
+synthetic mix of commands, text and button clicks.
+
+Errors are reported apart: HTTP errors (non-200 statuses, exceptions)
+and, among 200 responses whose body carries the handler's "details"
+(inprocess, or a deployed function's JSON body), updates whose handler
+failed or whose Bot API send failed. webhook.py answers {"result": "ok"}
+without details; its failed sends show in the fake Bot API's counts.
+
+With --rate, sends are scheduled open loop (one every 1/rate seconds)
+and latency counts from the scheduled time, so a backlog shows up as
+latency instead of a lower send rate. --rate 0 sends as fast as
+--concurrency allows.
+
+Usage:
+    python tools/replay.py [updates.jsonl] [--target inprocess|webhook|URL]
+                           [--rate 200] [--concurrency 16] [--latency 0.02]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+
+
+def load_updates(path):
+    """(updates, skipped line count) from a JSONL capture"""
+    updates, skipped = [], 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if isinstance(item, dict) and "update" in item:
+                item = item["update"]
+            elif isinstance(item, dict) and "body" in item:
+                body = item["body"]
+                try:
+                    item = json.loads(body) if isinstance(body, str) else body
+                except ValueError:
+                    item = None
+            if isinstance(item, dict) and isinstance(item.get("update_id"), int):
+                updates.append(item)
+            else:
+                skipped += 1
+    return updates, skipped
+
+
+def generate_updates(count, chats, seed=0):
+    """Synthetic mix: /start, /help, /echo, plain text and button clicks"""
+    rng = random.Random(seed)
+    updates = []
+    for i in range(1, count + 1):
+        chat_id = 1000 + rng.randrange(chats)
+        sender = {"id": chat_id, "is_bot": False, "first_name": "Replay"}
+        chat = {"id": chat_id, "type": "private"}
+        kind = rng.choice(("/start", "/help", "/echo salom", "salom dunyo", "btn_hello"))
+        if kind.startswith("btn_"):
+            updates.append({"update_id": i, "callback_query": {
+                "id": str(i), "from": sender, "data": kind,
+                "message": {"message_id": 1, "chat": chat}
+            }})
+        else:
+            updates.append({"update_id": i, "message": {
+                "message_id": i, "from": sender, "chat": chat,
+                "date": 1760000000, "text": kind
+            }})
+    return updates
+
+
+def percentile(sorted_values, share):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * share), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def outcome(details):
+    """
+    "ok", "handler" (handler failed) or "send" (a Bot API call failed)
+    for the "details" of a 200 response, None if there are none
+    """
+    if not isinstance(details, dict):
+        return None
+    from lambda_function import _update_failed
+    if not _update_failed(details):
+        return "ok"
+    return "handler" if details.get("success") is False else "send"
+
+
+def make_sender(args):
+    """send(body_bytes) -> (status code, outcome) for the chosen target"""
+    if args.target == "inprocess":
+        import lambda_function as lf
+        
+        def send(body):
+            context = lf.LocalLambdaContext(args.deadline)
+            result = lf.handle_update(body, context, is_simulator=args.simulator,
+                                      webhook_reply=False)
+            details = result["body"].get("details") if result["statusCode"] == 200 else None
+            return result["statusCode"], outcome(details)
+        return send, None
+    
+    import requests
+    
+    server = None
+    if args.target == "webhook":
+        from load_webhook import free_port, start_webhook_server
+        port = free_port()
+        server = start_webhook_server(port)
+        url = f"http://127.0.0.1:{port}/"
+    else:
+        url = args.target
+    
+    headers = {"Content-Type": "application/json"}
+    if args.simulator:
+        headers["X-Simulator"] = "true"
+    if args.secret_token:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = args.secret_token
+    local = threading.local()
+    
+    def send(body):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        response = local.session.post(url, data=body, headers=headers, timeout=args.deadline)
+        details = None
+        if response.status_code == 200:
+            try:
+                details = response.json().get("details")
+            except (ValueError, AttributeError):
+                pass
+        return response.status_code, outcome(details)
+    return send, server
+
+
+def replay(send, bodies, rate, concurrency):
+    """Send all bodies; returns (elapsed seconds, [(status, outcome, latency seconds)])"""
+    results = []
+    lock = threading.Lock()
+    
+    def run(body, scheduled):
+        try:
+            status, result = send(body)
+        except Exception as e:
+            status, result = type(e).__name__, None
+        latency = time.perf_counter() - scheduled
+        with lock:
+            results.append((status, result, latency))
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if rate:
+            for i, body in enumerate(bodies):
+                scheduled = started + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(run, body, scheduled)
+        else:
+            # Closed loop: latency from the moment a worker picks the update up
+            list(pool.map(lambda body: run(body, time.perf_counter()), bodies))
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Telegram updates and measure latency")
+    parser.add_argument("file", nargs="?", help="JSONL of updates (default: --generate)")
+    parser.add_argument("--target", default="inprocess", help="inprocess, webhook or a URL")
+    parser.add_argument("--rate", type=float, default=0.0, help="Updates/s (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the capture N times")
+    parser.add_argument("--generate", type=int, default=1000, help="Synthetic updates without a file")
+    parser.add_argument("--chats", type=int, default=100, help="Chats in synthetic updates")
+    parser.add_argument("--keep-ids", action="store_true", help="Do not renumber update_ids")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake Bot API seconds per call")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Fake Bot API 502 share")
+    parser.add_argument("--simulator", action="store_true", help="Send X-Simulator (no replies sent)")
+    parser.add_argument("--no-send-limits", action="store_true",
+                        help="Lift the bot's send rate limits (inprocess/webhook)")
+    parser.add_argument("--secret-token", default=os.environ.get("WEBHOOK_SECRET_TOKEN", ""))
+    parser.add_argument("--deadline", type=float, default=30.0, help="Seconds per update")
+    args = parser.parse_args()
+    
+    if args.file:
+        updates, skipped = load_updates(args.file)
+        source = f"{args.file} ({skipped} lines skipped)"
+    else:
+        updates = generate_updates(args.generate, args.chats)
+        source = f"{len(updates)} synthetic updates"
+    if not updates:
+        print(f"[REPLAY] No updates in {source}")
+        raise SystemExit(1)
+    
+    updates = updates * args.repeat
+    if not args.keep_ids:
+        base = int(time.time() * 1000) % 10 ** 12  # not seen by an earlier run
+        updates = [dict(update, update_id=base + i) for i, update in enumerate(updates)]
+    bodies = [json.dumps(update).encode("utf-8") for update in updates]
+    
+    fake_api = None
+    if args.target in ("inprocess", "webhook"):
+        fake_api = FakeTelegramAPI(latency=args.latency).start()
+        if args.fault_rate:
+            fake_api.set_fault_rate(args.fault_rate, status=502)
+        os.environ["TELEGRAM_API_BASE"] = fake_api.url
+        os.environ.setdefault("BOT_TOKEN", "REPLAY")
+        os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+        os.environ.setdefault("DEDUP_MAX_SIZE", str(len(bodies) * 2))
+        if args.secret_token:
+            os.environ["WEBHOOK_SECRET_TOKEN"] = args.secret_token
+        if args.no_send_limits:
+            os.environ["SEND_GLOBAL_RATE"] = os.environ["SEND_CHAT_RATE"] = "1000000"
+    
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        send, server = make_sender(args)
+        if server is not None:
+            import webhook
+            webhook.webhook_state["secret_token"] = args.secret_token or None
+        elapsed, results = replay(send, bodies, args.rate, args.concurrency)
+    if server is not None:
+        server.should_exit = True
+    
+    latencies = sorted(latency * 1000 for _, _, latency in results)
+    statuses = Counter(status for status, _, _ in results)
+    errors = sum(count for status, count in statuses.items() if status != 200)
+    outcomes = Counter(result for _, result, _ in results if result is not None)
+    inspected = sum(outcomes.values())
+    print(f"[REPLAY] {len(bodies)} updates from {source} -> {args.target}, "
+          f"rate {args.rate or 'max'}, concurrency {args.concurrency}")
+    print(f"throughput:  {len(results) / elapsed:.1f} updates/s over {elapsed:.2f} s")
+    print(f"latency ms:  p50 {percentile(latencies, 0.5):.1f}  p90 {percentile(latencies, 0.9):.1f}  "
+          f"p99 {percentile(latencies, 0.99):.1f}  max {latencies[-1]:.1f}")
+    print(f"HTTP errors: {errors} ({errors / len(results):.2%})  statuses {dict(statuses)}")
+    if inspected:
+        print(f"failures:    handler {outcomes['handler']}, send {outcomes['send']} "
+              f"({(outcomes['handler'] + outcomes['send']) / inspected:.2%} "
+              f"of {inspected} responses with details)")
+    else:
+        print("failures:    not reported by the target (no details in response bodies)")
+    if fake_api is not None:
+        calls = Counter(method for _, method, _, _ in fake_api.calls)
+        print(f"Bot API:     {dict(calls)}, {fake_api.faults_injected} faults injected")
+        fake_api.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+SQS Batch Harness
+Feeds synthetic SQS batches of updates to lambda_handler, like an SQS
+event source mapping with ReportBatchItemFailures
+
+Records named in batchItemFailures are redelivered in a later batch
+until --max-receives, then go to a dead-letter list: after the records
+already queued (standard queue, like a visibility timeout) or ahead of
+them, in their original order (--fifo, the message group is blocked).
+Replies go to the fake Bot API; --fault-rate makes some sends fail so
+records are retried, and --junk mixes in bodies that are not updates
+(dropped, never retried).
+
+Each update is "/echo <chat>-<seq>", so the replies show whether every
+update was answered and whether chats kept their order.
+
+Usage:
+    python tools/sqs_harness.py [--updates 2000] [--batch-size 10] [--chats 50]
+                                [--fifo] [--fault-rate 0.05] [--junk 0.02]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict, deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+
+
+def make_records(args, rng):
+    """SQS records: updates over --chats chats plus some junk bodies"""
+    records = []
+    seq = defaultdict(int)
+    for i in range(args.updates):
+        chat_id = 1000 + rng.randrange(args.chats)
+        message_id = f"msg-{i}"
+        if rng.random() < args.junk:
+            body = rng.choice(["", "not json", '{"ping": true}', "[1, 2, 3]"])
+        else:
+            seq[chat_id] += 1
+            body = json.dumps({"update_id": i + 1, "message": {
+                "message_id": i + 1, "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "first_name": "Ali"},
+                "text": f"/echo {chat_id}-{seq[chat_id]}"
+            }})
+        record = {
+            "messageId": message_id,
+            "body": body,
+            "attributes": {"ApproximateReceiveCount": "1"},
+            "messageAttributes": {},
+            "eventSource": "aws:sqs"
+        }
+        if args.fifo:
+            record["attributes"]["MessageGroupId"] = str(chat_id)
+        records.append(record)
+    return records
+
+
+def check_replies(api):
+    """
+    (answered updates, chats whose replies came out of order)
+    
+    Failed send attempts are recorded too; a retry right after its failed
+    attempt (1, 1, 2) is still in order.
+    """
+    sent = defaultdict(list)
+    for payload in api.calls_for("sendMessage"):
+        match = re.search(r"(\d+)-(\d+)", payload.get("text", ""))
+        if match:
+            sent[match.group(1)].append(int(match.group(2)))
+    answered = sum(len(set(numbers)) for numbers in sent.values())
+    out_of_order = sum(1 for numbers in sent.values() if numbers != sorted(numbers))
+    return answered, out_of_order
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQS batch harness")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--fifo", action="store_true", help="Set MessageGroupId = chat id")
+    parser.add_argument("--fault-rate", type=float, default=0.05, help="Share of failing sends")
+    parser.add_argument("--junk", type=float, default=0.02, help="Share of invalid bodies")
+    parser.add_argument("--max-receives", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake API seconds per call")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Function timeout")
+    args = parser.parse_args()
+    
+    api = FakeTelegramAPI(latency=args.latency).start()
+    api.set_fault_rate(args.fault_rate, status=502)
+    os.environ.update({
+        "TELEGRAM_API_BASE": api.url,
+        "TRACE_SAMPLE_RATE": "0",
+        "API_RETRY_ATTEMPTS": "1",  # let failed sends reach the queue retry
+        "SEND_GLOBAL_RATE": "1000000",  # measure batching, not send pacing
+        "SEND_CHAT_RATE": "1000000",
+    })
+    import lambda_function as lf
+    
+    rng = random.Random(0)
+    records = make_records(args, rng)
+    queue = deque(records)
+    receives = defaultdict(int)
+    invocations = retried = 0
+    dead_letters = []
+    
+    started = time.perf_counter()
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        while queue:
+            batch = [queue.popleft() for _ in range(min(args.batch_size, len(queue)))]
+            for record in batch:
+                receives[record["messageId"]] += 1
+                record["attributes"]["ApproximateReceiveCount"] = str(receives[record["messageId"]])
+            
+            result = lf.lambda_handler({"Records": batch}, lf.LocalLambdaContext(args.timeout))
+            invocations += 1
+            
+            failed = {item["itemIdentifier"] for item in result["batchItemFailures"]}
+            redelivered = []
+            for record in batch:
+                if record["messageId"] not in failed:
+                    continue
+                if receives[record["messageId"]] >= args.max_receives:
+                    dead_letters.append(record["messageId"])
+                else:
+                    redelivered.append(record)
+            retried += len(redelivered)
+            if args.fifo:
+                queue.extendleft(reversed(redelivered))
+            else:
+                queue.extend(redelivered)
+    elapsed = time.perf_counter() - started
+    api.stop()
+    
+    outcomes = {
+        outcome: lf.metrics.value("bot_batch_records_total", outcome=outcome)
+        for outcome in ("processed", "failed", "skipped", "rejected")
+    }
+    answered, out_of_order = check_replies(api)
+    valid = sum(1 for record in records if '"message"' in record["body"])
+    print(f"[HARNESS] {args.updates} records ({valid} updates), batch size {args.batch_size}, "
+          f"{args.chats} chats, {'FIFO' if args.fifo else 'standard'} queue, "
+          f"fault rate {args.fault_rate}")
+    print(f"invocations:        {invocations} ({args.updates / invocations:.1f} records each)")
+    print(f"time:               {elapsed:.2f} s ({args.updates / elapsed:.0f} records/s)")
+    print(f"record outcomes:    {outcomes}")
+    print(f"redelivered:        {retried}, dead-lettered: {len(dead_letters)}")
+    print(f"updates answered:   {answered} of {valid}")
+    print(f"chats out of order: {out_of_order} of {args.chats}")
+
+
+if __name__ == "__main__":
+    main()
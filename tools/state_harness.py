@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Conversation State Concurrency Harness
+Concurrent writers against DynamoStateBackend on tools/fake_dynamodb.py
+
+Each writer thread runs invocations like _invoke does: load a chat's
+state through its own StateSession, set its own field and flush. Writers
+share chats, so invocations of one chat overlap.
+
+Checked:
+- one warm container (one StateStore): no conflicts and no lost writes,
+  every writer's last value is in the table
+- several containers (one StateStore each, same table): every failed
+  conditional put is reported by flush, and no writer's last value that
+  flush reported as written is missing from the table
+
+Usage:
+    python tools/state_harness.py [--writers 8] [--chats 4] [--updates 200]
+                                  [--containers 3] [--latency 0.001]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from fake_dynamodb import FakeDynamoTable  # noqa: E402
+
+
+def chat_of(writer, i, args):
+    return 1000 + (writer + i) % args.chats
+
+
+def run_writers(stores, args):
+    """
+    Writer i uses stores[i % len(stores)]
+    
+    Returns:
+        ({(writer, chat_id): (last value, reported written)}, conflicts reported, seconds)
+    """
+    last = {}
+    reported = Counter()
+    
+    def writer(index):
+        store = stores[index % len(stores)]
+        for i in range(args.updates):
+            chat_id = chat_of(index, i, args)
+            session = store.session()
+            session.for_chat(chat_id).set(f"writer{index}", i)
+            conflicts = session.flush()
+            reported[index] += len(conflicts)
+            last[index, chat_id] = (i, not conflicts)
+    
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return last, sum(reported.values()), time.perf_counter() - started
+
+
+def lost_writes(table, last, json_loads):
+    """(writer, chat_id) whose last value was reported written but is not in the table"""
+    stored = {key: json_loads(item["data"]) for key, item in table.items.items()}
+    return [
+        (writer, chat_id) for (writer, chat_id), (value, written) in last.items()
+        if written and stored.get(f"chat:{chat_id}", {}).get(f"writer{writer}") != value
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent conversation state writers")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--chats", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=200, help="Invocations per writer")
+    parser.add_argument("--containers", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.001, help="Fake table seconds per call")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+    import lambda_function as lf
+    
+    results = []
+    
+    def check(name, ok, detail):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<38} {detail}")
+    
+    print(f"[HARNESS] {args.writers} writers x {args.updates} invocations over {args.chats} chats, "
+          f"table latency {args.latency * 1000:.1f} ms")
+    
+    # One warm container: sessions share cached states
+    table = FakeDynamoTable(latency=args.latency)
+    store = lf.StateStore(backend=lf.DynamoStateBackend(table))
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        last, reported, elapsed = run_writers([store], args)
+    lost = lost_writes(table, last, lf.json_loads)
+    unwritten = sum(1 for _, written in last.values() if not written)
+    check("one container: no conflicts", reported == 0 and table.conditional_failures == 0,
+          f"{table.put_calls} puts, {table.conditional_failures} conditional failures")
+    check("one container: no lost writes", not lost and not unwritten,
+          f"{len(lost) + unwritten} of {len(last)} last values missing, {elapsed:.2f} s")
+    
+    # Several containers on one table: optimistic versioning
+    table = FakeDynamoTable(latency=args.latency)
+    stores = [
+        lf.StateStore(backend=lf.DynamoStateBackend(table)) for _ in range(args.containers)
+    ]
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        last, reported, elapsed = run_writers(stores, args)
+    lost = lost_writes(table, last, lf.json_loads)
+    check(f"{args.containers} containers: conflicts reported",
+          sum(store.conflicts for store in stores) == table.conditional_failures <= reported,
+          f"{table.conditional_failures} conditional failures, {reported} changes reported lost")
+    check(f"{args.containers} containers: no silent lost writes", not lost,
+          f"{len(lost)} reported written but missing, {table.put_calls} puts, {elapsed:.2f} s")
+    
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
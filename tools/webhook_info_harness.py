@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Webhook Info Refresher Harness
+Runs webhook.WebhookInfoRefresher against the fake Bot API
+
+Checks that:
+- refreshes are spaced by the configured interval
+- /status answers from the cached snapshot (no getWebhookInfo call per
+  request) and shows the latest refreshed values
+- failed refreshes back off (each wait about twice the previous one, up
+  to max_backoff) and the interval is restored after a success
+
+Usage:
+    python tools/webhook_info_harness.py [--interval 0.2] [--failures 4] [--requests 200]
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from fake_telegram import FakeTelegramAPI  # noqa: E402
+
+
+def call_times(api):
+    """Fake API clock times of the getWebhookInfo calls so far"""
+    return [ts for _, method, _, ts in list(api.calls) if method == "getWebhookInfo"]
+
+
+def gaps(times):
+    return [later - earlier for earlier, later in zip(times, times[1:])]
+
+
+def wait_for_calls(api, count, timeout):
+    deadline = time.monotonic() + timeout
+    while len(call_times(api)) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return call_times(api)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebhookInfoRefresher harness")
+    parser.add_argument("--interval", type=float, default=0.2, help="Refresh interval (s)")
+    parser.add_argument("--refreshes", type=int, default=10, help="Refreshes timed for the interval check")
+    parser.add_argument("--failures", type=int, default=4, help="getWebhookInfo calls failed in a row")
+    parser.add_argument("--max-backoff", type=float, default=2.0)
+    parser.add_argument("--requests", type=int, default=200, help="/status requests")
+    args = parser.parse_args()
+    
+    api = FakeTelegramAPI().start()
+    pending = {"count": 0}
+    
+    def webhook_info(payload):
+        pending["count"] += 1
+        return 200, {"ok": True, "result": {
+            "url": "https://example.test/webhook", "pending_update_count": pending["count"]
+        }}
+    
+    api.on("getWebhookInfo", webhook_info)
+    os.environ.update({"TELEGRAM_API_BASE": api.url, "BOT_TOKEN": "1:HARNESS"})
+    
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        import webhook
+        from fastapi.testclient import TestClient
+    
+    refresher = webhook.WebhookInfoRefresher(
+        lambda: webhook.get_webhook_info(verbose=False), interval=args.interval,
+        ttl=args.interval * 3, max_backoff=args.max_backoff
+    )
+    webhook.webhook_info_refresher = refresher
+    results = []
+    
+    def check(name, ok, detail):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<28} {detail}")
+    
+    print(f"[HARNESS] interval {args.interval}s, {args.failures} failures, "
+          f"max backoff {args.max_backoff}s")
+    
+    # Interval: refreshes spaced by `interval`
+    refresher.start()
+    times = wait_for_calls(api, args.refreshes + 1, args.interval * (args.refreshes + 5))
+    spacing = statistics.median(gaps(times))
+    check("refresh interval", abs(spacing - args.interval) < args.interval * 0.25,
+          f"median gap {spacing:.3f}s over {len(times)} refreshes")
+    
+    # Backoff: the next `failures` calls fail
+    api.fail_next(args.failures, status=502)
+    start = len(call_times(api))
+    expected_wait = sum(
+        min(args.interval * 2 ** n, args.max_backoff) for n in range(1, args.failures + 1)
+    )
+    times = wait_for_calls(api, start + args.failures + 2, expected_wait + args.interval * 10)
+    backoff = gaps(times[start - 1:start + args.failures + 1])
+    expected = [args.interval] + [
+        min(args.interval * 2 ** n, args.max_backoff) for n in range(1, args.failures + 1)
+    ]
+    grows = all(abs(got - want) < want * 0.25 + 0.05 for got, want in zip(backoff, expected))
+    check("backoff on errors", grows and len(backoff) == len(expected),
+          "gaps " + ", ".join(f"{gap:.2f}" for gap in backoff) + "s")
+    after = gaps(times[start + args.failures:start + args.failures + 2])
+    check("interval after recovery", bool(after) and abs(after[0] - args.interval) < args.interval * 0.5,
+          f"gap {after[0]:.3f}s" if after else "no refresh after recovery")
+    check("errors counted", refresher.refresh_errors == args.failures,
+          f"refresh_errors {refresher.refresh_errors}")
+    refresher.stop()
+    
+    # /status: served from the cache, no getWebhookInfo per request
+    client = TestClient(webhook.app)
+    before = len(call_times(api))
+    latest = pending["count"]
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        bodies = [client.get("/status").json() for _ in range(args.requests)]
+    calls = len(call_times(api)) - before
+    shown = {body["telegram_webhook"]["pending_update_count"] for body in bodies}
+    check("/status from cache", calls == 0, f"{args.requests} requests, {calls} getWebhookInfo calls")
+    check("/status latest snapshot", shown == {latest}, f"pending_update_count {sorted(shown)}")
+    time.sleep(args.interval * 3)
+    cache = client.get("/status").json()["telegram_webhook_cache"]
+    check("/status marks stale cache", cache["stale"], f"age {cache['age_seconds']}s")
+    
+    api.stop()
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,32 +9,61 @@ import json
 import signal
 import sys
 import atexit
+import asyncio
 import requests
+import secrets
+import sqlite3
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
 from dotenv import load_dotenv
 
+# Load environment variables from .env (before lambda_function reads them)
+load_dotenv()
+
 # Import lambda handler
 try:
-    from lambda_function import lambda_handler
+    from lambda_function import (
+        handle_update, ChatLaneScheduler, LocalLambdaContext, metrics,
+        json_loads, peek_update_id, check_webhook_request, MAX_UPDATE_BYTES
+    )
     LAMBDA_AVAILABLE = True
 except ImportError:
     LAMBDA_AVAILABLE = False
     print("[ERROR] Could not import lambda_handler from lambda_function.py")
 
-# Load environment variables from .env
-load_dotenv()
-
 # ============= CONFIGURATION =============
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
+# Bot's webhook secret (same as the Lambda's); empty = random one per run
+WEBHOOK_SECRET_TOKEN = os.environ.get("WEBHOOK_SECRET_TOKEN", "")
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")
 WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "7172"))
 WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+# Time budget per update, like the Lambda function timeout
+WEBHOOK_DEADLINE_SECONDS = float(os.environ.get("WEBHOOK_DEADLINE_SECONDS", "30"))
+# Max updates processed at the same time (handle_update runs in threads)
+WEBHOOK_CONCURRENCY = int(os.environ.get("WEBHOOK_CONCURRENCY", "8"))
+
+# Ack-first mode: answer 200 immediately, process updates in background workers
+WEBHOOK_ACK_FIRST = os.environ.get("WEBHOOK_ACK_FIRST", "false").lower() == "true"
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", str(WEBHOOK_CONCURRENCY)))
+WEBHOOK_SPOOL_PATH = os.environ.get("WEBHOOK_SPOOL_PATH", "")  # SQLite file, empty = in-memory
+
+# getWebhookInfo is polled in the background, /status serves the cached snapshot
+WEBHOOK_INFO_INTERVAL = float(os.environ.get("WEBHOOK_INFO_INTERVAL", "30"))
+WEBHOOK_INFO_TTL = float(os.environ.get("WEBHOOK_INFO_TTL", "120"))  # older = stale
+WEBHOOK_INFO_HISTORY = int(os.environ.get("WEBHOOK_INFO_HISTORY", "120"))  # samples kept
+# Failed refreshes double the wait up to this many seconds
+WEBHOOK_INFO_MAX_BACKOFF = float(os.environ.get("WEBHOOK_INFO_MAX_BACKOFF", "300"))
 
 # Cache file for webhook state
 WEBHOOK_CACHE_FILE = Path(__file__).parent / ".webhook_cache.json"
@@ -42,11 +71,20 @@ WEBHOOK_CACHE_FILE = Path(__file__).parent / ".webhook_cache.json"
 # FastAPI app
 app = FastAPI(title="Telegram Webhook", version="1.0.0")
 
+# Blocking handle_update calls run here, off the event loop
+handler_pool = ThreadPoolExecutor(
+    max_workers=WEBHOOK_CONCURRENCY,
+    thread_name_prefix="webhook-handler"
+)
+
 # Global state
 webhook_state = {
     "ngrok_url": None,
     "old_webhook_url": None,
     "needs_cleanup": False,
+    # Checked on every update: the configured secret from the start (uvicorn
+    # webhook:app, failed setup), else the one registered with setWebhook
+    "secret_token": WEBHOOK_SECRET_TOKEN or None,
 }
 
 
@@ -85,17 +123,18 @@ def clear_webhook_cache():
 
 
 # ============= TELEGRAM API HELPERS =============
-def get_webhook_info() -> Optional[Dict[str, Any]]:
-    """Get current webhook info from Telegram"""
+def get_webhook_info(verbose: bool = True) -> Optional[Dict[str, Any]]:
+    """Get current webhook info from Telegram (verbose=False: log errors only)"""
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/getWebhookInfo"
+        url = f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/getWebhookInfo"
         response = requests.get(url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
             if data.get('ok'):
                 webhook_info = data.get('result', {})
-                print(f"[TELEGRAM] Current webhook: {webhook_info.get('url', 'none')}")
+                if verbose:
+                    print(f"[TELEGRAM] Current webhook: {webhook_info.get('url', 'none')}")
                 return webhook_info
         else:
             print(f"[TELEGRAM] getWebhookInfo failed: {response.status_code}")
@@ -108,7 +147,7 @@ def get_webhook_info() -> Optional[Dict[str, Any]]:
 def delete_webhook() -> bool:
     """Delete current webhook from Telegram"""
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/deleteWebhook"
+        url = f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/deleteWebhook"
         response = requests.post(url, timeout=10)
         
         if response.status_code == 200:
@@ -124,11 +163,13 @@ def delete_webhook() -> bool:
     return False
 
 
-def set_webhook(webhook_url: str) -> bool:
-    """Set webhook URL in Telegram"""
+def set_webhook(webhook_url: str, secret_token: Optional[str] = None) -> bool:
+    """Set webhook URL in Telegram (with secret_token sent back in every update)"""
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/setWebhook"
+        url = f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/setWebhook"
         payload = {"url": webhook_url}
+        if secret_token:
+            payload["secret_token"] = secret_token
         response = requests.post(url, json=payload, timeout=10)
         
         if response.status_code == 200:
@@ -228,7 +269,9 @@ def setup_webhook():
     
     # Step 5: Set new webhook
     print("[SETUP] Step 5: Setting new webhook...")
-    if set_webhook(webhook_state["ngrok_url"]):
+    secret_token = WEBHOOK_SECRET_TOKEN or secrets.token_urlsafe(32)
+    if set_webhook(webhook_state["ngrok_url"], secret_token):
+        webhook_state["secret_token"] = secret_token
         # Save old webhook URL to cache (for restoration on next run)
         save_webhook_cache({
             "url": webhook_state["old_webhook_url"],
@@ -268,7 +311,8 @@ def cleanup_webhook():
     # Step 2: Restore old webhook if cached
     if webhook_state["old_webhook_url"]:
         print(f"[CLEANUP] Step 2: Restoring old webhook...")
-        if set_webhook(webhook_state["old_webhook_url"]):
+        # Only a configured secret is known to match the restored endpoint
+        if set_webhook(webhook_state["old_webhook_url"], WEBHOOK_SECRET_TOKEN or None):
             print(f"[CLEANUP] ✅ Restored: {webhook_state['old_webhook_url']}")
         time.sleep(1)
     
@@ -289,7 +333,348 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 
+# ============= WEBHOOK INFO REFRESHER =============
+class WebhookInfoRefresher:
+    """
+    Background poller for getWebhookInfo with a TTL cache
+    
+    Keeps the last successful result and a bounded history of
+    pending_update_count / last_error_date samples, so a growing backlog
+    or repeated delivery errors are visible without calling Telegram on
+    every /status hit. fetch() returns the getWebhookInfo result or None.
+    After a failed refresh the wait doubles (up to max_backoff) until a
+    refresh succeeds again.
+    """
+    
+    def __init__(self, fetch, interval=WEBHOOK_INFO_INTERVAL, ttl=WEBHOOK_INFO_TTL,
+                 history_size=WEBHOOK_INFO_HISTORY, max_backoff=WEBHOOK_INFO_MAX_BACKOFF,
+                 clock=time.time):
+        self.fetch = fetch
+        self.interval = interval
+        self.ttl = ttl
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.info = None
+        self.fetched_at = None
+        self.history = deque(maxlen=history_size)
+        self.refresh_errors = 0
+        self.failures = 0  # failed refreshes in a row
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def refresh(self) -> bool:
+        """Fetch once and update the cache; False if the call failed"""
+        try:
+            info = self.fetch()
+        except Exception as e:
+            print(f"[WEBHOOK_INFO] Refresh error: {e}")
+            info = None
+        
+        with self._lock:
+            if not isinstance(info, dict):
+                # Failed call, or a malformed result that would break /status
+                self.refresh_errors += 1
+                self.failures += 1
+                return False
+            
+            self.failures = 0
+            self.info = info
+            self.fetched_at = self.clock()
+            self.history.append({
+                "at": self.fetched_at,
+                "pending_update_count": info.get("pending_update_count", 0),
+                "last_error_date": info.get("last_error_date"),
+                "last_error_message": info.get("last_error_message")
+            })
+            return True
+    
+    def age(self) -> Optional[float]:
+        """Seconds since last successful refresh (None = never)"""
+        with self._lock:
+            return None if self.fetched_at is None else self.clock() - self.fetched_at
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Cached webhook info with its age and sample history"""
+        with self._lock:
+            age = None if self.fetched_at is None else self.clock() - self.fetched_at
+            return {
+                "webhook_info": self.info,
+                "age_seconds": None if age is None else round(age, 3),
+                "stale": age is None or age > self.ttl,
+                "refresh_interval": self.interval,
+                "refresh_errors": self.refresh_errors,
+                "failures_in_row": self.failures,
+                "history": list(self.history)
+            }
+    
+    def next_wait(self) -> float:
+        """Seconds until the next refresh: interval, doubled per failure in a row"""
+        with self._lock:
+            if not self.failures:
+                return self.interval
+            return max(min(self.interval * 2 ** self.failures, self.max_backoff), self.interval)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.next_wait())
+    
+    def start(self):
+        """Start polling thread (first refresh happens immediately)"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="webhook-info", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Polled every WEBHOOK_INFO_INTERVAL seconds: only errors are logged
+webhook_info_refresher = WebhookInfoRefresher(lambda: get_webhook_info(verbose=False))
+
+
+# ============= ACK-FIRST UPDATE QUEUE =============
+class UpdateQueue:
+    """Bounded in-memory FIFO of (enqueued_at, update)"""
+    
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+    
+    def put(self, update) -> bool:
+        """Enqueue update, False if the queue is full"""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                return False
+            self._items.append((time.time(), update))
+            self._cond.notify()
+            return True
+    
+    def get(self, timeout=None):
+        """Dequeue oldest (enqueued_at, update), None on timeout"""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+    
+    def depth(self) -> int:
+        return len(self._items)
+    
+    def oldest_enqueued_at(self) -> Optional[float]:
+        with self._cond:
+            return self._items[0][0] if self._items else None
+
+
+class SqliteSpool(UpdateQueue):
+    """
+    Bounded FIFO persisted in a SQLite file
+    
+    Queued updates survive a restart of the server; an update is removed
+    from the spool when a worker takes it.
+    """
+    
+    def __init__(self, maxsize, path):
+        super().__init__(maxsize)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, enqueued_at REAL, body TEXT)"
+        )
+        self._depth = self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+    
+    def put(self, update) -> bool:
+        with self._cond:
+            if self._depth >= self.maxsize:
+                return False
+            self._db.execute(
+                "INSERT INTO spool (enqueued_at, body) VALUES (?, ?)",
+                (time.time(), json.dumps(update))
+            )
+            self._depth += 1
+            self._cond.notify()
+            return True
+    
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._depth and not self._cond.wait_for(lambda: self._depth, timeout):
+                return None
+            row_id, enqueued_at, body = self._db.execute(
+                "SELECT id, enqueued_at, body FROM spool ORDER BY id LIMIT 1"
+            ).fetchone()
+            self._db.execute("DELETE FROM spool WHERE id = ?", (row_id,))
+            self._depth -= 1
+            return enqueued_at, json.loads(body)
+    
+    def depth(self) -> int:
+        return self._depth
+    
+    def oldest_enqueued_at(self) -> Optional[float]:
+        with self._cond:
+            row = self._db.execute("SELECT MIN(enqueued_at) FROM spool").fetchone()
+            return row[0] if row else None
+
+
+update_queue = (
+    SqliteSpool(WEBHOOK_QUEUE_SIZE, WEBHOOK_SPOOL_PATH) if WEBHOOK_SPOOL_PATH
+    else UpdateQueue(WEBHOOK_QUEUE_SIZE)
+)
+
+queue_stats = {
+    "accepted": 0,
+    "rejected": 0,
+    "processed": 0,
+    "failed": 0,
+    "workers": 0,
+}
+_stats_lock = threading.Lock()
+_drained_at = deque(maxlen=10000)  # completion timestamps for drain rate
+lane_scheduler = None  # ChatLaneScheduler, created by start_queue_workers()
+
+
+def is_valid_update(update) -> bool:
+    """Minimal Telegram update validation before queueing"""
+    return (
+        isinstance(update, dict)
+        and isinstance(update.get("update_id"), int)
+        and len(update) > 1
+    )
+
+
+def process_queued_update(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one queued update in-process (already decoded, no JSON round trip)"""
+    context = LocalLambdaContext(WEBHOOK_DEADLINE_SECONDS)
+    # Queued updates are answered already, the reply body would be lost
+    return handle_update(update, context, webhook_reply=False)
+
+
+def _record_outcome(future):
+    """Scheduler done-callback: count processed/failed updates"""
+    try:
+        outcome = "processed" if future.result().get("statusCode") == 200 else "failed"
+    except Exception as e:
+        outcome = "failed"
+        print(f"[QUEUE] ❌ Worker error: {e}")
+    
+    with _stats_lock:
+        queue_stats[outcome] += 1
+        _drained_at.append(time.time())
+
+
+def queue_dispatcher():
+    """
+    Move queued updates onto per-chat lanes
+    
+    Replies within a chat stay ordered while chats run in parallel. Blocks
+    while the scheduler is full, so waiting updates stay in the bounded
+    queue and backpressure still applies. A busy chat's backlog is parked
+    on its lane instead, so it never holds up updates of other chats.
+    An update that cannot be scheduled is counted as failed; the
+    dispatcher keeps going (it is the only thread draining the queue).
+    """
+    while True:
+        item = update_queue.get(timeout=1.0)
+        if item is None:
+            continue
+        
+        _, update = item
+        try:
+            lane_scheduler.submit(update).add_done_callback(_record_outcome)
+        except Exception as e:
+            print(f"[QUEUE] ❌ Dispatch error for update {update.get('update_id')}: {e}")
+            with _stats_lock:
+                queue_stats["failed"] += 1
+                _drained_at.append(time.time())
+
+
+def start_queue_workers():
+    """Start dispatcher and per-chat lane workers once (ack-first mode)"""
+    global lane_scheduler
+    if lane_scheduler is not None:
+        return
+    
+    lane_scheduler = ChatLaneScheduler(
+        process_queued_update,
+        workers=WEBHOOK_WORKERS,
+        max_pending=WEBHOOK_WORKERS * 2,
+        max_parked=WEBHOOK_QUEUE_SIZE  # memory bound while one chat floods
+    )
+    threading.Thread(target=queue_dispatcher, name="queue-dispatcher", daemon=True).start()
+    queue_stats["workers"] = WEBHOOK_WORKERS
+    print(f"[QUEUE] Started {WEBHOOK_WORKERS} workers (queue size {WEBHOOK_QUEUE_SIZE}, "
+          f"{'spool ' + WEBHOOK_SPOOL_PATH if WEBHOOK_SPOOL_PATH else 'in-memory'})")
+
+
+def queue_metrics(window: float = 60.0) -> Dict[str, Any]:
+    """Queue depth, age of oldest queued update and drain rate"""
+    now = time.time()
+    oldest = update_queue.oldest_enqueued_at()
+    with _stats_lock:
+        drained = sum(1 for ts in _drained_at if now - ts <= window)
+    return {
+        "depth": update_queue.depth(),
+        "capacity": update_queue.maxsize,
+        "oldest_age_seconds": round(now - oldest, 3) if oldest else 0.0,
+        "drain_rate_per_second": round(drained / window, 3),
+        "parked": lane_scheduler.parked if lane_scheduler else 0,
+        **queue_stats
+    }
+
+
+if LAMBDA_AVAILABLE:
+    metrics.gauge_function("webhook_queue_depth", "Updates waiting in the ack-first queue",
+                           update_queue.depth)
+    metrics.gauge_function("webhook_queue_oldest_age_seconds", "Age of the oldest queued update",
+                           lambda: queue_metrics()["oldest_age_seconds"])
+    metrics.gauge_function("webhook_queue_updates", "Ack-first queue outcomes since start",
+                           lambda: {(("outcome", key),): value for key, value in queue_stats.items()
+                                    if key != "workers"})
+    metrics.gauge_function("telegram_pending_update_count",
+                           "pending_update_count from the cached getWebhookInfo",
+                           lambda: (webhook_info_refresher.info or {})["pending_update_count"])
+
+
+# ============= REQUEST GUARD =============
+def reject_request(status_code: int, reason: str) -> JSONResponse:
+    """Fast reject response (no handler, no BugHunter report)"""
+    metrics.inc("bot_webhook_rejected_total", reason=reason)
+    return JSONResponse(status_code=status_code, content={"error": reason})
+
+
+async def read_body(request: Request, limit: int) -> Optional[bytes]:
+    """Request body, or None as soon as it grows past limit (chunked uploads)"""
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
 # ============= FASTAPI ENDPOINTS =============
+@app.on_event("startup")
+async def on_startup():
+    """Start webhook info refresher, and queue workers in ack-first mode"""
+    if BOT_TOKEN:
+        webhook_info_refresher.start()
+    if WEBHOOK_ACK_FIRST and LAMBDA_AVAILABLE:
+        start_queue_workers()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    webhook_info_refresher.stop()
+
+
 @app.get("/", tags=["Health"])
 async def health():
     """Health check endpoint"""
@@ -305,7 +690,7 @@ async def health():
 async def handle_webhook(request: Request):
     """
     Main webhook endpoint - receives updates from Telegram
-    Forwards to lambda_handler
+    Forwards raw body to handle_update (in-process, no Lambda event)
     """
     if not LAMBDA_AVAILABLE:
         return JSONResponse(
@@ -313,28 +698,62 @@ async def handle_webhook(request: Request):
             content={"error": "Lambda handler not available"}
         )
     
+    # Fast reject: secret token and declared size, before the body is read
     try:
-        # Get JSON body
-        body = await request.json()
+        declared_size = int(request.headers.get("Content-Length") or 0)
+    except ValueError:
+        return reject_request(400, "bad_content_length")
+    rejection = check_webhook_request(
+        webhook_state["secret_token"],
+        request.headers.get("X-Telegram-Bot-Api-Secret-Token"),
+        declared_size
+    )
+    if rejection is not None:
+        return reject_request(*rejection)
+    
+    try:
+        # Raw body: decoded once, inside handle_update (after the duplicate check)
+        raw = await read_body(request, MAX_UPDATE_BYTES)
+        if raw is None:
+            return reject_request(413, "body_too_large")
         
-        print(f"\n[WEBHOOK] Received update: {body.get('update_id', 'unknown')}")
+        print(f"\n[WEBHOOK] Received update: {peek_update_id(raw) or 'unknown'}")
         
-        # Create Lambda event
-        event = {
-            "body": json.dumps(body),
-            "headers": {
-                "Content-Type": "application/json",
-                "X-Simulator": "false"
-            }
-        }
+        # Ack-first: queue update and answer right away
+        if WEBHOOK_ACK_FIRST:
+            try:
+                body = json_loads(raw)
+            except ValueError:
+                body = None
+            if not is_valid_update(body):
+                return JSONResponse(status_code=400, content={"error": "Invalid update"})
+            
+            if not update_queue.put(body):
+                with _stats_lock:
+                    queue_stats["rejected"] += 1
+                print(f"[QUEUE] ⚠️  Queue full ({update_queue.depth()}), rejecting update")
+                return JSONResponse(
+                    status_code=503,
+                    content={"error": "Update queue full"},
+                    headers={"Retry-After": "1"}
+                )
+            
+            with _stats_lock:
+                queue_stats["accepted"] += 1
+            return JSONResponse(status_code=200, content={"result": "queued"})
         
-        # Call lambda handler
-        result = lambda_handler(event, context=None)
+        # Call handler in worker thread (keeps event loop responsive)
+        loop = asyncio.get_running_loop()
+        context = LocalLambdaContext(WEBHOOK_DEADLINE_SECONDS)
+        result = await loop.run_in_executor(handler_pool, handle_update, raw, context)
         
         print(f"[WEBHOOK] Response: {result.get('statusCode', 'unknown')}")
         
-        # Return response
+        # Return response (pass through webhook reply method call)
         if result.get("statusCode") == 200:
+            reply = result["body"]
+            if "method" in reply:
+                return JSONResponse(status_code=200, content=reply)
             return JSONResponse(
                 status_code=200,
                 content={"result": "ok"}
@@ -358,17 +777,32 @@ async def handle_webhook(request: Request):
 
 @app.get("/status", tags=["Debug"])
 async def status():
-    """Get webhook status"""
-    webhook_info = get_webhook_info()
+    """Get webhook status (cached getWebhookInfo, no Telegram call)"""
+    cached = webhook_info_refresher.snapshot()
     return {
         "ngrok_url": webhook_state["ngrok_url"],
         "old_webhook_url": webhook_state["old_webhook_url"],
-        "telegram_webhook": webhook_info,
+        "telegram_webhook": cached.pop("webhook_info"),
+        "telegram_webhook_cache": cached,
         "needs_cleanup": webhook_state["needs_cleanup"],
         "lambda_available": LAMBDA_AVAILABLE
     }
 
 
+@app.get("/queue", tags=["Debug"])
+async def queue_status():
+    """Ack-first queue metrics"""
+    return {"ack_first": WEBHOOK_ACK_FIRST, **queue_metrics()}
+
+
+@app.get("/metrics", tags=["Debug"])
+async def prometheus_metrics():
+    """Prometheus text metrics (in-process, no network calls)"""
+    if not LAMBDA_AVAILABLE:
+        return PlainTextResponse("", status_code=503)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ============= MAIN =============
 if __name__ == "__main__":
     # Register cleanup on exit